@@ -0,0 +1,93 @@
+"""Provide the choice among several seam candidates returned by codes."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+dtype = np.dtype([(x, np.float32) for x in 'xyi'])
+
+candidate_dtype = np.dtype([('x', np.float32), ('y', np.float32), ('score', np.float32)])
+
+# Label of candidates not chosen, next to the labels documented in codes.
+OTHER = -6
+
+
+def choose(cands: np.ndarray, predict=None, *, sigma: float = 3.):
+    """
+    Return the index of the best candidate.
+
+    Without prediction the highest score wins.
+    With prediction each score is weighted by a gaussian of the distance to it.
+
+    :param cands: Candidates with dtype x, y, score.
+    :type cands: np.ndarray
+    :param predict: Predicted x and y in mm, or None.
+    :type predict: sequence
+    :param sigma: Standard deviation of the distance to the prediction in mm.
+    :type sigma: float
+    :return: Index, or -1 if no candidate has a positive weight.
+    :rtype: int
+    """
+    if cands.size == 0:
+        return -1
+    w = cands['score'].astype(np.float64)
+    if predict is not None:
+        d2 = (cands['x'] - predict[0]) ** 2 + (cands['y'] - predict[1]) ** 2
+        w = w * np.exp(-d2 / (2 * sigma * sigma))
+    w = np.nan_to_num(w, nan=0.)
+    k = int(np.argmax(w))
+    return k if w[k] > 0 else -1
+
+
+def resolve(ret, predict=None, *, sigma: float = 3.):
+    """
+    Turn the result of codes into points with a single picked seam.
+
+    Codes may return points alone, picked seam first as i == -1,
+    or a tuple of points without picked seam and candidates with dtype x, y, score.
+    The chosen candidate is put first as i == -1, others are appended as i == -6.
+
+    :param ret: The result of codes.
+    :type ret: np.ndarray or tuple
+    :param predict: Predicted x and y in mm, or None.
+    :type predict: sequence
+    :param sigma: Standard deviation of the distance to the prediction in mm.
+    :type sigma: float
+    :return: Points with dtype x, y, i in float32.
+    :rtype: np.ndarray
+    """
+    if not isinstance(ret, tuple):
+        return ret
+    pnts, cands = ret
+    cands = np.asarray(cands)
+    if cands.dtype.names is None or not {'x', 'y', 'score'} <= set(cands.dtype.names):
+        raise TypeError(f'Candidates need fields x, y and score: {cands.dtype}')
+    cands = cands.reshape(-1)
+    k = choose(cands, predict, sigma=sigma)
+
+    out = np.empty((pnts.size + cands.size,), dtype=dtype)
+    others = np.ones(cands.size, dtype=bool)
+    n = 0
+    if k >= 0:
+        out[0] = (cands[k]['x'], cands[k]['y'], -1)
+        others[k] = False
+        n = 1
+    out[n:n + pnts.size] = pnts
+    n += pnts.size
+    m = np.count_nonzero(others)
+    out['x'][n:n + m] = cands['x'][others]
+    out['y'][n:n + m] = cands['y'][others]
+    out['i'][n:n + m] = OTHER
+    return out[:n + m]
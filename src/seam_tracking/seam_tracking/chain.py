@@ -0,0 +1,246 @@
+"""Provide the chain of stages from points to the modbus frame, free of ROS."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from collections import deque
+
+import numpy as np
+
+from .candidates import resolve
+from .compensator import LatencyCompensator
+from .modbus_frame import FrameEncoder
+from .ring_filter import RingFilter
+from .tracker import REJECTED, Tracker
+
+
+class SeamChain():
+    """
+    Locate the seam in a frame of points and encode it for modbus.
+
+    The stages run in order: codes, filter, offset, compensate, notnan and modbus.
+    The node runs it per message, the replay engine per recorded frame.
+    Set `timing` to a callable taking stage name and seconds to time each stage.
+    Set `pool` to a PluginPool to run codes in worker processes.
+    """
+
+    STAGES = ('codes', 'filter', 'offset', 'compensate', 'notnan', 'modbus')
+
+    def __init__(
+        self,
+        codes,
+        *,
+        ring: RingFilter = None,
+        tracker: Tracker = None,
+        compensator: LatencyCompensator = None,
+        encoder: FrameEncoder = None,
+        delta_x: float = 0.,
+        delta_y: float = 0.,
+        clock=time.time
+    ):
+        """
+        Initialize self, stages not given are created disabled.
+
+        :param codes: Callable as the active code, with snapshot() if loaded from Codes.
+        :type codes: Codes
+        :param ring: Stability filter.
+        :type ring: RingFilter
+        :param tracker: Seam tracker.
+        :type tracker: Tracker
+        :param compensator: Latency compensator.
+        :type compensator: LatencyCompensator
+        :param encoder: Modbus frame encoder.
+        :type encoder: FrameEncoder
+        :param delta_x: Offset of the picked seam in mm.
+        :type delta_x: float
+        :param delta_y: Offset of the picked seam in mm.
+        :type delta_y: float
+        :param clock: Callable returning the send time in seconds, same clock as stamps.
+        :type clock: callable
+        """
+        self.codes = codes
+        self.ring = RingFilter() if ring is None else ring
+        self.tracker = Tracker() if tracker is None else tracker
+        self.compensator = LatencyCompensator() if compensator is None else compensator
+        self.encoder = FrameEncoder() if encoder is None else encoder
+        self.delta_x = delta_x
+        self.delta_y = delta_y
+        self.clock = clock
+        self.pool = None
+        self.timing = None
+        # Seconds spent in codes per frame, for the latest frames.
+        self.plugin_times = deque(maxlen=1000)
+        # Valid flag, u and v of the latest frame.
+        self.seam = (False, 0., 0.)
+
+    def __call__(self, r: np.ndarray, id: str, stamp: float, now: float = None):
+        """
+        Run all stages on a frame.
+
+        :param r: Point cloud in numpy.
+        :type r: np.ndarray
+        :param id: Frame id, used as transaction identifier.
+        :type id: str
+        :param stamp: Exposure time in seconds.
+        :type stamp: float
+        :param now: Send time in seconds, same clock as stamp, read from clock
+            in the compensate stage if None, after codes and filter ran.
+        :type now: float
+        :return: Points after all stages and the modbus frame.
+        :rtype: tuple
+        """
+        stages = (
+            (self.locate, ()),
+            (self.filter, ()),
+            (self.offset, ()),
+            (self.compensate, (stamp, now)),
+            (self.notnan, ()))
+        timing = self.timing
+        for name, (fn, args) in zip(self.STAGES, stages):
+            if timing is None:
+                r = fn(r, *args)
+            else:
+                t = time.perf_counter()
+                r = fn(r, *args)
+                timing(name, time.perf_counter() - t)
+
+        if r.size and r[0][2] == -1:
+            self.seam = (True, float(r[0][0]), float(r[0][1]))
+        else:
+            self.seam = (False, 0., 0.)
+        if timing is None:
+            return r, self.modbus_msg(id, *self.seam)
+        t = time.perf_counter()
+        m = self.modbus_msg(id, *self.seam)
+        timing('modbus', time.perf_counter() - t)
+        return r, m
+
+    def plugin(self, r: np.ndarray):
+        """
+        Apply the active code, inline or in a worker process with a deadline.
+
+        A frame missing the deadline comes back as it was, without a picked seam.
+
+        :param r: Point cloud in nunpy.
+        :type r: np.ndarray
+        :return: The result of the code.
+        :rtype: np.ndarray
+        """
+        t = time.perf_counter()
+        try:
+            if self.pool is None:
+                return self.codes(r)
+            code = self.codes.snapshot().code
+            if not code.ok:
+                return code(r)
+            self.pool.load(code.source, code.digest)
+            return self.pool(r)
+        finally:
+            self.plugin_times.append(time.perf_counter() - t)
+
+    def pick(self, ret):
+        """
+        Choose among candidates returned by codes, the closest to the tracked seam by score.
+
+        :param ret: The result of codes, points or a tuple of points and candidates.
+        :type ret: np.ndarray or tuple
+        :return: Points with the chosen candidate first as i == -1.
+        :rtype: np.ndarray
+        """
+        return resolve(ret, self.tracker.predict(), sigma=self.tracker.gate)
+
+    def locate(self, r: np.ndarray):
+        """
+        Apply the active code around the tracked seam, or on the full profile.
+
+        The full profile is searched again if nothing is picked in the window,
+        or the pick is out of the gate, then only the full search counts for the tracker.
+        A pick the tracker rejects is marked as i == -7, so it is not sent as valid.
+        Codes get a copy of the window, as they may label points in place.
+        If the window is picked, the result only covers its rows.
+
+        :param r: Point cloud in nunpy.
+        :type r: np.ndarray
+        :return: The result of the code.
+        :rtype: np.ndarray
+        """
+        roi = self.tracker.roi(r)
+        if roi != slice(None):
+            ret = self.pick(self.plugin(r[roi].copy()))
+            if ret.size and ret[0][2] == -1 and self.tracker.accepts(ret[0][0], ret[0][1]):
+                self.tracker.update(ret[0][0], ret[0][1])
+                return ret
+        ret = self.pick(self.plugin(r))
+        if not (ret.size and ret[0][2] == -1):
+            self.tracker.miss()
+        elif not self.tracker.update(ret[0][0], ret[0][1]):
+            self.tracker.miss()
+            ret[0][2] = REJECTED
+        return ret
+
+    def filter(self, r: np.ndarray):
+        """
+        Check stability of the picked point in time space.
+
+        :param r: Point cloud in nunpy.
+        :type r: np.ndarray
+        :return: The input is modified in place and returned.
+        :rtype: np.ndarray
+        """
+        return self.ring(r)
+
+    def offset(self, r: np.ndarray):
+        """
+        Offset the picked point in milli meter.
+
+        :param r: Point cloud in nunpy.
+        :type r: np.ndarray
+        :return: The input is modified in place and returned.
+        :rtype: np.ndarray
+        """
+        if r[0][2] == -1:
+            r[0][0] += self.delta_x
+            r[0][1] += self.delta_y
+        return r
+
+    def compensate(self, r: np.ndarray, stamp: float, now: float = None):
+        """
+        Extrapolate the picked point from stamp to now, the time it is sent.
+
+        :param r: Point cloud in nunpy.
+        :type r: np.ndarray
+        :param stamp: Exposure time in seconds.
+        :type stamp: float
+        :param now: Send time in seconds, read from clock if None.
+        :type now: float
+        :return: The input is modified in place and returned.
+        :rtype: np.ndarray
+        """
+        return self.compensator(r, stamp, self.clock() if now is None else now)
+
+    def notnan(self, r: np.ndarray):
+        mask = ~np.isnan(r['x'])
+        return r[mask]
+
+    def modbus_msg(self, id: str, valid: bool, u: float, v: float):
+        """
+        Encode the seam into a modbus write multiple registers frame.
+
+        :param id: Frame id, used as transaction identifier.
+        :type id: str
+        :return: The frame, registers are zeroed if u or v is out of range.
+        :rtype: bytes
+        """
+        return self.encoder.encode(int(id), valid, u, v)
@@ -1,4 +1,4 @@
-"""Provide a Codes as list of string."""
+"""Provide a Codes as sequence of string."""
 
 # Copyright 2019 Zhushi Tech, Inc.
 #
@@ -15,9 +15,15 @@
 # limitations under the License.
 
 # import json
+import hashlib
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 from threading import RLock
 
+from .pipeline import Pipeline
+
 
 def _lock(f):
     """Decorater to protect from data race."""
@@ -28,27 +34,51 @@ def _lock(f):
     return wrapper
 
 
+def digest(s: str):
+    """
+    Return content hash of source code.
+
+    :param s: Source code.
+    :type s: str
+    :return: Hex digest.
+    :rtype: str
+    """
+    return hashlib.sha1(s.encode()).hexdigest()
+
+
 class _Code():
     """
     A local namespace wraps names in source code.
 
-    Source code in string form will be executed.
+    Source code in string form will be compiled and executed once.
     Names are saved in local scope from which the fn shall find.
+    Errors are kept and raised when the fn is called.
     """
 
-    def __init__(self):
-        """Initialize self with a local namespace."""
-        self._scope = {}
-
-    def reload(self, s: str):
+    def __init__(self, s: str = ''):
         """
-        Reload, execute code via exec and saved as a local namespace.
+        Compile and execute code via exec, saved as a local namespace.
 
         :param s: Code to execute.
         :type s: str
         """
+        self.source = s
+        self.digest = digest(s)
+        self.error = None
         self._scope = {}
-        exec(s, self._scope)
+        try:
+            exec(compile(s, f'<codes {self.digest[:8]}>', 'exec'), self._scope)
+        except Exception as e:
+            self.error = e
+        self.fn = self._scope['fn'] if self.ok else self._fail
+        # Optional stage name in a pipeline.
+        name = self._scope.get('NAME')
+        self.name = name if isinstance(name, str) else None
+
+    @property
+    def ok(self):
+        """Return True if the code is loaded and defines fn."""
+        return self.error is None and 'fn' in self._scope
 
     def __call__(self, *args, **kwargs):
         """
@@ -57,6 +87,9 @@ class _Code():
         The fn signature receives a np.array with data type as:
         dtype([('x', np.float32), ('y', np.float32), ('i', np.float32)]).
         It is expected to return a np.array with the same data type as the input.
+        It may instead return a tuple of such np.array without picked seam, and candidates
+        with data type dtype([('x', np.float32), ('y', np.float32), ('score', np.float32)]),
+        the node picks one by score and by distance to the tracked seam.
         The downstream nodes GUI for example can utilize extra infomations encoded in 'i' like:
         Laser line points: i >= 0
         Picked seam: i == -1
@@ -64,45 +97,231 @@ class _Code():
         Points selected to fit line B: i == -3
         Line A: i == -4
         Line B: i == -5
+        Candidates not picked: i == -6
+        Picked seam rejected by the tracker: i == -7
 
         :return: The result of fn.
         :rtype: np.array
         """
-        return self._scope['fn'](*args, **kwargs)
+        return self.fn(*args, **kwargs)
+
+    def _fail(self, *args, **kwargs):
+        if self.error is not None:
+            raise RuntimeError(f'Failed to load code: {self.error}')
+        raise KeyError('fn')
+
+
+# Immutable state read by frames: sources, index and code of the task, and its fn.
+_Snapshot = namedtuple('_Snapshot', ['sources', 'task', 'code', 'fn'])
 
 
-class Codes(list):
+class Codes():
     """
-    Customized code list to protect from data race.
+    Customized code sequence to protect from data race.
 
-    Behave exactly as build-in list.
+    Behave as a sequence of source code, supports slice assignment and deletion.
+    Every code is compiled once and cached by its content hash,
+    switching between codes only swaps a prepared namespace.
+
+    Writers are serialized by a lock and copy on write:
+    each change builds a new immutable snapshot and publishes it with a single reference swap.
+    Readers, including the per frame call, only dereference the current snapshot.
+    Codes can be loaded in a background thread, frames keep going to the previous code meanwhile.
     """
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    def __init__(self, sources=()):
+        """
+        Initialize self with source codes, no code is active yet.
+
+        :param sources: Source codes.
+        :type sources: iterable
+        """
         self._lock = RLock()
-        self._code = _Code()
+        self._cache = {}
+        code = _Code()
+        self._snap = _Snapshot(tuple(sources), None, code, code.fn)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='codes')
+        self._generation = 0
+        self._status = {'task': None, 'state': 'idle', 'error': None, 'seconds': 0.}
 
-    @_lock
-    def __getitem__(self, *args, **kwargs):
-        return super().__getitem__(*args, **kwargs)
+    def __getitem__(self, key):
+        return self._snap.sources[key]
 
-    @_lock
-    def __setitem__(self, *args, **kwargs):
-        return super().__setitem__(*args, **kwargs)
+    def __len__(self):
+        return len(self._snap.sources)
 
-    @_lock
-    def __delitem__(self, *args, **kwargs):
-        return super().__delitem__(*args, **kwargs)
+    def __iter__(self):
+        return iter(self._snap.sources)
+
+    def __repr__(self):
+        return f'Codes({list(self._snap.sources)!r})'
+
+    def __call__(self, *args, **kwargs):
+        return self._snap.fn(*args, **kwargs)
 
     @_lock
-    def __len__(self, *args, **kwargs):
-        return super().__len__(*args, **kwargs)
+    def __setitem__(self, key, value):
+        sources = list(self._snap.sources)
+        sources[key] = value
+        self._snap = self._snap._replace(sources=tuple(sources))
 
     @_lock
-    def __call__(self, *args, **kwargs):
-        return self._code(*args, **kwargs)
+    def __delitem__(self, key):
+        sources = list(self._snap.sources)
+        del sources[key]
+        self._snap = self._snap._replace(sources=tuple(sources))
+
+    def snapshot(self):
+        """
+        Return the current immutable snapshot.
+
+        :return: Sources, index of active task, active code and its fn.
+        :rtype: namedtuple
+        """
+        return self._snap
+
+    def prepare(self):
+        """
+        Compile every code not seen yet and drop the ones no longer listed.
+
+        :return: Errors by index of code.
+        :rtype: dict
+        """
+        with self._lock:
+            sources = self._snap.sources
+            cache = dict(self._cache)
+        errors, cache = self._prepare(sources, cache)
+        with self._lock:
+            self._cache = cache
+        return errors
 
     @_lock
-    def reload(self, id: int):
-        self._code.reload(self[id])
+    def reload(self, id):
+        """
+        Switch to the code at index id, compile it if not prepared yet.
+
+        :param id: Index of code, or indices of codes to chain as a pipeline.
+        :type id: int or sequence
+        """
+        sources = self._snap.sources
+        for i in self._ids(id):
+            h = digest(sources[i])
+            if h not in self._cache:
+                self._cache[h] = _Code(sources[i])
+        id = self._key(id)
+        self._publish(id, self._build(id, sources, self._cache))
+
+    def load(self, id, frame=None):
+        """
+        Prepare all codes and switch to the code at index id in background.
+
+        Calls keep going to the previous code until the new one is published.
+        A newer load supersedes the ones still pending, their state is 'superseded'.
+        Several indices chain their codes as stages of a Pipeline, in the given order.
+
+        :param id: Index of code, or indices of codes.
+        :type id: int or sequence
+        :param frame: Optional frame to warm up the code with, a copy is passed.
+        :type frame: np.ndarray
+        :return: A future of status, plus load errors of all codes by index.
+        :rtype: concurrent.futures.Future
+        """
+        id = self._key(id)
+        with self._lock:
+            self._generation += 1
+            self._status = {'task': id, 'state': 'loading', 'error': None, 'seconds': 0.}
+            return self._executor.submit(self._load, self._generation, id, frame)
+
+    def status(self):
+        """
+        Return status of the latest load.
+
+        :return: Task index or tuple of indices, state ('idle', 'loading', 'ready' or 'failed'),
+            error message and seconds spent.
+        :rtype: dict
+        """
+        with self._lock:
+            return dict(self._status)
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop the background thread.
+
+        :param wait: Wait for pending loads.
+        :type wait: bool
+        """
+        self._executor.shutdown(wait=wait)
+
+    @staticmethod
+    def _key(id):
+        return id if isinstance(id, int) else tuple(int(i) for i in id)
+
+    @staticmethod
+    def _ids(id):
+        return (id,) if isinstance(id, int) else id
+
+    @classmethod
+    def _build(cls, id, sources: tuple, cache: dict):
+        """Return the prepared code of index id, or a Pipeline of several."""
+        if isinstance(id, int):
+            return cache[digest(sources[id])]
+        stages = []
+        for i in id:
+            code = cache[digest(sources[i])]
+            name = code.name or str(i)
+            if any(name == n for n, _ in stages):
+                name = f'{name}.{len(stages)}'
+            stages.append((name, code))
+        return Pipeline(stages)
+
+    def _publish(self, id, code):
+        self._snap = self._snap._replace(task=id, code=code, fn=code.fn)
+
+    def _load(self, generation: int, id, frame):
+        t = time.monotonic()
+        with self._lock:
+            if generation != self._generation:
+                return {'task': id, 'state': 'superseded', 'error': None, 'seconds': 0.,
+                        'errors': {}}
+            sources = self._snap.sources
+            cache = dict(self._cache)
+        errors, cache = self._prepare(sources, cache)
+
+        try:
+            code = self._build(id, sources, cache)
+        except IndexError as e:
+            code, error = None, e
+        else:
+            error = code.error
+            if error is None and frame is not None:
+                try:
+                    code(frame.copy())
+                except Exception as e:
+                    error = e
+
+        with self._lock:
+            if generation != self._generation:
+                self._cache.update(cache)
+                return {'task': id, 'state': 'superseded', 'error': None,
+                        'seconds': time.monotonic() - t, 'errors': errors}
+            self._cache = cache
+            if code is not None:
+                self._publish(id, code)
+            self._status = {
+                'task': id,
+                'state': 'failed' if error else 'ready',
+                'error': None if error is None else str(error),
+                'seconds': time.monotonic() - t}
+            return dict(self._status, errors=errors)
+
+    @staticmethod
+    def _prepare(sources: tuple, cache: dict):
+        errors = {}
+        ret = {}
+        for i, s in enumerate(sources):
+            h = digest(s)
+            if h not in ret:
+                ret[h] = cache[h] if h in cache else _Code(s)
+            if ret[h].error:
+                errors[i] = ret[h].error
+        return errors, ret
@@ -0,0 +1,105 @@
+"""Provide latency compensation of the picked seam by extrapolation."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import deque
+
+import numpy as np
+
+
+class LatencyCompensator():
+    """
+    Extrapolate the picked seam from its exposure time to the time it is sent.
+
+    The velocity is fitted by least squares over the latest valid seams and their stamps,
+    seams older than `horizon` seconds are forgotten so a lost seam does not leave a stale trend.
+    The lead is capped by `max_lead` seconds, a frame delayed more is not extrapolated further.
+    """
+
+    def __init__(
+        self,
+        *,
+        enable: bool = False,
+        window: int = 5,
+        horizon: float = 0.5,
+        max_lead: float = 0.1
+    ):
+        """
+        Initialize self with empty history.
+
+        :param enable: Apply the compensation, otherwise only record history.
+        :type enable: bool
+        :param window: Number of seams to fit velocity, at least 2.
+        :type window: int
+        :param horizon: Seconds to keep seams.
+        :type horizon: float
+        :param max_lead: Max seconds to extrapolate.
+        :type max_lead: float
+        """
+        self.enable = enable
+        self.window = window
+        self.horizon = horizon
+        self.max_lead = max_lead
+        self._history = deque()
+        self.lead = 0.
+        self.delta = (0., 0.)
+
+    def velocity(self):
+        """
+        Return the fitted velocity.
+
+        :return: vx and vy in mm per second, or None with less than 2 seams.
+        :rtype: tuple
+        """
+        if len(self._history) < 2:
+            return None
+        h = np.array(self._history)
+        t = h[:, 0] - h[:, 0].mean()
+        tt = np.dot(t, t)
+        if tt <= 0:
+            return None
+        v = t @ (h[:, 1:] - h[:, 1:].mean(axis=0)) / tt
+        return float(v[0]), float(v[1])
+
+    def __call__(self, r: np.ndarray, stamp: float, now: float):
+        """
+        Record the picked seam and move it to the send time.
+
+        :param r: Point cloud in numpy, the picked seam is r[0] if r[0]['i'] == -1.
+        :type r: np.ndarray
+        :param stamp: Exposure time in seconds.
+        :type stamp: float
+        :param now: Send time in seconds, same clock as stamp.
+        :type now: float
+        :return: The input is modified in place and returned.
+        :rtype: np.ndarray
+        """
+        self.lead = 0.
+        self.delta = (0., 0.)
+        while self._history and (
+                self._history[0][0] < stamp - self.horizon or len(self._history) >= self.window):
+            self._history.popleft()
+        if not (r.size and r[0][2] == -1):
+            return r
+        self._history.append((stamp, float(r[0][0]), float(r[0][1])))
+
+        v = self.velocity()
+        if not self.enable or v is None:
+            return r
+        self.lead = min(max(now - stamp, 0.), self.max_lead)
+        self.delta = (v[0] * self.lead, v[1] * self.lead)
+        r[0][0] += self.delta[0]
+        r[0][1] += self.delta[1]
+        return r
@@ -0,0 +1,152 @@
+"""Provide fixed size latency histograms, cheap enough to record every stage of every frame."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+import numpy as np
+
+# Sub buckets per power of two, relative error within 1 / 16.
+_BITS = 5
+_HALF = 1 << (_BITS - 1)
+
+
+def _index(us: int):
+    if us < (1 << _BITS):
+        return us
+    e = us.bit_length() - _BITS
+    return e * _HALF + (us >> e)
+
+
+def _upper(k: np.ndarray):
+    """Return the highest value in microseconds of buckets k."""
+    k = np.asarray(k, dtype=np.int64)
+    e = np.maximum(k // _HALF - 1, 0)
+    m = k - e * _HALF
+    return np.where(k < (1 << _BITS), k, ((m + 1) << e) - 1)
+
+
+class Histogram():
+    """
+    Log linear histogram of durations in microseconds, as HDR histograms.
+
+    Buckets are linear within each power of two, so the error is relative, not absolute.
+    Durations beyond `highest` seconds fall into the last bucket.
+    Recording takes no lock, only a single thread is expected to record.
+    """
+
+    def __init__(self, highest: float = 60.):
+        """
+        Initialize self.
+
+        :param highest: Highest duration tracked in seconds.
+        :type highest: float
+        """
+        self._last = _index(int(highest * 1e6))
+        self._counts = [0] * (self._last + 1)
+        self.count = 0
+        self.max = 0.
+
+    def record(self, seconds: float):
+        """
+        Count a duration, negative ones as zero.
+
+        :param seconds: Duration in seconds.
+        :type seconds: float
+        """
+        us = int(seconds * 1e6)
+        k = _index(us) if us > 0 else 0
+        self._counts[k if k < self._last else self._last] += 1
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def reset(self):
+        """Clear all counts."""
+        self._counts = [0] * (self._last + 1)
+        self.count = 0
+        self.max = 0.
+
+    def percentiles(self, qs):
+        """
+        Return durations at percentiles, the highest value of the bucket each falls in.
+
+        :param qs: Percentiles in [0, 100].
+        :type qs: sequence
+        :return: Durations in seconds, nan if nothing is recorded.
+        :rtype: np.ndarray
+        """
+        counts = np.array(self._counts, dtype=np.int64)
+        n = int(counts.sum())
+        if n == 0:
+            return np.full(len(qs), np.nan)
+        rank = np.maximum(np.ceil(np.asarray(qs, dtype=np.float64) / 100. * n), 1)
+        k = np.searchsorted(np.cumsum(counts), rank)
+        return np.minimum(_upper(k) * 1e-6, self.max)
+
+
+class LatencyStats():
+    """
+    Histograms of named stages, recorded with monotonic timestamps.
+
+    Call lap with the time the stage started, it returns the time the next one starts.
+    """
+
+    def __init__(self, names, highest: float = 60.):
+        """
+        Initialize self with a histogram per name.
+
+        :param names: Stage names, in the order they are reported.
+        :type names: iterable
+        :param highest: Highest duration tracked in seconds.
+        :type highest: float
+        """
+        self.hists = {name: Histogram(highest) for name in names}
+
+    def record(self, name: str, seconds: float):
+        """Count a duration of a stage."""
+        self.hists[name].record(seconds)
+
+    def lap(self, name: str, t: float):
+        """
+        Count the time since t for a stage.
+
+        :param name: Stage name.
+        :type name: str
+        :param t: Start of the stage from time.perf_counter.
+        :type t: float
+        :return: Now, from time.perf_counter.
+        :rtype: float
+        """
+        now = time.perf_counter()
+        self.hists[name].record(now - t)
+        return now
+
+    def reset(self):
+        """Clear all histograms."""
+        for h in self.hists.values():
+            h.reset()
+
+    def summary(self, qs=(50, 99, 99.9)):
+        """
+        Return count, durations at percentiles and max per stage.
+
+        :param qs: Percentiles in [0, 100].
+        :type qs: sequence
+        :return: Stage name to count, durations in seconds at qs and max.
+        :rtype: dict
+        """
+        return {
+            name: (h.count, *h.percentiles(qs), h.max) for name, h in self.hists.items()}
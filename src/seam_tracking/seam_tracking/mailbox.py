@@ -0,0 +1,83 @@
+"""Provide a conflating mailbox which never blocks the producer."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import deque
+from threading import Lock
+
+
+class Mailbox():
+    """
+    Bounded mailbox keeping only the latest items.
+
+    A put into a full mailbox overwrites the oldest item and counts it as dropped.
+    With size 1, the consumer always gets the newest item.
+    Neither put nor get ever wait.
+    """
+
+    def __init__(self, size: int = 1, notify=None):
+        """
+        Initialize self with a number of slots.
+
+        :param size: Number of slots, at least 1.
+        :type size: int
+        :param notify: Called without arguments after each put, from the producer thread.
+        :type notify: callable
+        """
+        if size < 1:
+            raise ValueError(f'Mailbox size must be at least 1: {size}')
+        self._lock = Lock()
+        self._deq = deque(maxlen=size)
+        self._put = 0
+        self._dropped = 0
+        self.notify = notify
+
+    def __len__(self):
+        """Return the number of items waiting."""
+        with self._lock:
+            return len(self._deq)
+
+    @property
+    def dropped(self):
+        """Return the number of items overwritten before being taken."""
+        return self._dropped
+
+    @property
+    def count(self):
+        """Return the number of items put."""
+        return self._put
+
+    def put(self, item):
+        """
+        Put an item, overwrite the oldest one if full.
+
+        :param item: Anything but None.
+        """
+        with self._lock:
+            if len(self._deq) == self._deq.maxlen:
+                self._dropped += 1
+            self._deq.append(item)
+            self._put += 1
+        if self.notify is not None:
+            self.notify()
+
+    def get(self):
+        """
+        Take the oldest item.
+
+        :return: The oldest item or None if empty.
+        """
+        with self._lock:
+            return self._deq.popleft() if self._deq else None
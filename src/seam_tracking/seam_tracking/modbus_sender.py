@@ -0,0 +1,225 @@
+"""Provide an asyncio based modbus sender living in the node process."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+from threading import Lock, Thread
+
+from .mailbox import Mailbox
+
+
+def parse_response(s: bytes):
+    """
+    Parse a modbus TCP response to write multiple registers.
+
+    :param s: The complete response, MBAP header included.
+    :type s: bytes
+    :return: Transaction identifier, success and exception code (0 if success).
+    :rtype: tuple
+    """
+    if len(s) < 9:
+        raise ValueError(f'Modbus response too short: {len(s)} bytes')
+    id = int.from_bytes(s[0:2], 'big')
+    fc = s[7]
+    if fc == 0x10:
+        return id, True, 0
+    elif fc == 0x90:
+        return id, False, s[8]
+    else:
+        raise ValueError(f'Unexpected modbus function code: {fc:#x}')
+
+
+class ModbusSender():
+    """
+    Send modbus frames to a server from an asyncio loop in a dedicated thread.
+
+    Frames are put into a conflating mailbox without blocking.
+    Only one request is in flight, frames arriving meanwhile overwrite the oldest pending one,
+    so a slow link always gets the latest values.
+    Each response is parsed for success and round trip time.
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 1502,
+        *,
+        size: int = 1,
+        timeout: float = 0.5,
+        retry: float = 5.
+    ):
+        """
+        Initialize self.
+
+        :param host: Server address.
+        :type host: str
+        :param port: Server port.
+        :type port: int
+        :param size: Number of pending frames to keep, older ones are dropped.
+        :type size: int
+        :param timeout: Seconds to wait for a response.
+        :type timeout: float
+        :param retry: Seconds to wait before reconnecting.
+        :type retry: float
+        """
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._retry = retry
+
+        self._lock = Lock()
+        self._mailbox = Mailbox(size, self._notify)
+        self._loop = None
+        self._event = None
+        self._thread = None
+
+        self._stats = {
+            'sent': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'connected': False,
+            'rtt': None,
+            'rtt_max': 0.,
+            'rtt_sum': 0.,
+        }
+
+    def start(self):
+        """Start the loop in a dedicated thread."""
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(self._main())
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the loop and wait for the thread to exit."""
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._task.cancel)
+        self._thread.join()
+        self._thread = None
+
+    def send(self, frame: bytes):
+        """
+        Put a frame into the mailbox without blocking.
+
+        :param frame: A complete modbus TCP request.
+        :type frame: bytes
+        """
+        self._mailbox.put(frame)
+
+    def stats(self):
+        """
+        Return a copy of counters and round trip times in seconds.
+
+        :return: Counters sent, succeeded, failed, dropped, connected state,
+            last, max and mean round trip time.
+        :rtype: dict
+        """
+        with self._lock:
+            s = dict(self._stats)
+        s['dropped'] = self._mailbox.dropped
+        n = s['succeeded'] + s['failed']
+        s['rtt_mean'] = s.pop('rtt_sum') / n if n else None
+        return s
+
+    def _notify(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        if self._event is not None:
+            self._event.set()
+
+    def _update(self, **kwargs):
+        with self._lock:
+            self._stats.update(kwargs)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _record(self, ok: bool, rtt: float):
+        with self._lock:
+            self._stats['succeeded' if ok else 'failed'] += 1
+            self._stats['rtt'] = rtt
+            self._stats['rtt_max'] = max(self._stats['rtt_max'], rtt)
+            self._stats['rtt_sum'] += rtt
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    async def _main(self):
+        # Created here to bind to this loop on older python.
+        self._event = asyncio.Event()
+        if len(self._mailbox):
+            self._event.set()
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self._host, self._port)
+            except OSError:
+                await asyncio.sleep(self._retry)
+                continue
+            self._update(connected=True)
+            try:
+                await self._serve(reader, writer)
+            except (OSError, ValueError, asyncio.IncompleteReadError):
+                pass
+            finally:
+                self._update(connected=False)
+                writer.close()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        while True:
+            await self._event.wait()
+            self._event.clear()
+            frame = self._mailbox.get()
+            while frame is not None:
+                await self._request(reader, writer, frame)
+                frame = self._mailbox.get()
+
+    async def _request(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        frame: bytes
+    ):
+        t = time.monotonic()
+        writer.write(frame)
+        await writer.drain()
+        self._count('sent')
+
+        try:
+            head = await asyncio.wait_for(reader.readexactly(7), self._timeout)
+            body = await asyncio.wait_for(
+                reader.readexactly(int.from_bytes(head[4:6], 'big') - 1),
+                self._timeout)
+        except asyncio.TimeoutError:
+            # The reply may still come, drop the link to stay in sync.
+            self._record(False, time.monotonic() - t)
+            raise OSError('Modbus response timeout')
+
+        try:
+            id, ok, _ = parse_response(head + body)
+        except ValueError:
+            self._record(False, time.monotonic() - t)
+            raise
+        self._record(ok and id == int.from_bytes(frame[0:2], 'big'), time.monotonic() - t)
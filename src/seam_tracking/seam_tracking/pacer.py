@@ -0,0 +1,85 @@
+"""Provide a loop pacer on absolute deadlines, for sources publishing at a target rate."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from threading import Event
+
+
+class Pacer():
+    """
+    Pace a loop at a rate without drift.
+
+    Deadlines are absolute, time spent in the loop does not add up.
+    A deadline already passed by more than a period is skipped and counted as late,
+    so the loop never bursts to catch up.
+    The rate can be changed while the loop runs.
+    """
+
+    def __init__(self, rate: float, *, clock=time.perf_counter, sleep=None):
+        """
+        Initialize self.
+
+        :param rate: Iterations per second.
+        :type rate: float
+        :param clock: Callable returning seconds.
+        :type clock: callable
+        :param sleep: Callable sleeping the given seconds, returning True if stopped,
+            waits on the stop event by default.
+        :type sleep: callable
+        """
+        self.rate = rate
+        self.late = 0
+        self._deadline = None
+        self._stop = Event()
+        self._clock = clock
+        self._sleep = self._stop.wait if sleep is None else sleep
+
+    @property
+    def rate(self):
+        """Return iterations per second."""
+        return 1. / self.period
+
+    @rate.setter
+    def rate(self, value: float):
+        if value <= 0:
+            raise ValueError(f'Rate must be positive: {value}')
+        self.period = 1. / value
+
+    def stop(self):
+        """Wake up and end the loop."""
+        self._stop.set()
+
+    def wait(self):
+        """
+        Wait for the next deadline, the first one is now.
+
+        :return: False once stopped.
+        :rtype: bool
+        """
+        now = self._clock()
+        if self._deadline is None:
+            self._deadline = now
+        else:
+            self._deadline += self.period
+            if now - self._deadline > self.period:
+                n = int((now - self._deadline) / self.period)
+                self.late += n
+                self._deadline += n * self.period
+        while now < self._deadline:
+            if self._sleep(self._deadline - now):
+                return False
+            now = self._clock()
+        return not self._stop.is_set()
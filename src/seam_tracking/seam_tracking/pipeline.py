@@ -0,0 +1,214 @@
+"""Provide a chain of codes sharing per frame features."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import inspect
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class Context():
+    """
+    Per frame context shared by stages.
+
+    Features of the current points are computed on first use and memoized.
+    The memo is cleared when a stage returns other points than it got;
+    a stage changing x or y in place shall call invalidate.
+    Free form values can be shared through `data`, kept for the whole frame.
+    """
+
+    def __init__(self, pnts: np.ndarray):
+        """
+        Initialize self with the input points of the frame.
+
+        :param pnts: Points with dtype x, y, i in float32.
+        :type pnts: np.ndarray
+        """
+        self.data = {}
+        self._pnts = pnts
+        self._memo = {}
+
+    @property
+    def pnts(self):
+        """Return the points features are computed from."""
+        return self._pnts
+
+    def reset(self, pnts: np.ndarray):
+        """Point to new points, the memo is cleared if they are other points."""
+        if pnts is not self._pnts:
+            self._pnts = pnts
+            self._memo.clear()
+
+    def invalidate(self):
+        """Clear memoized features."""
+        self._memo.clear()
+
+    def memo(self, key, fn):
+        """
+        Return fn(pnts), computed once per key.
+
+        :param key: Any hashable key.
+        :param fn: Called with the points if key is not memoized.
+        :type fn: callable
+        """
+        try:
+            return self._memo[key]
+        except KeyError:
+            ret = self._memo[key] = fn(self._pnts)
+            return ret
+
+    def valid(self):
+        """Return mask of points with both x and y."""
+        return self.memo('valid', lambda p: ~(np.isnan(p['x']) | np.isnan(p['y'])))
+
+    def diff(self, field: str = 'y', n: int = 1):
+        """Return the n-th difference of a field, one point shorter per order."""
+        return self.memo(
+            ('diff', field, n), lambda p: np.diff(p[field].astype(np.float64), n=n))
+
+    def slope(self):
+        """Return dy / dx between consecutive points."""
+        def fn(p):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return self.diff('y') / self.diff('x')
+        return self.memo('slope', fn)
+
+    def gradient(self):
+        """Return dy / dx at each point by central differences."""
+        def fn(p):
+            x = p['x'].astype(np.float64)
+            if x.size < 2:
+                return np.full(x.shape, np.nan)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.gradient(p['y'].astype(np.float64), x)
+        return self.memo('gradient', fn)
+
+    def curvature(self):
+        """Return y'' / (1 + y'^2)^1.5 at each point."""
+        def fn(p):
+            g = self.gradient()
+            x = p['x'].astype(np.float64)
+            if x.size < 2:
+                return np.full(x.shape, np.nan)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.gradient(g, x) / (1 + g * g) ** 1.5
+        return self.memo('curvature', fn)
+
+    def median(self, k: int, field: str = 'y'):
+        """Return the centered rolling median over k points ignoring nan, nan at both ends."""
+        def fn(p):
+            v = p[field].astype(np.float64)
+            ret = np.full(v.shape, np.nan)
+            if k < 1 or v.size < k:
+                return ret
+            w = sliding_window_view(v, k)
+            ok = ~np.isnan(w).all(axis=1)
+            m = np.full(w.shape[0], np.nan)
+            m[ok] = np.nanmedian(w[ok], axis=1)
+            ret[(k - 1) // 2:(k - 1) // 2 + m.size] = m
+            return ret
+        return self.memo(('median', field, k), fn)
+
+
+def _takes_context(fn):
+    try:
+        params = inspect.signature(fn).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    n = 0
+    for p in params:
+        if p.kind == p.VAR_POSITIONAL:
+            return True
+        if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD):
+            n += 1
+    return n >= 2
+
+
+class Pipeline():
+    """
+    Run codes as ordered stages on the same frame.
+
+    Each stage gets the output of the previous one.
+    A fn taking two arguments, fn(pnts, ctx), also gets the shared Context of the frame.
+    Time spent per stage is recorded.
+    Behave as a loaded code: fn, ok, error, source and digest.
+    """
+
+    def __init__(self, stages):
+        """
+        Initialize self.
+
+        :param stages: Pairs of name and loaded code.
+        :type stages: iterable
+        """
+        self.stages = tuple(stages)
+        self._ctx = tuple(_takes_context(c.fn) for _, c in self.stages)
+        self.source = tuple((name, c.source) for name, c in self.stages)
+        self.digest = hashlib.sha1(
+            ''.join(c.digest for _, c in self.stages).encode()).hexdigest()
+        self.error = next((c.error for _, c in self.stages if c.error is not None), None)
+        self.fn = self
+        n = len(self.stages)
+        self._count = np.zeros(n, dtype=np.int64)
+        self._last = np.zeros(n)
+        self._sum = np.zeros(n)
+        self._max = np.zeros(n)
+
+    @property
+    def ok(self):
+        """Return True if every stage is loaded and defines fn."""
+        return all(c.ok for _, c in self.stages)
+
+    def __call__(self, pnts: np.ndarray):
+        """
+        Run the stages in order.
+
+        :param pnts: Points with dtype x, y, i in float32.
+        :type pnts: np.ndarray
+        :return: The result of the last stage.
+        :rtype: np.ndarray
+        """
+        ctx = Context(pnts)
+        for k, (_, code) in enumerate(self.stages):
+            t = time.perf_counter()
+            try:
+                pnts = code.fn(pnts, ctx) if self._ctx[k] else code.fn(pnts)
+            finally:
+                t = time.perf_counter() - t
+                self._count[k] += 1
+                self._last[k] = t
+                self._sum[k] += t
+                self._max[k] = max(self._max[k], t)
+            if k + 1 < len(self.stages):
+                ctx.reset(pnts)
+        return pnts
+
+    def stats(self):
+        """
+        Return time spent per stage in seconds, in order of stages.
+
+        :return: Stage name to count, last, mean and max.
+        :rtype: dict
+        """
+        return {
+            name: {
+                'count': int(self._count[k]),
+                'last': float(self._last[k]),
+                'mean': float(self._sum[k] / self._count[k]) if self._count[k] else None,
+                'max': float(self._max[k])}
+            for k, (name, _) in enumerate(self.stages)}
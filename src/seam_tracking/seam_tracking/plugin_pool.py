@@ -0,0 +1,230 @@
+"""Provide a pool of worker processes to run codes with a deadline per frame."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import multiprocessing as mp
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+from .codes import _Code
+from .pipeline import Pipeline
+
+dtype = np.dtype([(x, np.float32) for x in 'xyi'])
+
+
+def _worker(conn, name_in: str, name_out: str, capacity: int):
+    """
+    Worker loop, run code on points in shared memory.
+
+    Reply ('ready', None) once started, then commands received from the pipe:
+    ('load', source): compile and execute source, or pairs of stage name and source as a
+    pipeline, errors are reported by the next run.
+    ('run', n): call fn on the first n points, reply ('ok', m, candidates) with m points
+    written back and candidates if fn returned a tuple, else None, or ('error', message).
+    ('exit', None): quit.
+    """
+    shm_in = SharedMemory(name_in)
+    shm_out = SharedMemory(name_out)
+    src = np.ndarray((capacity,), dtype=dtype, buffer=shm_in.buf)
+    dst = np.ndarray((capacity,), dtype=dtype, buffer=shm_out.buf)
+    fn, error = None, 'No code loaded'
+    conn.send(('ready', None))
+    try:
+        while True:
+            cmd, arg = conn.recv()
+            if cmd == 'load':
+                if isinstance(arg, str):
+                    fn = _Code(arg).fn
+                else:
+                    fn = Pipeline((name, _Code(s)) for name, s in arg)
+            elif cmd == 'run':
+                if fn is None:
+                    conn.send(('error', error))
+                    continue
+                try:
+                    ret = fn(src[:arg].copy())
+                    cands = None
+                    if isinstance(ret, tuple):
+                        ret, cands = ret
+                        cands = np.asarray(cands)
+                    if ret.size > capacity:
+                        raise ValueError(f'Too many points returned: {ret.size}')
+                    dst[:ret.size] = ret
+                    conn.send(('ok', ret.size, cands))
+                except Exception as e:
+                    conn.send(('error', repr(e)))
+            else:
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del src, dst
+        shm_in.close()
+        shm_out.close()
+
+
+class _Worker():
+    """A warm worker process with its own input and output shared memory."""
+
+    def __init__(self, ctx, capacity: int, source: str):
+        size = capacity * dtype.itemsize
+        self.shm_in = SharedMemory(create=True, size=size)
+        self.shm_out = SharedMemory(create=True, size=size)
+        self.src = np.ndarray((capacity,), dtype=dtype, buffer=self.shm_in.buf)
+        self.dst = np.ndarray((capacity,), dtype=dtype, buffer=self.shm_out.buf)
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(
+            target=_worker,
+            args=(child, self.shm_in.name, self.shm_out.name, capacity),
+            daemon=True)
+        self.proc.start()
+        child.close()
+        self.ready = False
+        if source is not None:
+            self.conn.send(('load', source))
+
+    def poll(self, timeout: float = 0.):
+        """Return True once the process has started, raise EOFError if it died."""
+        if not self.ready and self.conn.poll(timeout):
+            self.ready = self.conn.recv()[0] == 'ready'
+        return self.ready
+
+    def close(self, kill: bool = False):
+        if not kill:
+            try:
+                self.conn.send(('exit', None))
+            except OSError:
+                pass
+            self.proc.join(1.)
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+        del self.src, self.dst
+        for shm in (self.shm_in, self.shm_out):
+            shm.close()
+            shm.unlink()
+
+
+class PluginPool():
+    """
+    Run codes in warm worker processes with a hard deadline per frame.
+
+    Points are passed through shared memory, only small commands go through pipes.
+    Workers start in the background, frames go to the first started worker.
+    A worker missing the deadline or found dead is killed and replaced while the others take over,
+    the frame is returned as it came in, without a picked seam, so it is reported as invalid.
+    """
+
+    def __init__(self, workers: int = 2, deadline: float = 0.05, capacity: int = 1 << 16):
+        """
+        Initialize self, start workers without waiting for them.
+
+        :param workers: Number of worker processes, spares take over while one is replaced.
+        :type workers: int
+        :param deadline: Seconds allowed per frame.
+        :type deadline: float
+        :param capacity: Max number of points per frame.
+        :type capacity: int
+        """
+        self.deadline = deadline
+        self._ctx = mp.get_context('spawn')
+        self._capacity = capacity
+        self._source = None
+        self._digest = None
+        self.missed = 0
+        self.recycled = 0
+        self._workers = [_Worker(self._ctx, capacity, None) for _ in range(max(workers, 1))]
+
+    def wait(self, timeout: float = 10.):
+        """
+        Wait for every worker to start.
+
+        :param timeout: Seconds to wait for each worker.
+        :type timeout: float
+        :return: True if all workers started.
+        :rtype: bool
+        """
+        return all(w.poll(timeout) for w in self._workers)
+
+    def load(self, source: str, digest: str = None):
+        """
+        Load source code into every worker, compiled before their next frame.
+
+        :param source: Source code defining fn, or pairs of stage name and source.
+        :type source: str or tuple
+        :param digest: Content hash, the load is skipped if unchanged.
+        :type digest: str
+        """
+        if digest is not None and digest == self._digest:
+            return
+        self._source, self._digest = source, digest
+        for i, w in enumerate(self._workers):
+            try:
+                w.conn.send(('load', source))
+            except OSError:
+                self._recycle(i)
+
+    def __call__(self, pnts: np.ndarray):
+        """
+        Run fn on points in a worker.
+
+        :param pnts: Points with dtype x, y, i in float32.
+        :type pnts: np.ndarray
+        :return: Result of fn, points and candidates if it returned a tuple,
+            or the input if the deadline is missed.
+        :rtype: np.ndarray or tuple
+        """
+        if pnts.size > self._capacity:
+            raise ValueError(f'Too many points: {pnts.size} > {self._capacity}')
+        i = next((i for i in range(len(self._workers)) if self._ready(i)), None)
+        if i is None:
+            self.missed += 1
+            return pnts
+        w = self._workers[i]
+        w.src[:pnts.size] = pnts
+        try:
+            w.conn.send(('run', pnts.size))
+            if not w.conn.poll(self.deadline):
+                raise TimeoutError
+            state, arg, *cands = w.conn.recv()
+        except (OSError, EOFError):
+            # Missed the deadline, or the process died, e.g. killed out of memory.
+            self.missed += 1
+            self._recycle(i)
+            return pnts
+        if state != 'ok':
+            raise RuntimeError(arg)
+        if cands[0] is not None:
+            return w.dst[:arg].copy(), cands[0]
+        return w.dst[:arg].copy()
+
+    def close(self):
+        """Stop all workers and release shared memory."""
+        for w in self._workers:
+            w.close()
+        self._workers = []
+
+    def _ready(self, i: int):
+        try:
+            return self._workers[i].poll()
+        except (OSError, EOFError):
+            self._recycle(i)
+            return False
+
+    def _recycle(self, i: int):
+        self._workers[i].close(kill=True)
+        self._workers[i] = _Worker(self._ctx, self._capacity, self._source)
+        self.recycled += 1
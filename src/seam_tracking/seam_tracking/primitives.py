@@ -0,0 +1,305 @@
+"""Provide vectorized building blocks for codes to locate seams."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+dtype = np.dtype([(x, np.float32) for x in 'xyi'])
+
+
+def interpolate(d: np.ndarray):
+    """
+    Spread points to their index in 'i', missing ones are filled with nan.
+
+    :param d: Points with dtype x, y, i in float32.
+    :type d: np.ndarray
+    :return: Points indexed by 'i'.
+    :rtype: np.ndarray
+    """
+    if d.size == 0:
+        return np.array([], dtype=dtype)
+    i = d['i'].astype(np.int64)
+    ret = np.full((int(i.max()) + 1,), np.nan, dtype=dtype)
+    ret[i] = d
+    return ret
+
+
+def _extrema(y: np.ndarray, delta: int):
+    """
+    Return indices of the first max in every block of delta, which are also max within delta.
+
+    Nan is never picked, a block of only nan has no candidate.
+    """
+    if delta < 1:
+        raise ValueError(f'delta must be at least 1: {delta}')
+    n = y.size
+    if n == 0:
+        return []
+    mask = np.isnan(y)
+    y = np.where(mask, -np.inf, y)
+
+    nb = -(-n // delta)
+    blocks = np.full(nb * delta, -np.inf)
+    blocks[:n] = y
+    valid = np.ones(nb * delta, dtype=bool)
+    valid[:n] = mask
+    valid = ~valid.reshape(nb, delta).all(axis=1)
+    id = np.argmax(blocks.reshape(nb, delta), axis=1) + np.arange(0, nb * delta, delta)
+    id = id[valid & (id >= delta - 1) & (id + delta <= n)]
+    if id.size == 0:
+        return []
+
+    # Window of 2 * delta - 1 centered on the candidate, first max has to be the center.
+    w = sliding_window_view(y, 2 * delta - 1)
+    return id[np.argmax(w[id - delta + 1], axis=1) == delta - 1].tolist()
+
+
+def local_max(d: np.ndarray, *, delta: int):
+    """
+    Find local maxima of y, at most one per block of delta points.
+
+    :param d: Points with dtype x, y, i in float32.
+    :type d: np.ndarray
+    :param delta: Block size, a maximum is kept if no point within delta - 1 is higher.
+    :type delta: int
+    :return: Indices in ascending order.
+    :rtype: list
+    """
+    return _extrema(d['y'].astype(np.float64), delta)
+
+
+def local_min(d: np.ndarray, *, delta: int):
+    """
+    Find local minima of y, at most one per block of delta points.
+
+    :param d: Points with dtype x, y, i in float32.
+    :type d: np.ndarray
+    :param delta: Block size, a minimum is kept if no point within delta - 1 is lower.
+    :type delta: int
+    :return: Indices in ascending order.
+    :rtype: list
+    """
+    return _extrema(-d['y'].astype(np.float64), delta)
+
+
+def fit_line(x: np.ndarray, y: np.ndarray):
+    """
+    Fit y = b + m * x by least squares in closed form.
+
+    :param x: Coordinates without nan.
+    :type x: np.ndarray
+    :param y: Coordinates without nan.
+    :type y: np.ndarray
+    :return: Intercept b and slope m, same order as numpy polyfit.
+    :rtype: tuple
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    xm = x.mean()
+    ym = y.mean()
+    dx = x - xm
+    with np.errstate(divide='ignore', invalid='ignore'):
+        m = np.dot(dx, y - ym) / np.dot(dx, dx)
+    return ym - m * xm, m
+
+
+def cross(d: np.ndarray, id: int, *, delta: int, num: int = None):
+    """
+    Intersect lines fitted on both sides of a point.
+
+    Points from id - num + 1 to id - delta are labelled -2 and fit line A,
+    points from id + delta + 1 to id + num - 1 are labelled -3 and fit line B.
+    Without num, sides extend to both ends.
+
+    :param d: Points with dtype x, y, i in float32, labels are written in place.
+    :type d: np.ndarray
+    :param id: Index of the point to split.
+    :type id: int
+    :param delta: Points to skip on both sides of id.
+    :type delta: int
+    :param num: Points to take from id on both sides.
+    :type num: int
+    :return: Picked point (-1), two points on line A (-4) and on line B (-5),
+        or empty if a side has less than 2 points.
+    :rtype: np.ndarray
+    """
+    s1 = None if num is None or id - num + 1 < 0 else id - num + 1
+    e1 = 0 if id - delta < 0 else id - delta
+    s2 = id + delta + 1
+    e2 = None if num is None else id + num
+
+    d['i'][s1:e1] = -2
+    d['i'][s2:e2] = -3
+    a = d[s1:e1]
+    b = d[s2:e2]
+    a = a[~np.isnan(a['x'])]
+    b = b[~np.isnan(b['x'])]
+    if a.size < 2 or b.size < 2:
+        return np.array([], dtype=dtype)
+    b1, m1 = fit_line(a['x'], a['y'])
+    b2, m2 = fit_line(b['x'], b['y'])
+    px = (b2 - b1) / (m1 - m2)
+    py = px * m1 + b1
+    return np.array([
+        (px, py, -1),
+        (0, b1, -4),
+        (100, 100 * m1 + b1, -4),
+        (0, b2, -5),
+        (100, 100 * m2 + b2, -5)],
+        dtype=dtype)
+
+
+cross_dtype = np.dtype([
+    ('x', np.float64), ('y', np.float64),
+    ('b1', np.float64), ('m1', np.float64),
+    ('b2', np.float64), ('m2', np.float64),
+    ('residual', np.float64)])
+
+
+def _sums(c: np.ndarray, s: np.ndarray, e: np.ndarray):
+    """Return sums of columns over rows [s, e) from prefix sums c."""
+    return c[e] - c[s]
+
+
+def _fit(n, sx, sy, sxx, sxy, syy):
+    """Return intercept, slope and squared residual sum per segment from raw sums."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cxx = sxx - sx * sx / n
+        cxy = sxy - sx * sy / n
+        cyy = syy - sy * sy / n
+        m = cxy / cxx
+        b = (sy - m * sx) / n
+        r = np.maximum(cyy - m * cxy, 0.)
+    bad = n < 2
+    b[bad] = m[bad] = r[bad] = np.nan
+    return b, m, r
+
+
+def cross_many(d: np.ndarray, ids, *, delta: int, num: int = None):
+    """
+    Intersect lines fitted on both sides of many points at once.
+
+    Sides are taken as in cross, without labelling points.
+    All fits come from prefix sums of x, y, x * x, x * y and y * y,
+    so the cost is O(N + K) for N points and K ids.
+
+    :param d: Points with dtype x, y, i in float32.
+    :type d: np.ndarray
+    :param ids: Indices of points to split.
+    :type ids: array_like
+    :param delta: Points to skip on both sides of each id.
+    :type delta: int
+    :param num: Points to take from each id on both sides.
+    :type num: int
+    :return: Per id intersection x, y, line A b1, m1, line B b2, m2,
+        and the sum of squared residuals of both fits, nan if a side has less than 2 points.
+    :rtype: np.ndarray
+    """
+    ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+    n = d.size
+    x = d['x'].astype(np.float64)
+    y = d['y'].astype(np.float64)
+    mask = ~(np.isnan(x) | np.isnan(y))
+    # Center to keep the subtractions of prefix sums accurate.
+    x0 = x[mask].mean() if mask.any() else 0.
+    y0 = y[mask].mean() if mask.any() else 0.
+    x = np.where(mask, x - x0, 0.)
+    y = np.where(mask, y - y0, 0.)
+
+    c = np.zeros((n + 1, 6))
+    np.cumsum(np.stack((mask, x, y, x * x, x * y, y * y), axis=1), axis=0, out=c[1:])
+
+    s1 = np.zeros_like(ids) if num is None else np.clip(ids - num + 1, 0, n)
+    e1 = np.clip(ids - delta, 0, n)
+    s2 = np.clip(ids + delta + 1, 0, n)
+    e2 = np.full_like(ids, n) if num is None else np.clip(ids + num, 0, n)
+    e1 = np.maximum(e1, s1)
+    e2 = np.maximum(e2, s2)
+
+    b1, m1, r1 = _fit(*_sums(c, s1, e1).T)
+    b2, m2, r2 = _fit(*_sums(c, s2, e2).T)
+
+    ret = np.empty(ids.shape, dtype=cross_dtype)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        px = (b2 - b1) / (m1 - m2)
+        ret['x'] = px + x0
+        ret['y'] = px * m1 + b1 + y0
+    # Back to the original coordinates.
+    ret['b1'] = b1 + y0 - m1 * x0
+    ret['m1'] = m1
+    ret['b2'] = b2 + y0 - m2 * x0
+    ret['m2'] = m2
+    ret['residual'] = r1 + r2
+    return ret
+
+
+def _distance(x, y, px, py, dx, dy):
+    """Return distances of points to lines through p along d, lines on rows, points on columns."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.abs((x - px) * dy - (y - py) * dx) / np.hypot(dx, dy)
+
+
+def ransac_line(x: np.ndarray, y: np.ndarray, *, threshold: float,
+                iterations: int = 64, seed: int = 0):
+    """
+    Fit y = b + m * x robust to outliers with MSAC.
+
+    All hypotheses are drawn at once from a seeded generator and scored in one
+    iterations x points residual matrix, so results and runtime are fixed for given input.
+    The best hypothesis is refined by least squares on its inliers.
+
+    :param x: Coordinates, points with nan are ignored.
+    :type x: np.ndarray
+    :param y: Coordinates, points with nan are ignored.
+    :type y: np.ndarray
+    :param threshold: Max distance of an inlier to the line, in the unit of x and y.
+    :type threshold: float
+    :param iterations: Number of hypotheses.
+    :type iterations: int
+    :param seed: Seed of the random generator.
+    :type seed: int
+    :return: Intercept b, slope m and mask of inliers shaped as x, to label points like
+        d['i'][s:e][mask] = -2; b and m are nan if less than 2 points are given.
+    :rtype: tuple
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    mask = np.zeros(x.shape, dtype=bool)
+    id = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+    n = id.size
+    if n < 2:
+        return np.nan, np.nan, mask
+    vx = x[id]
+    vy = y[id]
+
+    # Two distinct points per hypothesis.
+    rng = np.random.default_rng(seed)
+    i1 = rng.integers(0, n, iterations)
+    i2 = (i1 + rng.integers(1, n, iterations)) % n
+    px = vx[i1, None]
+    py = vy[i1, None]
+    r = _distance(vx, vy, px, py, vx[i2, None] - px, vy[i2, None] - py)
+
+    t2 = threshold * threshold
+    cost = np.minimum(np.nan_to_num(r * r, nan=t2), t2).sum(axis=1)
+    inliers = r[np.argmin(cost)] <= threshold
+    if np.count_nonzero(inliers) < 2:
+        return np.nan, np.nan, mask
+
+    b, m = fit_line(vx[inliers], vy[inliers])
+    inliers = _distance(vx, vy, 0., b, 1., m) <= threshold
+    mask[id[inliers]] = True
+    return b, m, mask
@@ -0,0 +1,202 @@
+"""
+ROS node to publish synthetic profiles at a target rate.
+
+A python ROS node to load test seam_tracking_node, the GUI and the modbus path without a camera.
+"""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from threading import Thread
+
+import rclpy
+from rclpy.node import Node
+from rcl_interfaces.msg import SetParametersResult
+from sensor_msgs.msg import PointCloud2
+from shared_interfaces.msg import Float64Array
+
+from .pacer import Pacer
+from .profiles import Generator, JOINTS
+import ros2_numpy as rnp
+
+# Parameters passed to Generator as is.
+_SHAPE = (
+    'width', 'depth', 'angle', 'thickness', 'gap', 'noise', 'spatter', 'spatter_height',
+    'dropout', 'amplitude', 'height', 'frequency')
+
+# Valid values of parameters, as a check and the expected range in words.
+_VALID = {
+    'rate': (lambda v: v > 0, 'positive'),
+    'joint': (lambda v: v in JOINTS, f'one of {JOINTS}'),
+    'rows': (lambda v: v >= 2, 'at least 2'),
+    'width': (lambda v: v > 0, 'positive'),
+    'depth': (lambda v: v >= 0, 'not negative'),
+    'angle': (lambda v: 0 < v < 180, 'between 0 and 180'),
+    'thickness': (lambda v: v >= 0, 'not negative'),
+    'gap': (lambda v: v >= 0, 'not negative'),
+    'noise': (lambda v: v >= 0, 'not negative'),
+    'spatter': (lambda v: 0 <= v <= 1, 'between 0 and 1'),
+    'spatter_height': (lambda v: v >= 0, 'not negative'),
+    'dropout': (lambda v: 0 <= v <= 1, 'between 0 and 1'),
+    'frequency': (lambda v: v >= 0, 'not negative'),
+}
+
+
+def _invalid(name: str, value):
+    """Return the reason to reject a parameter value, None if valid."""
+    if name in _VALID and not _VALID[name][0](value):
+        return f'{name} must be {_VALID[name][1]}: {value}'
+    return None
+
+
+class ProfileGenerator(Node):
+    """
+    ROS node to publish synthetic profiles.
+
+    Frames are published from a dedicated thread on absolute deadlines, frame id counting up.
+    A deadline already passed by more than a period is skipped and counted as late,
+    so the rate never bursts to catch up.
+    Parameters are validated when set, an error while publishing is logged and the loop goes on.
+    """
+
+    def __init__(self):
+        Node.__init__(self, 'profile_generator_node')
+
+        self.declare_parameter('rate', 100.)
+        self.declare_parameter('joint', 'v_groove')
+        self.declare_parameter('rows', 1000)
+        self.declare_parameter('width', 50.)
+        self.declare_parameter('depth', 5.)
+        self.declare_parameter('angle', 60.)
+        self.declare_parameter('thickness', 3.)
+        self.declare_parameter('gap', 0.)
+        self.declare_parameter('noise', 0.05)
+        self.declare_parameter('spatter', 0.)
+        self.declare_parameter('spatter_height', 10.)
+        self.declare_parameter('dropout', 0.)
+        self.declare_parameter('amplitude', 0.)
+        self.declare_parameter('height', 0.)
+        self.declare_parameter('frequency', 0.5)
+        self.declare_parameter('seed', -1)
+        for name in _VALID:
+            reason = _invalid(name, self.get_parameter(name).value)
+            if reason is not None:
+                raise ValueError(reason)
+        seed = self.get_parameter('seed').value
+        self._gen = Generator(
+            self.get_parameter('joint').value,
+            self.get_parameter('rows').value,
+            seed=seed if seed >= 0 else None,
+            **{k: self.get_parameter(k).value for k in _SHAPE})
+        self._pacer = Pacer(self.get_parameter('rate').value)
+
+        self.pub = self.create_publisher(
+            PointCloud2,
+            '~/pnts',
+            rclpy.qos.qos_profile_sensor_data)
+        self.pub_stats = self.create_publisher(Float64Array, '~/stats', 10)
+        self.timer = self.create_timer(1., self._cb_stats)
+
+        self.add_on_set_parameters_callback(self._on_set_parameters)
+
+        self._frame = 0
+        self._seconds = 0.
+        self._error = None
+        self._count = (0, 0, 0., time.perf_counter())
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+        self.get_logger().info('Initialized successfully')
+
+    def destroy_node(self):
+        """Stop publishing before destroying the node."""
+        self._pacer.stop()
+        self._thread.join()
+        return Node.destroy_node(self)
+
+    def _on_set_parameters(self, params):
+        result = SetParametersResult()
+        result.successful = True
+        for p in params:
+            reason = _invalid(p.name, p.value)
+            if reason is not None:
+                result.successful = False
+                result.reason = reason
+                return result
+        for p in params:
+            if p.name == 'rate':
+                self._pacer.rate = p.value
+            elif p.name == 'joint':
+                self._gen.joint = p.value
+            elif p.name == 'rows':
+                self._gen.n = p.value
+            elif p.name in _SHAPE:
+                setattr(self._gen, p.name, p.value)
+        return result
+
+    def _run(self):
+        t0 = time.perf_counter()
+        while self._pacer.wait():
+            now = time.perf_counter()
+            try:
+                self._publish(now - t0)
+            except Exception as e:
+                if self._error != str(e):
+                    self.get_logger().error(str(e))
+                    self._error = str(e)
+            self._seconds += time.perf_counter() - now
+
+    def _publish(self, t: float):
+        """
+        Publish the profile at t seconds since start.
+
+        :param t: Seconds since start, time of the weave.
+        :type t: float
+        """
+        msg = rnp.msgify(PointCloud2, self._gen(t))
+        msg.header.stamp = self.get_clock().now().to_msg()
+        msg.header.frame_id = str(self._frame)
+        self._frame += 1
+        self.pub.publish(msg)
+
+    def _cb_stats(self):
+        """Publish rate in Hz, late frames and mean ms to build and publish a frame, since last."""
+        frame, late, seconds, t = self._count
+        self._count = (self._frame, self._pacer.late, self._seconds, time.perf_counter())
+        n = self._count[0] - frame
+        msg = Float64Array()
+        msg.data = [
+            n / (self._count[3] - t),
+            float(self._count[1] - late),
+            (self._count[2] - seconds) / n * 1000 if n else 0.]
+        self.pub_stats.publish(msg)
+
+
+def main(args=None):
+    rclpy.init(args=args)
+
+    generator = ProfileGenerator()
+
+    try:
+        rclpy.spin(generator)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        generator.destroy_node()
+        rclpy.try_shutdown()
+
+
+if __name__ == '__main__':
+    main()
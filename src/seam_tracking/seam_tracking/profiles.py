@@ -0,0 +1,211 @@
+"""Provide synthetic laser profiles of common weld joints, for benchmarks and load tests."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+dtype = np.dtype([(x, np.float32) for x in 'xyi'])
+
+JOINTS = ('v_groove', 'fillet', 'lap', 'butt')
+
+
+def surface(joint: str, x: np.ndarray, center: float = 0., *, depth: float = 5.,
+            angle: float = 60., thickness: float = 3.):
+    """
+    Return the height of a joint along x, the seam at center.
+
+    :param joint: One of JOINTS.
+    :type joint: str
+    :param x: Positions across the joint in mm.
+    :type x: np.ndarray
+    :param center: Position of the seam in mm.
+    :type center: float
+    :param depth: Depth of a v groove in mm.
+    :type depth: float
+    :param angle: Included angle of a v groove in degree.
+    :type angle: float
+    :param thickness: Thickness of the upper plate of a lap joint in mm.
+    :type thickness: float
+    :return: Heights in mm, the seam is at height 0 but for a v groove.
+    :rtype: np.ndarray
+    """
+    d = x - center
+    if joint == 'v_groove':
+        return -np.maximum(depth - np.abs(d) / np.tan(np.radians(angle) / 2), 0.)
+    elif joint == 'fillet':
+        return np.abs(d)
+    elif joint == 'lap':
+        return np.where(d < 0, thickness, 0.)
+    elif joint == 'butt':
+        return np.zeros_like(d)
+    raise ValueError(f'Unknown joint: {joint}')
+
+
+def profile(joint: str = 'v_groove', n: int = 1000, *, width: float = 50., center: float = 0.,
+            gap: float = 0., noise: float = 0., seed=None, **kwargs):
+    """
+    Return the points of a joint as line_center_reconstruction does, one per image row.
+
+    Rows within the gap of the seam see no laser and are missing.
+
+    :param joint: One of JOINTS.
+    :type joint: str
+    :param n: Number of rows across the width.
+    :type n: int
+    :param width: Field of view across the joint in mm.
+    :type width: float
+    :param center: Position of the seam in mm.
+    :type center: float
+    :param gap: Width of the root gap in mm.
+    :type gap: float
+    :param noise: Standard deviation of height in mm.
+    :type noise: float
+    :param seed: Seed or generator of the noise.
+    :type seed: int or np.random.Generator
+    :param kwargs: Shape of the joint, passed to surface.
+    :return: Points with dtype x, y, i in float32.
+    :rtype: np.ndarray
+    """
+    x = np.linspace(-width / 2, width / 2, n)
+    d = np.empty((n,), dtype=dtype)
+    d['x'] = x
+    d['y'] = surface(joint, x, center, **kwargs)
+    d['i'] = np.arange(n)
+    if noise > 0:
+        d['y'] += np.random.default_rng(seed).normal(0., noise, n)
+    if gap > 0:
+        d = d[np.abs(x - center) >= gap / 2]
+    return d
+
+
+class Generator():
+    """
+    Generate profiles of a joint travelling under the sensor.
+
+    The seam moves across and up and down as a sine of time, a weave.
+    Each point is an outlier above the surface with probability spatter,
+    or missing with probability dropout.
+    Attributes can be changed between calls.
+    """
+
+    def __init__(
+        self,
+        joint: str = 'v_groove',
+        n: int = 1000,
+        *,
+        width: float = 50.,
+        depth: float = 5.,
+        angle: float = 60.,
+        thickness: float = 3.,
+        gap: float = 0.,
+        noise: float = 0.05,
+        spatter: float = 0.,
+        spatter_height: float = 10.,
+        dropout: float = 0.,
+        amplitude: float = 0.,
+        height: float = 0.,
+        frequency: float = 0.5,
+        seed=None
+    ):
+        """
+        Initialize self.
+
+        :param joint: One of JOINTS.
+        :type joint: str
+        :param n: Number of rows across the width.
+        :type n: int
+        :param width: Field of view across the joint in mm.
+        :type width: float
+        :param depth: Depth of a v groove in mm.
+        :type depth: float
+        :param angle: Included angle of a v groove in degree.
+        :type angle: float
+        :param thickness: Thickness of the upper plate of a lap joint in mm.
+        :type thickness: float
+        :param gap: Width of the root gap in mm.
+        :type gap: float
+        :param noise: Standard deviation of height in mm.
+        :type noise: float
+        :param spatter: Probability of a point to be an outlier.
+        :type spatter: float
+        :param spatter_height: Highest outlier above the surface in mm.
+        :type spatter_height: float
+        :param dropout: Probability of a point to be missing.
+        :type dropout: float
+        :param amplitude: Amplitude of the weave across the joint in mm.
+        :type amplitude: float
+        :param height: Amplitude of the weave up and down in mm.
+        :type height: float
+        :param frequency: Frequency of the weave in Hz.
+        :type frequency: float
+        :param seed: Seed of the random generator.
+        :type seed: int
+        """
+        self.joint = joint
+        self.n = n
+        self.width = width
+        self.depth = depth
+        self.angle = angle
+        self.thickness = thickness
+        self.gap = gap
+        self.noise = noise
+        self.spatter = spatter
+        self.spatter_height = spatter_height
+        self.dropout = dropout
+        self.amplitude = amplitude
+        self.height = height
+        self.frequency = frequency
+        self._rng = np.random.default_rng(seed)
+
+    def _shape(self):
+        return {'depth': self.depth, 'angle': self.angle, 'thickness': self.thickness}
+
+    def _weave(self, t: float):
+        s = np.sin(2 * np.pi * self.frequency * t)
+        return self.amplitude * s, self.height * s
+
+    def seam(self, t: float):
+        """
+        Return the true seam at time t, to check what is located.
+
+        :param t: Time in seconds.
+        :type t: float
+        :return: x and y of the seam in mm.
+        :rtype: tuple
+        """
+        center, offset = self._weave(t)
+        y = surface(self.joint, np.array([center]), center, **self._shape())[0]
+        return float(center), float(y + offset)
+
+    def __call__(self, t: float):
+        """
+        Return the profile at time t.
+
+        :param t: Time in seconds.
+        :type t: float
+        :return: Points with dtype x, y, i in float32.
+        :rtype: np.ndarray
+        """
+        center, offset = self._weave(t)
+        d = profile(
+            self.joint, self.n, width=self.width, center=center, gap=self.gap,
+            noise=self.noise, seed=self._rng, **self._shape())
+        d['y'] += offset
+        if self.spatter > 0:
+            mask = self._rng.random(d.size) < self.spatter
+            d['y'][mask] += self._rng.uniform(0., self.spatter_height, np.count_nonzero(mask))
+        if self.dropout > 0:
+            d = d[self._rng.random(d.size) >= self.dropout]
+        return d
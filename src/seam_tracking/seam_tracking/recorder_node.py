@@ -0,0 +1,108 @@
+"""
+ROS node to record points for offline tuning and replay.
+
+A python ROS node to subscribe from upstream topic and append frames to a recording.
+"""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+import rclpy
+from rclpy.node import Node
+from sensor_msgs.msg import PointCloud2
+from shared_interfaces.msg import Float64Array
+
+from .recording import Recorder
+import ros2_numpy as rnp
+
+
+class PntsRecorder(Node):
+    """
+    ROS node to record points.
+
+    Frames are handed to a writer thread without blocking,
+    so a slow disk drops frames instead of delaying the pipeline.
+    """
+
+    def __init__(self):
+        Node.__init__(self, 'recorder_node')
+
+        self.declare_parameter('path', '')
+        self.declare_parameter('capacity', 1 << 24)
+        self.declare_parameter('queue_size', 1024)
+        path = self.get_parameter('path').value or time.strftime('pnts_%Y%m%d_%H%M%S')
+        self._recorder = Recorder(
+            path,
+            capacity=self.get_parameter('capacity').value,
+            size=self.get_parameter('queue_size').value)
+        self._recorder.start()
+
+        self.sub = self.create_subscription(
+            PointCloud2,
+            '~/pnts',
+            self._cb_sub,
+            rclpy.qos.qos_profile_sensor_data)
+
+        self.pub_stats = self.create_publisher(Float64Array, '~/stats', 10)
+        self.timer = self.create_timer(1., self._cb_stats)
+
+        self.get_logger().info(f'Recording into {path}')
+
+    def destroy_node(self):
+        """Write pending frames and close the recording before destroying the node."""
+        self._recorder.stop()
+        return Node.destroy_node(self)
+
+    def _cb_sub(self, msg: PointCloud2):
+        """
+        Subscription callback, put the frame to the writer thread.
+
+        :param msg: ROS point cloud message.
+        :type msg: PointCloud2
+        """
+        try:
+            id = int(msg.header.frame_id)
+        except ValueError:
+            id = -1
+        stamp = msg.header.stamp.sec + msg.header.stamp.nanosec * 1e-9
+        self._recorder.put(id, stamp, rnp.numpify(msg))
+
+    def _cb_stats(self):
+        """Publish frames and points written, dropped and pending frames, capacity in points."""
+        s = self._recorder.stats()
+        msg = Float64Array()
+        msg.data = [
+            float(s['frames']), float(s['points']), float(s['dropped']), float(s['pending']),
+            float(s['capacity'])]
+        self.pub_stats.publish(msg)
+
+
+def main(args=None):
+    rclpy.init(args=args)
+
+    recorder = PntsRecorder()
+
+    try:
+        rclpy.spin(recorder)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.destroy_node()
+        rclpy.try_shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""Provide a compact on-disk format of recorded point frames, its reader and writer."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mmap
+import os
+import time
+from threading import Event, Lock, Thread
+
+import numpy as np
+
+from .mailbox import Mailbox
+
+# Points of all frames back to back, raw little endian float32 records.
+dtype = np.dtype([(x, '<f4') for x in 'xyi'])
+
+# One record per frame, offset and length in points.
+index_dtype = np.dtype([
+    ('frame_id', '<i8'), ('stamp', '<f8'), ('offset', '<i8'), ('length', '<i8')])
+
+DATA_SUFFIX = '.pnts'
+INDEX_SUFFIX = '.idx'
+
+
+def write(path: str, frames):
+    """
+    Write frames into a new recording.
+
+    :param path: Path without suffix, DATA_SUFFIX and INDEX_SUFFIX are appended.
+    :type path: str
+    :param frames: Frame id, stamp in seconds and points, per frame.
+    :type frames: iterable
+    :return: Number of frames.
+    :rtype: int
+    """
+    n = 0
+    offset = 0
+    with open(path + DATA_SUFFIX, 'wb') as fd, open(path + INDEX_SUFFIX, 'wb') as fi:
+        for id, stamp, pnts in frames:
+            pnts = np.asarray(pnts).astype(dtype, copy=False)
+            fd.write(pnts.tobytes())
+            fi.write(np.array([(int(id), stamp, offset, pnts.size)], dtype=index_dtype).tobytes())
+            offset += pnts.size
+            n += 1
+    return n
+
+
+class Recording():
+    """
+    Read a recording with random access to any frame.
+
+    Both files are memory mapped, a frame is a view of the data file, nothing is copied.
+    Only frames fully written are visible, call refresh to see frames appended since.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a recording.
+
+        :param path: Path without suffix.
+        :type path: str
+        """
+        self.path = path
+        self._data = np.empty((0,), dtype=dtype)
+        self.index = np.empty((0,), dtype=index_dtype)
+        self.refresh()
+
+    def refresh(self):
+        """Map the files again to see frames appended since opened."""
+        data = self._map(self.path + DATA_SUFFIX, dtype)
+        index = self._map(self.path + INDEX_SUFFIX, index_dtype)
+        if index.size:
+            index = index[:np.searchsorted(index['offset'] + index['length'] > data.size, True)]
+        self._data, self.index = data, index
+
+    def __len__(self):
+        """Return the number of frames."""
+        return self.index.size
+
+    def __getitem__(self, n: int):
+        """
+        Return frame n.
+
+        :param n: Index of frame, negative from the end.
+        :type n: int
+        :return: Frame id, stamp in seconds and a read only view of points.
+        :rtype: tuple
+        """
+        r = self.index[n]
+        return int(r['frame_id']), float(r['stamp']), \
+            self._data[r['offset']:r['offset'] + r['length']]
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self[n]
+
+    @staticmethod
+    def _map(path: str, t: np.dtype):
+        n = os.path.getsize(path) // t.itemsize
+        if n == 0:
+            return np.empty((0,), dtype=t)
+        return np.memmap(path, dtype=t, mode='r', shape=(n,))
+
+
+class Recorder():
+    """
+    Append frames to a recording from a dedicated thread.
+
+    The data file is preallocated and memory mapped, its size doubles when full.
+    Frames are put into a bounded mailbox without blocking and written in batches,
+    the index is appended after the points of its frames, so readers only see complete frames.
+    If the writer falls behind by more than `size` frames, the oldest ones are dropped and counted.
+    The data file is truncated to the points written when stopped.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        capacity: int = 1 << 20,
+        size: int = 1024,
+        batch: int = 64,
+        interval: float = 0.1
+    ):
+        """
+        Initialize self, frames already in the recording are kept and appended to.
+
+        :param path: Path without suffix.
+        :type path: str
+        :param capacity: Number of points preallocated.
+        :type capacity: int
+        :param size: Number of frames pending before the oldest is dropped.
+        :type size: int
+        :param batch: Number of frames pending to wake up the writer.
+        :type batch: int
+        :param interval: Seconds between writes while fewer frames than batch are pending.
+        :type interval: float
+        """
+        self.path = path
+        self._capacity = max(int(capacity), 1)
+        self._batch = batch
+        self._interval = interval
+        self._lock = Lock()
+        self._event = Event()
+        self._mailbox = Mailbox(size, self._notify)
+        self._thread = None
+        self._running = False
+        self._fd = None
+        self._fi = None
+        self._mm = None
+        self._offset = 0
+        self._stats = {'frames': 0, 'points': 0, 'batches': 0, 'seconds': 0., 'seconds_max': 0.}
+
+    def start(self):
+        """Open the files and start the writer thread."""
+        if self._thread is not None:
+            return
+        self._open()
+        self._running = True
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write the pending frames, stop the thread and close the files."""
+        if self._thread is None:
+            return
+        self._running = False
+        self._event.set()
+        self._thread.join()
+        self._thread = None
+        self._close()
+
+    def put(self, id: int, stamp: float, pnts: np.ndarray):
+        """
+        Put a frame without blocking, the points are referenced, not copied.
+
+        :param id: Frame id.
+        :type id: int
+        :param stamp: Stamp in seconds.
+        :type stamp: float
+        :param pnts: Points with fields x, y and i.
+        :type pnts: np.ndarray
+        """
+        self._mailbox.put((int(id), float(stamp), pnts))
+
+    def stats(self):
+        """
+        Return a copy of counters.
+
+        :return: Frames and points written, batches, dropped, pending frames,
+            capacity in points, total and max seconds spent writing a batch.
+        :rtype: dict
+        """
+        with self._lock:
+            s = dict(self._stats)
+            s['capacity'] = self._capacity
+        s['dropped'] = self._mailbox.dropped
+        s['pending'] = len(self._mailbox)
+        return s
+
+    def _notify(self):
+        if len(self._mailbox) >= self._batch:
+            self._event.set()
+
+    def _open(self):
+        offset = 0
+        if os.path.exists(self.path + INDEX_SUFFIX) and os.path.exists(self.path + DATA_SUFFIX):
+            index = Recording(self.path).index
+            if index.size:
+                offset = int(index[-1]['offset'] + index[-1]['length'])
+            # Drop index records of frames never completely written.
+            os.truncate(self.path + INDEX_SUFFIX, index.size * index_dtype.itemsize)
+        self._offset = offset
+        self._capacity = max(self._capacity, offset)
+        self._fi = open(self.path + INDEX_SUFFIX, 'ab')
+        self._fd = open(self.path + DATA_SUFFIX, 'a+b')
+        self._fd.truncate(self._capacity * dtype.itemsize)
+        self._mm = mmap.mmap(self._fd.fileno(), self._capacity * dtype.itemsize)
+
+    def _close(self):
+        self._mm.flush()
+        self._mm.close()
+        self._fd.truncate(self._offset * dtype.itemsize)
+        self._fd.close()
+        self._fi.close()
+        self._mm = self._fd = self._fi = None
+
+    def _grow(self, n: int):
+        capacity = self._capacity
+        while capacity < n:
+            capacity *= 2
+        self._mm.flush()
+        self._mm.close()
+        self._fd.truncate(capacity * dtype.itemsize)
+        self._mm = mmap.mmap(self._fd.fileno(), capacity * dtype.itemsize)
+        with self._lock:
+            self._capacity = capacity
+
+    def _run(self):
+        while True:
+            self._event.wait(self._interval)
+            self._event.clear()
+            running = self._running
+            self._write()
+            if not running:
+                break
+
+    def _write(self):
+        frames = []
+        item = self._mailbox.get()
+        while item is not None:
+            frames.append(item)
+            item = self._mailbox.get()
+        if not frames:
+            return
+        t = time.perf_counter()
+        index = np.empty((len(frames),), dtype=index_dtype)
+        offset = self._offset
+        for k, (id, stamp, pnts) in enumerate(frames):
+            pnts = np.ascontiguousarray(pnts).astype(dtype, copy=False)
+            n = pnts.size
+            if offset + n > self._capacity:
+                self._grow(offset + n)
+            self._mm[offset * dtype.itemsize:(offset + n) * dtype.itemsize] = pnts.tobytes()
+            index[k] = (id, stamp, offset, n)
+            offset += n
+        self._fi.write(index.tobytes())
+        self._fi.flush()
+        self._offset = offset
+        t = time.perf_counter() - t
+        with self._lock:
+            self._stats['frames'] += len(frames)
+            self._stats['points'] += int(index['length'].sum())
+            self._stats['batches'] += 1
+            self._stats['seconds'] += t
+            self._stats['seconds_max'] = max(self._stats['seconds_max'], t)
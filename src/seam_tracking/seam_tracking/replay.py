@@ -0,0 +1,200 @@
+"""
+Replay recorded frames through the seam chain, without ROS.
+
+Run as fast as possible and report frames per second, time per stage and the trajectory:
+
+    ros2 run seam_tracking replay <recording> --params config/params.yaml
+    ros2 run seam_tracking replay <recording> --code denoise.py --code locate.py -o out.csv
+"""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from .chain import SeamChain
+from .codes import Codes
+from .compensator import LatencyCompensator
+from .recording import Recording
+from .ring_filter import RingFilter
+from .tracker import Tracker
+
+trajectory_dtype = np.dtype([
+    ('frame_id', np.int64), ('stamp', np.float64),
+    ('valid', bool), ('u', np.float64), ('v', np.float64)])
+
+
+def chain_from_params(params: dict):
+    """
+    Build a chain as the node would from its parameters.
+
+    :param params: ros__parameters of seam_tracking_node, missing ones take node defaults.
+    :type params: dict
+    :return: The chain, with codes loaded synchronously.
+    :raises RuntimeError: If the code fails to load.
+    :rtype: SeamChain
+    """
+    p = params.get
+    codes = Codes(p('codes', ['']))
+    # As the node, pipeline [-1] means task.
+    ids = list(p('pipeline', None) or [])
+    id = (ids if ids != [-1] else []) or p('task', 0)
+    try:
+        codes.reload(id)
+    finally:
+        codes.shutdown()
+    error = codes.snapshot().code.error
+    if error is not None:
+        raise RuntimeError(f'Failed to load task {id}: {error}')
+    return SeamChain(
+        codes,
+        ring=RingFilter(
+            enable=p('enable', False),
+            window_size=p('window_size', 10),
+            gap=p('gap', 2),
+            step=p('step', 2.),
+            length=p('length', 5)),
+        tracker=Tracker(
+            enable=p('track', False),
+            alpha=p('track_alpha', 0.5),
+            beta=p('track_beta', 0.1),
+            margin=p('track_margin', 5.),
+            gate=p('track_gate', 3.),
+            lost=p('track_lost', 3)),
+        compensator=LatencyCompensator(
+            enable=p('compensate', False),
+            window=p('compensate_window', 5),
+            max_lead=p('compensate_max', 0.1)),
+        delta_x=p('delta_x', 0.),
+        delta_y=p('delta_y', 0.))
+
+
+def replay(recording, chain: SeamChain, *, latency: float = 0.):
+    """
+    Feed every frame through the chain as fast as possible.
+
+    Each frame is copied first, as numpify gives the node its own buffer.
+    A frame raising an exception is counted and sent as invalid, as in the node.
+
+    :param recording: Frames of frame id, stamp and points.
+    :type recording: Recording or sequence
+    :param chain: The chain to run.
+    :type chain: SeamChain
+    :param latency: Seconds from stamp to send time, for latency compensation.
+    :type latency: float
+    :return: Frames, errors, seconds, fps, stage name to times in seconds
+        (count, mean, p50, p99, max), trajectory and the modbus frames back to back.
+    :rtype: dict
+    """
+    n = len(recording)
+    times = {name: np.zeros(n) for name in SeamChain.STAGES}
+    k = 0
+
+    def timing(name, t):
+        times[name][k] = t
+
+    trajectory = np.zeros((n,), dtype=trajectory_dtype)
+    frames = bytearray()
+    errors = 0
+    timing_, chain.timing = chain.timing, timing
+    t = time.perf_counter()
+    try:
+        for k, (id, stamp, pnts) in enumerate(recording):
+            try:
+                _, m = chain(np.array(pnts), str(id), stamp, stamp + latency)
+                valid, u, v = chain.seam
+            except Exception:
+                errors += 1
+                valid, u, v = False, 0., 0.
+                m = chain.modbus_msg(str(id), False, 0., 0.)
+            trajectory[k] = (id, stamp, valid, u, v)
+            frames += m
+    finally:
+        chain.timing = timing_
+    seconds = time.perf_counter() - t
+
+    stages = {}
+    for name, v in times.items():
+        if n:
+            p50, p99 = np.percentile(v, (50, 99))
+            stages[name] = {
+                'count': n, 'mean': float(v.mean()), 'p50': float(p50), 'p99': float(p99),
+                'max': float(v.max())}
+    return {
+        'frames': n,
+        'errors': errors,
+        'seconds': seconds,
+        'fps': n / seconds if seconds > 0 else float('inf'),
+        'stages': stages,
+        'trajectory': trajectory,
+        'modbus': bytes(frames),
+    }
+
+
+def report(ret: dict, file=None):
+    """Print a summary of a replay, to stdout by default."""
+    file = sys.stdout if file is None else file
+    print(f"frames: {ret['frames']}, errors: {ret['errors']}, "
+          f"seconds: {ret['seconds']:.3f}, fps: {ret['fps']:.1f}", file=file)
+    t = ret['trajectory']
+    if t.size:
+        print(f"valid: {np.count_nonzero(t['valid'])} / {t.size}", file=file)
+    print(f"{'stage':<12}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}", file=file)
+    for name, s in ret['stages'].items():
+        print(f"{name:<12}{s['mean'] * 1e3:>10.3f}{s['p50'] * 1e3:>10.3f}"
+              f"{s['p99'] * 1e3:>10.3f}{s['max'] * 1e3:>10.3f}", file=file)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('recording', help='Path of the recording without suffix')
+    parser.add_argument('--params', help='Parameter file of seam_tracking_node')
+    parser.add_argument(
+        '--code', action='append', default=[],
+        help='Source file of a code, repeat to chain them, overrides codes in params')
+    parser.add_argument('--latency', type=float, default=0., help='Seconds from stamp to send')
+    parser.add_argument('-o', '--output', help='Write the trajectory as csv')
+    a = parser.parse_args(args)
+
+    params = {}
+    if a.params:
+        import yaml
+        with open(a.params) as f:
+            params = yaml.safe_load(f)['seam_tracking_node']['ros__parameters']
+    if a.code:
+        params['codes'] = []
+        for path in a.code:
+            with open(path) as f:
+                params['codes'].append(f.read())
+        params['pipeline'] = list(range(len(a.code)))
+
+    ret = replay(Recording(a.recording), chain_from_params(params), latency=a.latency)
+    report(ret)
+    if a.output:
+        t = ret['trajectory']
+        np.savetxt(
+            a.output,
+            np.column_stack([t['frame_id'], t['stamp'], t['valid'], t['u'], t['v']]),
+            fmt=['%d', '%.6f', '%d', '%.3f', '%.3f'],
+            delimiter=',',
+            header='frame_id,stamp,valid,u,v',
+            comments='')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Provide a ring buffer based filter to check stability of the picked seam."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+
+class RingFilter():
+    """
+    Check connectivity of the picked seam in time space.
+
+    The history is kept in a preallocated ring buffer of float32 values plus a validity mask.
+    Each value is written twice, at k and k + capacity, so the latest values are always
+    a contiguous slice of the buffer and no copy is made to read them.
+
+    The semantics follow the original deque based walk:
+    Starting from the newest value as anchor, the next anchor is the first valid value
+    within `gap` frames whose slope to the anchor is not greater than `step`.
+    The picked seam is stable if the anchor reaches `length` frames back.
+    Otherwise it is marked as i == -8.
+    """
+
+    def __init__(
+        self,
+        *,
+        enable: bool = False,
+        window_size: int = 10,
+        gap: int = 2,
+        step: float = 2.,
+        length: int = 5
+    ):
+        """Initialize self with a preallocated ring buffer."""
+        self.enable = enable
+        self.window_size = window_size
+        self.gap = gap
+        self.step = step
+        self.length = length
+
+        self._cap = 0
+        self._pos = 0
+        self._num = 0
+        self._val = np.empty((0,), dtype=np.float32)
+        self._msk = np.empty((0,), dtype=bool)
+        self._band = None
+        self._reserve(window_size)
+
+    def __len__(self):
+        """Return the number of frames in history."""
+        return self._num
+
+    def __call__(self, r: np.ndarray):
+        """
+        Push the picked seam into history and check its stability.
+
+        :param r: Point cloud in numpy, the picked seam is r[0] if r[0]['i'] == -1.
+        :type r: np.ndarray
+        :return: The input is modified in place and returned.
+        :rtype: np.ndarray
+        """
+        if r.size and r[0][2] == -1:
+            self._push(r[0][1], True)
+        else:
+            self._push(np.nan, False)
+
+        if not self.enable or not self._msk[self._pos]:
+            return r
+
+        if not self._stable():
+            r[0][2] = -8
+        return r
+
+    def history(self, n: int = None):
+        """
+        Return the latest values and validity mask, newest first.
+
+        :param n: Number of frames, default to all in history.
+        :type n: int
+        :return: Views of values and mask, not copies.
+        :rtype: tuple
+        """
+        n = self._num if n is None else max(min(n, self._num), 0)
+        e = self._pos + self._cap + 1
+        return self._val[e - n:e][::-1], self._msk[e - n:e][::-1]
+
+    def _reserve(self, size: int):
+        if size <= self._cap:
+            return
+        val, msk = self.history()
+        self._cap = size
+        self._val = np.full((size * 2,), np.nan, dtype=np.float32)
+        self._msk = np.zeros((size * 2,), dtype=bool)
+        n = val.size
+        self._val[:n] = val[::-1]
+        self._msk[:n] = msk[::-1]
+        self._val[size:size + n] = val[::-1]
+        self._msk[size:size + n] = msk[::-1]
+        self._pos = n - 1 if n else size - 1
+
+    def _push(self, v: float, valid: bool):
+        self._reserve(self.window_size)
+        self._pos = (self._pos + 1) % self._cap
+        self._val[self._pos] = self._val[self._pos + self._cap] = v
+        self._msk[self._pos] = self._msk[self._pos + self._cap] = valid
+        self._num = min(self._num + 1, self.window_size)
+
+    def _stable(self):
+        length, gap = self.length, self.gap
+        if length <= 0:
+            return True
+        if gap <= 0:
+            return False
+
+        # Anchors never go beyond length - 1 and candidates never beyond anchor + gap.
+        n = min(self._num, length + gap)
+        val, msk = self.history(n)
+
+        a, k, j, inside = self._indices(n, gap)
+        with np.errstate(invalid='ignore'):
+            d = np.abs(val[j] - val[:, None]) / k
+            ok = inside & msk[j] & ~(d > self.step)
+
+        # First candidate becomes the next anchor, anchors beyond length stop there.
+        nxt = np.where(ok.any(axis=1), a + 1 + ok.argmax(axis=1), a)
+        nxt[length:] = a[length:]
+
+        # Follow the chain by pointer doubling.
+        for _ in range(max(n - 1, 1).bit_length()):
+            nxt = nxt[nxt]
+        return nxt[0] >= length
+
+    def _indices(self, n: int, gap: int):
+        """Band of candidates j = a + k for every anchor a, k in [1, gap], cached."""
+        if self._band is None or self._band[0] != (n, gap):
+            a = np.arange(n)
+            k = np.arange(1, gap + 1)
+            j = a[:, None] + k
+            inside = j < n
+            j[~inside] = n - 1
+            self._band = (n, gap), (a, k.astype(np.float32), j, inside)
+        return self._band[1]
@@ -0,0 +1,91 @@
+"""Provide the image rows where the seam is expected, for upstream nodes to crop."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+
+import numpy as np
+
+
+class RowPredictor():
+    """
+    Map a region of the laser plane back to a range of image rows.
+
+    The homography is the one of line_center_reconstruction, from image (u, row) to laser plane
+    (x, y) in mm, so its inverse takes the seam back to the image.
+    An unset or singular homography gives no range, which means the full frame.
+    """
+
+    def __init__(self, homography=(), *, margin: int = 20):
+        """
+        Initialize self.
+
+        :param homography: Row major 3 x 3 matrix as 9 values.
+        :type homography: sequence
+        :param margin: Rows added on both sides of the range.
+        :type margin: int
+        """
+        self.margin = margin
+        self.homography = homography
+
+    @property
+    def homography(self):
+        """Return the homography as a 3 x 3 matrix, or None if unset."""
+        return self._h
+
+    @homography.setter
+    def homography(self, h):
+        self._h = self._inv = None
+        h = np.asarray(h, dtype=np.float64)
+        if h.size != 9 or not np.all(np.isfinite(h)):
+            return
+        h = h.reshape(3, 3)
+        try:
+            inv = np.linalg.inv(h)
+        except np.linalg.LinAlgError:
+            return
+        self._h, self._inv = h, inv
+
+    def __call__(self, x: float, y: float, half_width: float):
+        """
+        Return rows covering the square of half_width around (x, y) in the laser plane.
+
+        :param x: Seam in mm.
+        :type x: float
+        :param y: Seam in mm.
+        :type y: float
+        :param half_width: Half side of the square in mm.
+        :type half_width: float
+        :return: First row, never negative, and number of rows,
+            or None for the full frame.
+        :rtype: tuple
+        """
+        if self._inv is None:
+            return None
+        c = np.array([
+            [x - half_width, y - half_width, 1.],
+            [x + half_width, y - half_width, 1.],
+            [x - half_width, y + half_width, 1.],
+            [x + half_width, y + half_width, 1.]]) @ self._inv.T
+        w = c[:, 2]
+        if not np.all(np.isfinite(c)) or np.any(w <= 0) and np.any(w >= 0):
+            # Corners across the horizon do not bound a range.
+            return None
+        rows = c[:, 1] / w
+        lo = max(math.floor(rows.min()) - self.margin, 0)
+        hi = math.ceil(rows.max()) + self.margin
+        if hi < lo:
+            return None
+        return lo, hi - lo + 1
@@ -18,24 +18,30 @@ A python ROS node to subscribe from upstream topic.
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from multiprocessing import Process, Pipe
-from select import select
-import socket
 import time
+
 import rclpy
-from collections import deque
 from rclpy.node import Node
 from rcl_interfaces.msg import SetParametersResult
-from sensor_msgs.msg import PointCloud2
+from sensor_msgs.msg import PointCloud2, RegionOfInterest
+from shared_interfaces.msg import Float64Array
+from shared_interfaces.srv import GetCode
 
+from .chain import SeamChain
 from .codes import Codes
+from .compensator import LatencyCompensator
+from .latency import LatencyStats
+from .modbus_frame import FrameEncoder
+from .modbus_sender import ModbusSender
+from .pipeline import Pipeline
+from .plugin_pool import PluginPool
+from .ring_filter import RingFilter
+from .roi import RowPredictor
+from .tracker import Tracker
 import ros2_numpy as rnp
 import numpy as np
 
 
-PIPE_IN, PIPE_OUT = Pipe(False)
-
-
 class SeamTracking(Node):
     """
     ROS node to locate seam and maintain plugins.
@@ -44,55 +50,118 @@ class SeamTracking(Node):
     Apply a serial of customizable plugins to locate seam.
     """
 
+    # Stages timed per frame when latency is enabled, in order, total is from stamp to send.
+    LATENCY_STAGES = ('numpify', *SeamChain.STAGES, 'msgify', 'send', 'publish', 'total')
+
     def __init__(self):
         Node.__init__(self, 'seam_tracking_node')
 
-        self._deq = deque()
-
         self.declare_parameter('window_size', 10)
-        self._ws = self.get_parameter('window_size').value
-
         self.declare_parameter('gap', 2)
-        self._gap = self.get_parameter('gap').value
-
         self.declare_parameter('step', 2.)
-        self._step = self.get_parameter('step').value
-
         self.declare_parameter('length', 5)
-        self._length = self.get_parameter('length').value
-
         self.declare_parameter('enable', False)
-        self._enable = self.get_parameter('enable').value
+        self._ring = RingFilter(
+            enable=self.get_parameter('enable').value,
+            window_size=self.get_parameter('window_size').value,
+            gap=self.get_parameter('gap').value,
+            step=self.get_parameter('step').value,
+            length=self.get_parameter('length').value)
+
+        self.declare_parameter('track', False)
+        self.declare_parameter('track_alpha', 0.5)
+        self.declare_parameter('track_beta', 0.1)
+        self.declare_parameter('track_margin', 5.)
+        self.declare_parameter('track_gate', 3.)
+        self.declare_parameter('track_lost', 3)
+        self._tracker = Tracker(
+            enable=self.get_parameter('track').value,
+            alpha=self.get_parameter('track_alpha').value,
+            beta=self.get_parameter('track_beta').value,
+            margin=self.get_parameter('track_margin').value,
+            gate=self.get_parameter('track_gate').value,
+            lost=self.get_parameter('track_lost').value)
+
+        self.declare_parameter('homography_matrix', [0.] * 9)
+        self.declare_parameter('roi_margin', 20)
+        self._rows = RowPredictor(
+            self.get_parameter('homography_matrix').value,
+            margin=self.get_parameter('roi_margin').value)
 
         self.declare_parameter('task', 0)
         self._task = self.get_parameter('task').value
 
-        self.declare_parameter('delta_x', 0.)
-        self._delta_x = self.get_parameter('delta_x').value
+        # Task indices to chain, task is used if [-1].
+        self.declare_parameter('pipeline', [-1])
+        self._pipeline = self._pipeline_ids(self.get_parameter('pipeline').value)
 
+        self.declare_parameter('delta_x', 0.)
         self.declare_parameter('delta_y', 0.)
-        self._delta_y = self.get_parameter('delta_y').value
+
+        self.declare_parameter('compensate', False)
+        self.declare_parameter('compensate_window', 5)
+        self.declare_parameter('compensate_max', 0.1)
+        self._compensator = LatencyCompensator(
+            enable=self.get_parameter('compensate').value,
+            window=self.get_parameter('compensate_window').value,
+            max_lead=self.get_parameter('compensate_max').value)
 
         self.declare_parameter('codes', [''])
         self._codes = Codes(self.get_parameter('codes').value)
-
-        try:
-            self._codes.reload(self._task)
-        except Exception as e:
-            self.get_logger().error(str(e))
+        self._last = None
+        self._load(report=True)
+
+        self._chain = SeamChain(
+            self._codes,
+            ring=self._ring,
+            tracker=self._tracker,
+            compensator=self._compensator,
+            encoder=FrameEncoder(),
+            delta_x=self.get_parameter('delta_x').value,
+            delta_y=self.get_parameter('delta_y').value,
+            clock=lambda: self.get_clock().now().nanoseconds * 1e-9)
+
+        self.declare_parameter('plugin_workers', 0)
+        self.declare_parameter('plugin_deadline', 0.05)
+        self._reset_pool(
+            self.get_parameter('plugin_workers').value,
+            self.get_parameter('plugin_deadline').value)
+
+        self.declare_parameter('latency', False)
+        self._latency = LatencyStats(self.LATENCY_STAGES)
+        self._enable_latency(self.get_parameter('latency').value)
 
         self._error = ''
 
+        # Refilled by msgify every frame, publish serializes it synchronously.
+        self._seam = PointCloud2()
+
+        self._sender = ModbusSender('127.0.0.1', 1502)
+        self._sender.start()
+
         self.pub = self.create_publisher(
             PointCloud2,
             '~/seam',
             rclpy.qos.qos_profile_sensor_data)
+        self.pub_compensation = self.create_publisher(Float64Array, '~/compensation', 10)
+        self.pub_roi = self.create_publisher(
+            RegionOfInterest,
+            '~/roi',
+            rclpy.qos.qos_profile_sensor_data)
         self.sub = self.create_subscription(
             PointCloud2,
             '~/pnts',
             self._cb_sub,
             rclpy.qos.qos_profile_sensor_data)
 
+        self.srv = self.create_service(GetCode, '~/get_code', self._cb_get_code)
+
+        self.pub_plugin_stats = self.create_publisher(Float64Array, '~/plugin_stats', 10)
+        self.pub_tracker_stats = self.create_publisher(Float64Array, '~/tracker_stats', 10)
+        self.pub_stage_stats = self.create_publisher(Float64Array, '~/stage_stats', 10)
+        self.pub_latency = self.create_publisher(Float64Array, '~/latency', 10)
+        self.timer = self.create_timer(1., self._cb_stats)
+
         self.add_on_set_parameters_callback(self._on_set_parameters)
 
         # self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -123,38 +192,128 @@ class SeamTracking(Node):
     def __del__(self):
         self.get_logger().info('Destroyed successfully')
 
+    def destroy_node(self):
+        """Stop the modbus sender and plugin workers before destroying the node."""
+        self._sender.stop()
+        self._codes.shutdown(wait=False)
+        self._reset_pool(0)
+        return Node.destroy_node(self)
+
     def _on_set_parameters(self, params):
         result = SetParametersResult()
         result.successful = True
         for p in params:
             if p.name == 'task':
-                try:
-                    self._task = p.value
-                    self._codes.reload(self._task)
-                except Exception as e:
-                    self.get_logger().error(str(e))
+                self._task = p.value
+                self._load()
+            elif p.name == 'pipeline':
+                self._pipeline = self._pipeline_ids(p.value)
+                self._load()
             elif p.name == 'codes':
-                try:
-                    self._codes[:] = p.value
-                    self._codes.reload(self._task)
-                except Exception as e:
-                    self.get_logger().error(str(e))
+                self._codes[:] = p.value
+                self._load(report=True)
             elif p.name == 'delta_x':
-                self._delta_x = p.value
+                self._chain.delta_x = p.value
             elif p.name == 'delta_y':
-                self._delta_y = p.value
+                self._chain.delta_y = p.value
             elif p.name == 'window_size':
-                self._ws = p.value
+                self._ring.window_size = p.value
             elif p.name == 'gap':
-                self._gap = p.value
+                self._ring.gap = p.value
             elif p.name == 'step':
-                self._step = p.value
+                self._ring.step = p.value
             elif p.name == 'length':
-                self._length = p.value
+                self._ring.length = p.value
             elif p.name == 'enable':
-                self._enable = p.value
+                self._ring.enable = p.value
+            elif p.name == 'track':
+                self._tracker.enable = p.value
+            elif p.name == 'track_alpha':
+                self._tracker.alpha = p.value
+            elif p.name == 'track_beta':
+                self._tracker.beta = p.value
+            elif p.name == 'track_margin':
+                self._tracker.margin = p.value
+            elif p.name == 'track_gate':
+                self._tracker.gate = p.value
+            elif p.name == 'track_lost':
+                self._tracker.lost = p.value
+            elif p.name == 'compensate':
+                self._compensator.enable = p.value
+            elif p.name == 'compensate_window':
+                self._compensator.window = p.value
+            elif p.name == 'compensate_max':
+                self._compensator.max_lead = p.value
+            elif p.name == 'homography_matrix':
+                self._rows.homography = p.value
+            elif p.name == 'roi_margin':
+                self._rows.margin = p.value
+            elif p.name == 'plugin_workers':
+                self._reset_pool(p.value, self.get_parameter('plugin_deadline').value)
+            elif p.name == 'plugin_deadline':
+                if self._chain.pool is not None:
+                    self._chain.pool.deadline = p.value
+            elif p.name == 'latency':
+                self._enable_latency(p.value)
         return result
 
+    def _load(self, report: bool = False):
+        """
+        Load the task in background, the call returns right away.
+
+        The last frame is used to warm up the task before it is published.
+        Poll the state via ~/get_code.
+
+        :param report: Report load errors of every task, not only the selected one.
+        :type report: bool
+        """
+        f = self._codes.load(self._pipeline or self._task, self._last)
+        f.add_done_callback(lambda f: self._on_loaded(f.result(), report))
+
+    def _on_loaded(self, s: dict, report: bool):
+        if report:
+            for i, e in s['errors'].items():
+                self.get_logger().error(f'Failed to load task {i}: {e}')
+        if s['state'] == 'ready':
+            self.get_logger().info(f"Task {s['task']} loaded in {s['seconds']:.3f}s")
+        elif s['state'] == 'failed' and not (
+                report and any(i in s['errors'] for i in self._ids(s['task']))):
+            self.get_logger().error(f"Failed to load task {s['task']}: {s['error']}")
+
+    @staticmethod
+    def _pipeline_ids(value):
+        """Return task indices to chain, empty to use task if value is [-1] or empty."""
+        ids = list(value or [])
+        return [] if ids == [-1] else ids
+
+    @staticmethod
+    def _ids(task):
+        """Return indices of a task, a single index or a tuple of them for a pipeline."""
+        return task if isinstance(task, tuple) else (task,)
+
+    def _cb_get_code(self, request, response):
+        """
+        Service callback to get code and its load state.
+
+        The message is one of 'ready', 'loading', 'failed: <error>' for the selected task,
+        or 'inactive' for others.
+        """
+        try:
+            response.code = self._codes[request.index]
+        except IndexError as e:
+            response.success = False
+            response.message = str(e)
+            return response
+        s = self._codes.status()
+        if request.index not in self._ids(s['task']):
+            response.message = 'inactive'
+        elif s['error'] is not None:
+            response.message = f"{s['state']}: {s['error']}"
+        else:
+            response.message = s['state']
+        response.success = True
+        return response
+
     def _cb_sub(self, msg: PointCloud2):
         """
         Subscription callback.
@@ -167,137 +326,124 @@ class SeamTracking(Node):
         :param msg: ROS point cloud message.
         :type msg: PointCloud2
         """
+        latency = self._latency if self._chain.timing is not None else None
+        t = time.perf_counter()
+        stamp = msg.header.stamp.sec + msg.header.stamp.nanosec * 1e-9
         try:
             pnts_xyi = rnp.numpify(msg)
-            pnts_xyi = self._codes(pnts_xyi)
-            pnts_xyi = self._filter(pnts_xyi)
-            pnts_xyi = self._offset(pnts_xyi)
-            pnts_xyi = self._notnan(pnts_xyi)
-            if pnts_xyi[0][2] == -1:
-                valid = True
-                u = float(pnts_xyi[0][0])
-                v = float(pnts_xyi[0][1])
-            else:
-                valid = False
-                u = 0.
-                v = 0.
-            ret = rnp.msgify(PointCloud2, pnts_xyi)
+            if latency is not None:
+                latency.lap('numpify', t)
+            self._last = pnts_xyi
+            pnts_xyi, m = self._chain(pnts_xyi, msg.header.frame_id, stamp)
+            if self._compensator.enable:
+                self._publish_compensation()
+            t = time.perf_counter()
+            ret = rnp.msgify(PointCloud2, pnts_xyi, msg=self._seam)
             ret.header = msg.header
             msg = ret
+            if latency is not None:
+                latency.lap('msgify', t)
         except Exception as e:
-            m = self._modbus_msg(msg.header.frame_id, False, 0., 0.)
+            m = self._chain.modbus_msg(msg.header.frame_id, False, 0., 0.)
             if self._error != str(e):
                 self.get_logger().error(str(e))
                 self._error = str(e)
-        else:
-            m = self._modbus_msg(ret.header.frame_id, valid, u, v)
         finally:
-            PIPE_OUT.send_bytes(m)
+            t = time.perf_counter()
+            self._sender.send(m)
+            if latency is not None:
+                t = latency.lap('send', t)
+                latency.record('total', self.get_clock().now().nanoseconds * 1e-9 - stamp)
             self.pub.publish(msg)
+            self.pub_roi.publish(self._roi())
+            if latency is not None:
+                latency.lap('publish', t)
 
-    def _filter(self, r: np.ndarray):
-        if r.size and r[0][2] == -1:
-            self._deq.appendleft(r[0][1])
-        else:
-            self._deq.appendleft(None)
-
-        while len(self._deq) > self._ws:
-            self._deq.pop()
-
-        if not self._enable or self._deq[0] is None:
-            return r
-
-        i = 0
-        j = 1
-        while j < len(self._deq):
-            if j - i > self._gap or i >= self._length:
-                break
-            if self._deq[j] is None:
-                j += 1
-                continue
-            d = abs(self._deq[j] - self._deq[i]) / (j - i)
-            if d > self._step:
-                j += 1
-            else:
-                i = j
-                j += 1
-
-        if i >= self._length:
-            return r
-        else:
-            r[0][2] = -8
-            return r
-
-    def _offset(self, r: np.ndarray):
+    def _reset_pool(self, workers: int, deadline: float = 0.05):
         """
-        Offset the picked point in milli meter.
+        Replace the plugin pool, codes run inline if workers is 0.
 
-        :param r: Point cloud in nunpy.
-        :type r: np.ndarray
-        :return: The input is modified in place and returned.
-        :rtype: np.ndarray
+        :param workers: Number of worker processes.
+        :type workers: int
+        :param deadline: Seconds allowed per frame.
+        :type deadline: float
         """
-        if r[0][2] == -1:
-            r[0][0] += self._delta_x
-            r[0][1] += self._delta_y
-        return r
-
-    def _notnan(self, r: np.ndarray):
-        mask = ~np.isnan(r['x'])
-        return r[mask]
-
-    def _modbus_msg(self, id: str, valid: bool, u: float, v: float):
-        id = int(id) % 0x10000
-        # Transaction identifier
-        s = id.to_bytes(2, 'big')
-        # Protocol identifier 2, Length field 2, Unit identifier 1, Function code 1
-        s += bytes([0x00, 0x00, 0x00, 0x0d, 0x01, 0x10])
-        # Start address 2, number of registers, number of bytes
-        s += bytes([0x00, 0x02, 0x00, 0x03, 0x06])
-
-        b = bytes([0x00, 0xff]) if valid else bytes([0x00, 0x00])
-
-        try:
-            t = bytes()
-            t += round(u * 100).to_bytes(2, 'big', signed=True)
-            t += round(v * 100).to_bytes(2, 'big', signed=True)
-        except Exception:
-            s += bytes([0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
-        else:
-            s += b + t
+        if self._chain.pool is not None:
+            self._chain.pool.close()
+            self._chain.pool = None
+        if workers > 0:
+            self._chain.pool = PluginPool(workers, deadline)
 
-        return s
+    def _roi(self):
+        """
+        Predict image rows of the next seam, around the tracked one.
 
+        The half width is the tracker margin widened by 3 times the rms innovation.
+        The full frame, all zeros, is returned if the seam is not tracked or the homography unset.
 
-def _child(r, w):
-    w.close()
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        while True:
-            try:
-                s.connect(("127.0.0.1", 1502))
-                break
-            except Exception:
-                time.sleep(5)
-        try:
-            while True:
-                idr, idw, idx = select([r.fileno(), s.fileno()], [], [])
-                for id in idr:
-                    if id == r.fileno():
-                        t = r.recv_bytes(19)
-                        assert len(t) == 19
-                        s.sendall(t)
-                    elif id == s.fileno():
-                        s.recv(32)
-        except EOFError:
-            pass
-        except KeyboardInterrupt:
-            pass
+        :return: Rows from y_offset, height of them, over the full width.
+        :rtype: RegionOfInterest
+        """
+        roi = RegionOfInterest()
+        p = self._tracker.predict()
+        if p is None:
+            return roi
+        rms = self._tracker.rms
+        w = self._tracker.margin + (3 * float(np.max(rms)) if np.all(np.isfinite(rms)) else 0.)
+        rows = self._rows(p[0], p[1], w)
+        if rows is not None:
+            roi.y_offset, roi.height = rows
+        return roi
+
+    def _cb_stats(self):
+        """Publish plugin, tracker and latency statistics."""
+        if self._chain.timing is not None:
+            self._publish_latency()
+
+        s = self._tracker.stats()
+        msg = Float64Array()
+        msg.data = [float(s['locked']), float(s['hits']), float(s['rejected']),
+                    float(s['relocks']), *s['last'], *s['rms'], *s['max']]
+        self.pub_tracker_stats.publish(msg)
+
+        code = self._codes.snapshot().code
+        if self._chain.pool is None and isinstance(code, Pipeline):
+            msg = Float64Array()
+            for v in code.stats().values():
+                msg.data.extend([v['last'] * 1000, (v['mean'] or 0.) * 1000, v['max'] * 1000])
+            self.pub_stage_stats.publish(msg)
+
+        if not self._chain.plugin_times:
+            return
+        p50, p99 = np.percentile(np.fromiter(self._chain.plugin_times, float), (50, 99)) * 1000
+        missed = recycled = 0
+        if self._chain.pool is not None:
+            missed, recycled = self._chain.pool.missed, self._chain.pool.recycled
+        msg = Float64Array()
+        msg.data = [p50, p99, float(missed), float(recycled)]
+        self.pub_plugin_stats.publish(msg)
+
+    def _enable_latency(self, enable: bool):
+        """Start timing every stage from a clean slate, or stop."""
+        self._latency.reset()
+        self._chain.timing = self._latency.record if enable else None
+
+    def _publish_latency(self):
+        """Publish count, p50, p99, p99.9 and max in ms of each stage since last published."""
+        msg = Float64Array()
+        for n, *v in self._latency.summary().values():
+            msg.data.extend([float(n), *(x * 1000 for x in v)])
+        self._latency.reset()
+        self.pub_latency.publish(msg)
+
+    def _publish_compensation(self):
+        """Publish the lead in seconds and offsets in mm applied to the latest frame."""
+        msg = Float64Array()
+        msg.data = [self._compensator.lead, *self._compensator.delta]
+        self.pub_compensation.publish(msg)
 
 
 def main(args=None):
-    child = Process(target=_child, args=(PIPE_IN, PIPE_OUT))
-    child.start()
-
     rclpy.init(args=args)
 
     seam_tracking = SeamTracking()
@@ -310,8 +456,6 @@ def main(args=None):
         # Destroy the node explicitly
         # (optional - otherwise it will be done automatically
         # when the garbage collector destroys the node object)
-        PIPE_OUT.close()
-        child.join()
         seam_tracking.destroy_node()
         rclpy.try_shutdown()
 
@@ -0,0 +1,212 @@
+"""
+ROS node to publish synthetic laser stripe images at a target rate.
+
+A python ROS node to benchmark the image chain from resize_image to line_center_reconstruction
+without a camera.
+"""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from threading import Thread
+
+import rclpy
+from rclpy.node import Node
+from rcl_interfaces.msg import SetParametersResult
+from sensor_msgs.msg import Image
+from shared_interfaces.msg import Float64Array
+
+from .pacer import Pacer
+from .profiles import JOINTS
+from .stripes import StripeRenderer
+import ros2_numpy as rnp
+
+# Parameters passed to StripeRenderer as is.
+_STRIPE = (
+    'vertical', 'joint', 'field', 'scale', 'depth', 'angle', 'thickness', 'gap', 'sigma',
+    'peak', 'ambient', 'speckle', 'noise', 'amplitude', 'frequency')
+
+# Valid values of parameters, as a check and the expected range in words.
+_VALID = {
+    'rate': (lambda v: v > 0, 'positive'),
+    'frames': (lambda v: v >= 1, 'at least 1'),
+    'width': (lambda v: v >= 2, 'at least 2'),
+    'height': (lambda v: v >= 2, 'at least 2'),
+    'joint': (lambda v: v in JOINTS, f'one of {JOINTS}'),
+    'field': (lambda v: v > 0, 'positive'),
+    'scale': (lambda v: v > 0, 'positive'),
+    'depth': (lambda v: v >= 0, 'not negative'),
+    'angle': (lambda v: 0 < v < 180, 'between 0 and 180'),
+    'thickness': (lambda v: v >= 0, 'not negative'),
+    'gap': (lambda v: v >= 0, 'not negative'),
+    'sigma': (lambda v: v > 0, 'positive'),
+    'peak': (lambda v: v >= 0, 'not negative'),
+    'ambient': (lambda v: v >= 0, 'not negative'),
+    'speckle': (lambda v: v >= 0, 'not negative'),
+    'noise': (lambda v: v >= 0, 'not negative'),
+    'frequency': (lambda v: v >= 0, 'not negative'),
+}
+
+
+def _invalid(name: str, value):
+    """Return the reason to reject a parameter value, None if valid."""
+    if name in _VALID and not _VALID[name][0](value):
+        return f'{name} must be {_VALID[name][1]}: {value}'
+    return None
+
+
+class StripeGenerator(Node):
+    """
+    ROS node to publish synthetic images as camera_tis_node does.
+
+    A ring of images is rendered once at start, then published in a loop,
+    only the header changes per frame, so the cost to publish is the copy into the message.
+    Parameters are validated at start, an error while publishing is logged and the loop goes on.
+    """
+
+    def __init__(self):
+        Node.__init__(self, 'stripe_generator_node')
+
+        self.declare_parameter('rate', 30.)
+        self.declare_parameter('frames', 60)
+        self.declare_parameter('width', 1536)
+        self.declare_parameter('height', 1024)
+        self.declare_parameter('vertical', False)
+        self.declare_parameter('joint', 'v_groove')
+        self.declare_parameter('field', 50.)
+        self.declare_parameter('scale', 10.)
+        self.declare_parameter('depth', 5.)
+        self.declare_parameter('angle', 60.)
+        self.declare_parameter('thickness', 3.)
+        self.declare_parameter('gap', 0.)
+        self.declare_parameter('sigma', 2.)
+        self.declare_parameter('peak', 200.)
+        self.declare_parameter('ambient', 10.)
+        self.declare_parameter('speckle', 0.3)
+        self.declare_parameter('noise', 2.)
+        self.declare_parameter('amplitude', 0.)
+        self.declare_parameter('frequency', 0.5)
+        self.declare_parameter('seed', -1)
+        for name in _VALID:
+            reason = _invalid(name, self.get_parameter(name).value)
+            if reason is not None:
+                raise ValueError(reason)
+
+        rate = self.get_parameter('rate').value
+        seed = self.get_parameter('seed').value
+        renderer = StripeRenderer(
+            self.get_parameter('width').value,
+            self.get_parameter('height').value,
+            seed=seed if seed >= 0 else None,
+            **{k: self.get_parameter(k).value for k in _STRIPE})
+        t = time.perf_counter()
+        self._ring = [
+            rnp.msgify(Image, img, encoding='mono8')
+            for img in renderer.ring(self.get_parameter('frames').value, rate)]
+        self.get_logger().info(
+            f'Rendered {len(self._ring)} frames in {time.perf_counter() - t:.3f}s')
+        self._pacer = Pacer(rate)
+
+        self.pub = self.create_publisher(
+            Image,
+            '~/image',
+            rclpy.qos.qos_profile_sensor_data)
+        self.pub_stats = self.create_publisher(Float64Array, '~/stats', 10)
+        self.timer = self.create_timer(1., self._cb_stats)
+
+        self.add_on_set_parameters_callback(self._on_set_parameters)
+
+        self._frame = 0
+        self._seconds = 0.
+        self._error = None
+        self._count = (0, 0, 0., time.perf_counter())
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+        self.get_logger().info('Initialized successfully')
+
+    def destroy_node(self):
+        """Stop publishing before destroying the node."""
+        self._pacer.stop()
+        self._thread.join()
+        return Node.destroy_node(self)
+
+    def _on_set_parameters(self, params):
+        result = SetParametersResult()
+        result.successful = True
+        for p in params:
+            if p.name == 'rate':
+                reason = _invalid(p.name, p.value)
+            elif p.name in _STRIPE or p.name in ('frames', 'width', 'height', 'seed'):
+                reason = f'Images are rendered at start, restart to change {p.name}'
+            else:
+                continue
+            if reason is not None:
+                result.successful = False
+                result.reason = reason
+                return result
+        for p in params:
+            if p.name == 'rate':
+                self._pacer.rate = p.value
+        return result
+
+    def _run(self):
+        while self._pacer.wait():
+            t = time.perf_counter()
+            try:
+                self._publish()
+            except Exception as e:
+                if self._error != str(e):
+                    self.get_logger().error(str(e))
+                    self._error = str(e)
+            self._seconds += time.perf_counter() - t
+
+    def _publish(self):
+        """Publish the next image of the ring."""
+        msg = self._ring[self._frame % len(self._ring)]
+        msg.header.stamp = self.get_clock().now().to_msg()
+        msg.header.frame_id = str(self._frame)
+        self._frame += 1
+        self.pub.publish(msg)
+
+    def _cb_stats(self):
+        """Publish rate in Hz, late frames and mean ms to publish a frame, since last."""
+        frame, late, seconds, t = self._count
+        self._count = (self._frame, self._pacer.late, self._seconds, time.perf_counter())
+        n = self._count[0] - frame
+        msg = Float64Array()
+        msg.data = [
+            n / (self._count[3] - t),
+            float(self._count[1] - late),
+            (self._count[2] - seconds) / n * 1000 if n else 0.]
+        self.pub_stats.publish(msg)
+
+
+def main(args=None):
+    rclpy.init(args=args)
+
+    generator = StripeGenerator()
+
+    try:
+        rclpy.spin(generator)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        generator.destroy_node()
+        rclpy.try_shutdown()
+
+
+if __name__ == '__main__':
+    main()
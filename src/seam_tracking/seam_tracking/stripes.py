@@ -0,0 +1,179 @@
+"""Provide synthetic mono8 images of a laser stripe on a joint, as seen by the camera."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from .profiles import surface
+
+
+class StripeRenderer():
+    """
+    Render a laser stripe across a joint into mono8 images.
+
+    The stripe runs along the width of the image, as the camera sees it before rotate_image,
+    or along the height if vertical.
+    Its cross section is gaussian, scaled by multiplicative speckle,
+    on top of ambient light and sensor noise.
+    Only a band of rows around the stripe is rasterized, vectorized over all columns at once.
+    The seam weaves across the image as a sine of time.
+    Attributes can be changed between calls.
+    """
+
+    def __init__(
+        self,
+        width: int = 1536,
+        height: int = 1024,
+        *,
+        vertical: bool = False,
+        joint: str = 'v_groove',
+        field: float = 50.,
+        scale: float = 10.,
+        depth: float = 5.,
+        angle: float = 60.,
+        thickness: float = 3.,
+        gap: float = 0.,
+        sigma: float = 2.,
+        peak: float = 200.,
+        ambient: float = 10.,
+        speckle: float = 0.3,
+        noise: float = 2.,
+        amplitude: float = 0.,
+        frequency: float = 0.5,
+        seed=None
+    ):
+        """
+        Initialize self.
+
+        :param width: Image width in pixel.
+        :type width: int
+        :param height: Image height in pixel.
+        :type height: int
+        :param vertical: Stripe along the height, as after rotate_image.
+        :type vertical: bool
+        :param joint: One of profiles.JOINTS.
+        :type joint: str
+        :param field: Field of view along the stripe in mm.
+        :type field: float
+        :param scale: Pixels across the stripe per mm of height.
+        :type scale: float
+        :param depth: Depth of a v groove in mm.
+        :type depth: float
+        :param angle: Included angle of a v groove in degree.
+        :type angle: float
+        :param thickness: Thickness of the upper plate of a lap joint in mm.
+        :type thickness: float
+        :param gap: Width of the root gap in mm, no laser is reflected there.
+        :type gap: float
+        :param sigma: Standard deviation of the stripe cross section in pixel.
+        :type sigma: float
+        :param peak: Intensity at the center of the stripe.
+        :type peak: float
+        :param ambient: Mean intensity of ambient light.
+        :type ambient: float
+        :param speckle: Contrast of speckle, standard deviation over mean of the stripe intensity.
+        :type speckle: float
+        :param noise: Standard deviation of sensor noise in intensity.
+        :type noise: float
+        :param amplitude: Amplitude of the weave along the stripe in mm.
+        :type amplitude: float
+        :param frequency: Frequency of the weave in Hz.
+        :type frequency: float
+        :param seed: Seed of the random generator.
+        :type seed: int
+        """
+        self.width = width
+        self.height = height
+        self.vertical = vertical
+        self.joint = joint
+        self.field = field
+        self.scale = scale
+        self.depth = depth
+        self.angle = angle
+        self.thickness = thickness
+        self.gap = gap
+        self.sigma = sigma
+        self.peak = peak
+        self.ambient = ambient
+        self.speckle = speckle
+        self.noise = noise
+        self.amplitude = amplitude
+        self.frequency = frequency
+        self._rng = np.random.default_rng(seed)
+
+    def stripe(self, t: float):
+        """
+        Return the center of the stripe across, per pixel along it.
+
+        Heights are centered in the image, toward pixel 0 when higher.
+
+        :param t: Time in seconds.
+        :type t: float
+        :return: Sub pixel centers, nan within the gap.
+        :rtype: np.ndarray
+        """
+        n, m = (self.height, self.width) if self.vertical else (self.width, self.height)
+        x = np.linspace(-self.field / 2, self.field / 2, n)
+        center = self.amplitude * np.sin(2 * np.pi * self.frequency * t)
+        y = surface(
+            self.joint, x, center, depth=self.depth, angle=self.angle, thickness=self.thickness)
+        v = (m - 1) / 2 - y * self.scale
+        if self.gap > 0:
+            v[np.abs(x - center) < self.gap / 2] = np.nan
+        return v
+
+    def __call__(self, t: float):
+        """
+        Render the image at time t.
+
+        :param t: Time in seconds.
+        :type t: float
+        :return: Image of height by width in uint8.
+        :rtype: np.ndarray
+        """
+        v = self.stripe(t)
+        n, m = v.size, (self.width if self.vertical else self.height)
+        img = np.full((m, n), self.ambient, dtype=np.float32)
+        if self.noise > 0:
+            img += self._rng.standard_normal(img.shape, dtype=np.float32) * np.float32(self.noise)
+
+        # A band of rows around the center of each column.
+        k = int(np.ceil(4 * self.sigma))
+        ok = np.isfinite(v)
+        r = np.round(np.where(ok, v, -k - 1)).astype(np.int64) + np.arange(-k, k + 1)[:, None]
+        c = np.broadcast_to(np.arange(n), r.shape)
+        val = self.peak * np.exp(-0.5 * ((r - v) / self.sigma) ** 2)
+        if self.speckle > 0:
+            # Gamma of unit mean, standard deviation as speckle contrast.
+            s = 1. / (self.speckle * self.speckle)
+            val *= self._rng.gamma(s, 1. / s, val.shape)
+        mask = (r >= 0) & (r < m) & ok
+        img[r[mask], c[mask]] += val[mask]
+
+        img = np.clip(img, 0, 255).astype(np.uint8)
+        return np.ascontiguousarray(img.T) if self.vertical else img
+
+    def ring(self, n: int, rate: float):
+        """
+        Render n images at the rate, one after another.
+
+        :param n: Number of images.
+        :type n: int
+        :param rate: Frames per second.
+        :type rate: float
+        :return: Images.
+        :rtype: list
+        """
+        return [self(k / rate) for k in range(n)]
@@ -0,0 +1,203 @@
+"""Provide an alpha-beta tracker to narrow the search window of the seam."""
+
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import deque
+
+import numpy as np
+
+# Label of a picked seam rejected by the gate, next to the labels documented in codes.
+REJECTED = -7
+
+
+class Tracker():
+    """
+    Track the picked seam frame by frame with a constant velocity alpha-beta filter.
+
+    While locked, the next seam is predicted and only points with x within `margin`
+    of the prediction are searched, as a contiguous slice so indices stay ordered.
+    A measurement further than `gate` from the prediction is rejected as a miss.
+    After `lost` misses in a row the lock is lost and the full profile is searched,
+    the next accepted measurement locks again.
+    """
+
+    def __init__(
+        self,
+        *,
+        enable: bool = False,
+        alpha: float = 0.5,
+        beta: float = 0.1,
+        margin: float = 5.,
+        gate: float = 3.,
+        lost: int = 3,
+        window: int = 100
+    ):
+        """
+        Initialize self, unlocked.
+
+        :param enable: Narrow the search, otherwise only track.
+        :type enable: bool
+        :param alpha: Gain of position.
+        :type alpha: float
+        :param beta: Gain of velocity.
+        :type beta: float
+        :param margin: Half width of the search window along x in mm.
+        :type margin: float
+        :param gate: Max distance of a measurement to the prediction in mm.
+        :type gate: float
+        :param lost: Number of misses in a row to lose the lock.
+        :type lost: int
+        :param window: Number of innovations kept for statistics.
+        :type window: int
+        """
+        self.enable = enable
+        self.alpha = alpha
+        self.beta = beta
+        self.margin = margin
+        self.gate = gate
+        self.lost = lost
+
+        self._pos = None
+        self._vel = np.zeros(2)
+        self._misses = 0
+        self._innovations = deque(maxlen=window)
+        # Running sum of squared innovations in the window, for rms per frame.
+        self._squares = np.zeros(2)
+        self._hits = 0
+        self._rejected = 0
+        self._relocks = 0
+
+    @property
+    def locked(self):
+        """Return True if the seam is tracked."""
+        return self._pos is not None
+
+    @property
+    def rms(self):
+        """Return rms innovation along x and y in mm over the latest frames, nan if none."""
+        if not self._innovations:
+            return np.full(2, np.nan)
+        return np.sqrt(np.maximum(self._squares, 0.) / len(self._innovations))
+
+    def predict(self):
+        """
+        Return the predicted seam of the next measurement.
+
+        :return: x and y in mm, or None if not locked.
+        :rtype: np.ndarray
+        """
+        return None if self._pos is None else self._pos + self._vel
+
+    def roi(self, pnts: np.ndarray):
+        """
+        Return the slice of points to search.
+
+        :param pnts: Points with dtype x, y, i in float32.
+        :type pnts: np.ndarray
+        :return: The slice around the prediction, or slice(None) for the full profile.
+        :rtype: slice
+        """
+        if not self.enable or self._pos is None:
+            return slice(None)
+        px = self._pos[0] + self._vel[0]
+        with np.errstate(invalid='ignore'):
+            id = np.flatnonzero(np.abs(pnts['x'] - px) <= self.margin)
+        if id.size == 0:
+            return slice(None)
+        return slice(int(id[0]), int(id[-1]) + 1)
+
+    def accepts(self, x: float, y: float):
+        """
+        Return True if a measurement is within the gate of the prediction, or not locked.
+
+        :param x: Picked seam in mm.
+        :type x: float
+        :param y: Picked seam in mm.
+        :type y: float
+        :return: True if update would accept it, nothing is counted.
+        :rtype: bool
+        """
+        if self._pos is None:
+            return True
+        pred = self._pos + self._vel
+        return bool(np.hypot(x - pred[0], y - pred[1]) <= self.gate)
+
+    def update(self, x: float, y: float):
+        """
+        Correct the prediction with a measurement.
+
+        :param x: Picked seam in mm.
+        :type x: float
+        :param y: Picked seam in mm.
+        :type y: float
+        :return: True if the measurement is accepted, otherwise call miss for the frame.
+        :rtype: bool
+        """
+        z = np.array([x, y], dtype=np.float64)
+        if self._pos is None:
+            self._pos = z
+            self._vel[:] = 0
+            self._misses = 0
+            self._relocks += 1
+            return True
+        pred = self._pos + self._vel
+        r = z - pred
+        if np.hypot(*r) > self.gate:
+            self._rejected += 1
+            return False
+        if len(self._innovations) == self._innovations.maxlen:
+            self._squares -= self._innovations[0] * self._innovations[0]
+        self._squares += r * r
+        self._innovations.append(r)
+        self._pos = pred + self.alpha * r
+        self._vel = self._vel + self.beta * r
+        self._misses = 0
+        self._hits += 1
+        return True
+
+    def miss(self):
+        """Coast on the prediction for a frame without seam, lose the lock after `lost`."""
+        if self._pos is None:
+            return
+        self._misses += 1
+        if self._misses >= self.lost:
+            self._pos = None
+            self._vel[:] = 0
+        else:
+            self._pos = self._pos + self._vel
+
+    def stats(self):
+        """
+        Return lock state and innovation statistics.
+
+        :return: locked, hits, rejected, relocks, and last, mean, rms and max
+            innovation along x and y in mm over the latest frames.
+        :rtype: dict
+        """
+        s = {
+            'locked': self.locked,
+            'hits': self._hits,
+            'rejected': self._rejected,
+            'relocks': self._relocks,
+        }
+        if self._innovations:
+            r = np.array(self._innovations)
+            s['last'] = r[-1]
+            s['mean'] = r.mean(axis=0)
+            s['rms'] = self.rms
+            s['max'] = np.abs(r).max(axis=0)
+        else:
+            s['last'] = s['mean'] = s['rms'] = s['max'] = np.full(2, np.nan)
+        return s
@@ -21,6 +21,10 @@ setup(
     entry_points={
         'console_scripts': [
             'seam_tracking_node = seam_tracking.seam_tracking_node:main',
+            'recorder_node = seam_tracking.recorder_node:main',
+            'profile_generator_node = seam_tracking.profile_generator_node:main',
+            'stripe_generator_node = seam_tracking.stripe_generator_node:main',
+            'replay = seam_tracking.replay:main',
         ],
     },
 )
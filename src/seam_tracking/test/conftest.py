@@ -0,0 +1,167 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import pytest
+
+# Results of this session, test name to seconds per call.
+_RESULTS = {}
+# Test name to blocks and bytes still held after a call.
+_ALLOCATIONS = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('bench', 'benchmarks of the hot path')
+    group.addoption(
+        '--bench', action='store_true',
+        help='Run benchmarks, skipped otherwise')
+    group.addoption(
+        '--bench-baseline', default=os.path.join(os.path.dirname(__file__), 'benchmark.json'),
+        help='JSON baseline to compare with, if it exists')
+    group.addoption(
+        '--bench-save', action='store_true',
+        help='Write the results into the baseline')
+    group.addoption(
+        '--bench-tolerance', type=float, default=0.25,
+        help='Fail a benchmark slower than the baseline by this fraction')
+    group.addoption(
+        '--bench-time', type=float, default=0.05,
+        help='Seconds per round, the best of 5 rounds is kept')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'bench: benchmark, run with --bench')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--bench'):
+        return
+    skip = pytest.mark.skip(reason='need --bench to run')
+    for item in items:
+        if 'bench' in item.keywords:
+            item.add_marker(skip)
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'machine': None, 'results': {}}
+
+
+def _time(fn, seconds: float, rounds: int = 5):
+    """Return the best time per call over rounds of about seconds each."""
+    n = 1
+    while True:
+        t = time.perf_counter()
+        for _ in range(n):
+            fn()
+        t = time.perf_counter() - t
+        if t >= seconds / 10:
+            break
+        n *= 10 if t < seconds / 100 else 2
+    n = max(1, round(n * seconds / t))
+    best = t / n if n == 1 else float('inf')
+    for _ in range(rounds):
+        t = time.perf_counter()
+        for _ in range(n):
+            fn()
+        best = min(best, (time.perf_counter() - t) / n)
+    return best
+
+
+@pytest.fixture
+def bench(request):
+    """
+    Time a callable and compare with the baseline.
+
+    Call bench(fn) once per test, fn takes no arguments.
+    The test fails if calls per second drop below the baseline by more than the tolerance.
+    """
+    config = request.config
+    name = request.node.name
+
+    def run(fn):
+        t = _time(fn, config.getoption('--bench-time'))
+        _RESULTS[name] = t
+        base = _load(config.getoption('--bench-baseline'))['results'].get(name)
+        tol = config.getoption('--bench-tolerance')
+        if base is not None and not config.getoption('--bench-save') and t * (1 - tol) > base:
+            pytest.fail(
+                f'{name}: {1 / t:.0f} calls/s, baseline {1 / base:.0f} calls/s, '
+                f'tolerance {tol:.0%}', pytrace=False)
+        return t
+
+    return run
+
+
+@pytest.fixture
+def allocations(request):
+    """
+    Count memory blocks and bytes a callable leaves allocated, with tracemalloc.
+
+    Call allocations(fn) once per test, fn is called once to warm up caches, then once traced.
+    Counts are reported with the benchmarks, not compared with the baseline.
+    """
+    name = request.node.name
+
+    def run(fn):
+        fn()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            ret = fn()
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        del ret
+        stats = [s for s in after.compare_to(before, 'lineno') if s.size_diff > 0]
+        _ALLOCATIONS[name] = (
+            sum(s.count_diff for s in stats), sum(s.size_diff for s in stats))
+        return _ALLOCATIONS[name]
+
+    return run
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    if not _RESULTS or not config.getoption('--bench-save'):
+        return
+    path = config.getoption('--bench-baseline')
+    base = _load(path)
+    base['machine'] = {
+        'node': platform.node(), 'machine': platform.machine(),
+        'python': platform.python_version()}
+    base['results'].update(_RESULTS)
+    base['results'] = dict(sorted(base['results'].items()))
+    with open(path, 'w') as f:
+        json.dump(base, f, indent=2)
+        f.write('\n')
+
+
+def pytest_terminal_summary(terminalreporter):
+    if _RESULTS:
+        terminalreporter.section('benchmarks')
+        for name, t in sorted(_RESULTS.items()):
+            terminalreporter.write_line(f'{name:<64}{t * 1e6:>12.1f} us{1 / t:>12.0f} /s')
+    if _ALLOCATIONS:
+        terminalreporter.section('allocations')
+        for name, (count, size) in sorted(_ALLOCATIONS.items()):
+            terminalreporter.write_line(f'{name:<64}{count:>8} blocks{size:>12} bytes held')
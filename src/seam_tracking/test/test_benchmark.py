@@ -0,0 +1,218 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+import numpy as np
+import pytest
+from seam_tracking.chain import SeamChain
+from seam_tracking.codes import Codes
+from seam_tracking.latency import LatencyStats
+from seam_tracking.primitives import cross, cross_many, fit_line, interpolate
+from seam_tracking.primitives import local_max, local_min, ransac_line
+from seam_tracking.profiles import JOINTS, profile
+from seam_tracking.ring_filter import RingFilter
+import test_filter as ref
+
+pytestmark = pytest.mark.bench
+
+SIZES = (400, 1600)
+NOISES = (0., 0.2)
+
+# Pick the corner with the least residual among local extrema, as a typical code.
+CODE = """
+import numpy as np
+from seam_tracking.primitives import cross_many, local_max, local_min
+
+def fn(d):
+    ids = local_max(d, delta=20) + local_min(d, delta=20)
+    if not ids:
+        return d
+    c = cross_many(d, ids, delta=5, num=50)
+    r = np.where(np.isfinite(c['x']) & np.isfinite(c['y']), c['residual'], np.inf)
+    k = np.argmin(r)
+    if np.isinf(r[k]):
+        return d
+    return np.concatenate((np.array([(c[k]['x'], c[k]['y'], -1)], dtype=d.dtype), d))
+"""
+
+
+@pytest.fixture(params=[
+    (j, n, s) for j in JOINTS for n in SIZES for s in NOISES],
+    ids=lambda p: f'{p[0]}-{p[1]}-{p[2]}')
+def pnts(request):
+    joint, n, noise = request.param
+    return profile(joint, n, gap=1. if joint == 'butt' else 0., noise=noise, seed=0)
+
+
+def _chain():
+    codes = Codes([CODE])
+    codes.reload(0)
+    codes.shutdown()
+    return SeamChain(codes, ring=RingFilter(enable=True))
+
+
+def test_interpolate(bench, pnts):
+    bench(lambda: interpolate(pnts))
+
+
+def test_local_max(bench, pnts):
+    bench(lambda: local_max(pnts, delta=20))
+
+
+def test_local_min(bench, pnts):
+    bench(lambda: local_min(pnts, delta=20))
+
+
+def test_fit_line(bench, pnts):
+    x, y = pnts['x'], pnts['y']
+    bench(lambda: fit_line(x, y))
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_cross(bench, pnts):
+    d = pnts.copy()
+    id = d.size // 2
+    bench(lambda: cross(d, id, delta=5, num=50))
+
+
+def test_cross_many(bench, pnts):
+    ids = np.arange(0, pnts.size, 10)
+    bench(lambda: cross_many(pnts, ids, delta=5, num=50))
+
+
+def test_ransac_line(bench, pnts):
+    x, y = pnts['x'], pnts['y']
+    bench(lambda: ransac_line(x, y, threshold=.5))
+
+
+def test_filter(bench, pnts):
+    chain = _chain()
+    r = chain.codes(pnts.copy())
+    bench(lambda: chain.filter(r))
+
+
+@pytest.mark.parametrize('impl', ('deque', 'ring'))
+@pytest.mark.parametrize('window_size', (10, 100, 500))
+def test_ring_filter(bench, window_size, impl):
+    """The ring buffer against the deque based filter it replaced."""
+    if impl == 'ring':
+        filter = RingFilter(enable=True, window_size=window_size, length=window_size)
+    else:
+        f = ref.Filter()
+        f._ws = f._length = window_size
+        filter = f._filter
+    r = np.array([(0, 0, -1)], dtype=[(x, np.float32) for x in 'xyi'])
+    bench(lambda: filter(r.copy()))
+
+
+@pytest.mark.parametrize('writer', (False, True), ids=('idle', 'reload'))
+def test_codes_contention(bench, writer):
+    """Call the active code per frame, while another thread reloads codes or not."""
+    codes = Codes(['def fn(d):\n    return d\n', 'def fn(d):\n    return d\n\n'])
+    codes.reload(0)
+    done = threading.Event()
+
+    def write():
+        i = 0
+        while not done.is_set():
+            codes.reload(i % 2)
+            i += 1
+
+    t = threading.Thread(target=write)
+    if writer:
+        t.start()
+    try:
+        r = profile(n=SIZES[0])
+        bench(lambda: codes(r))
+    finally:
+        done.set()
+        if writer:
+            t.join()
+        codes.shutdown()
+
+
+def test_latency_lap(bench):
+    s = LatencyStats(['a'])
+    t = time.perf_counter()
+    bench(lambda: s.lap('a', t))
+
+
+def test_modbus_msg(bench):
+    chain = _chain()
+    bench(lambda: chain.modbus_msg('12345', True, 12.34, -5.67))
+
+
+def test_chain(bench, pnts):
+    chain = _chain()
+    bench(lambda: chain(pnts.copy(), '1', 0., 0.))
+
+
+def test_numpify(bench, pnts):
+    pytest.importorskip('sensor_msgs')
+    rnp = pytest.importorskip('ros2_numpy')
+    from sensor_msgs.msg import PointCloud2
+    msg = rnp.msgify(PointCloud2, pnts)
+    bench(lambda: rnp.numpify(msg))
+
+
+def test_msgify(bench, pnts):
+    pytest.importorskip('sensor_msgs')
+    rnp = pytest.importorskip('ros2_numpy')
+    from sensor_msgs.msg import PointCloud2
+    msg = PointCloud2()
+    bench(lambda: rnp.msgify(PointCloud2, pnts, msg=msg))
+
+
+@pytest.mark.parametrize('copy', (False, True), ids=('view', 'copy'))
+@pytest.mark.parametrize('n', (2000, 8000, 32000))
+def test_numpify_large(bench, allocations, n, copy):
+    pytest.importorskip('sensor_msgs')
+    rnp = pytest.importorskip('ros2_numpy')
+    from sensor_msgs.msg import PointCloud2
+    msg = rnp.msgify(PointCloud2, profile(n=n))
+    _, size = allocations(lambda: rnp.numpify(msg, copy=copy))
+    if not copy:
+        # A view holds none of the points.
+        assert size < msg.point_step * n
+    bench(lambda: rnp.numpify(msg, copy=copy))
+
+
+@pytest.mark.parametrize('reuse', (False, True), ids=('new', 'reuse'))
+@pytest.mark.parametrize('n', (2000, 8000, 32000))
+def test_msgify_large(bench, allocations, n, reuse):
+    pytest.importorskip('sensor_msgs')
+    rnp = pytest.importorskip('ros2_numpy')
+    from sensor_msgs.msg import PointCloud2
+    d = profile(n=n)
+    msg = PointCloud2() if reuse else None
+    allocations(lambda: rnp.msgify(PointCloud2, d, is_dense=True, msg=msg))
+    bench(lambda: rnp.msgify(PointCloud2, d, is_dense=True, msg=msg))
+
+
+def test_cb_sub(bench, pnts):
+    """Numpify, the chain and msgify, as the subscription callback without ROS transport."""
+    pytest.importorskip('sensor_msgs')
+    rnp = pytest.importorskip('ros2_numpy')
+    from sensor_msgs.msg import PointCloud2
+    chain = _chain()
+    msg = rnp.msgify(PointCloud2, pnts)
+    out = PointCloud2()
+
+    def cb():
+        r, m = chain(rnp.numpify(msg), '1', 0., 0.)
+        rnp.msgify(PointCloud2, r, msg=out)
+
+    bench(cb)
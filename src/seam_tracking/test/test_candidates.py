@@ -0,0 +1,59 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+from seam_tracking.candidates import candidate_dtype, choose, dtype, resolve
+
+
+def points(n: int = 5):
+    d = np.zeros(n, dtype=dtype)
+    d['x'] = np.arange(n)
+    d['i'] = np.arange(n)
+    return d
+
+
+def test_choose():
+    c = np.array([(10., 0., 0.8), (20., 0., 0.2)], dtype=candidate_dtype)
+    assert choose(c) == 0
+    assert choose(c, (19., 0.)) == 1
+    assert choose(c, (14., 0.)) == 0
+    assert choose(c[:0]) == -1
+    c['score'] = 0.
+    assert choose(c) == -1
+    c['score'] = np.nan
+    assert choose(c) == -1
+
+
+def test_resolve():
+    d = points()
+    assert resolve(d) is d
+
+    c = np.array([(10., 1., 0.8), (20., 2., 0.2)], dtype=candidate_dtype)
+    r = resolve((d, c), (19., 2.))
+    assert r.size == 7 and tuple(r[0]) == (20., 2., -1.)
+    assert np.array_equal(r[1:6], d) and tuple(r[6]) == (10., 1., -6.)
+
+    r = resolve((d, c))
+    assert tuple(r[0]) == (10., 1., -1.) and tuple(r[6]) == (20., 2., -6.)
+
+    c['score'] = 0.
+    r = resolve((d, c))
+    assert r.size == 7 and np.array_equal(r[:5], d) and np.all(r['i'][5:] == -6)
+
+    r = resolve((d, c[:0]))
+    assert np.array_equal(r, d)
+
+    with pytest.raises(TypeError):
+        resolve((d, np.zeros(2)))
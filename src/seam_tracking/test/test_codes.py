@@ -0,0 +1,199 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import numpy as np
+import pytest
+from seam_tracking.codes import Codes, digest
+
+LOADED = []
+
+TASK_A = """
+from test_codes import LOADED
+LOADED.append('a')
+def fn(d):
+    return d + 1
+"""
+
+TASK_B = """
+def fn(d):
+    return d * 2
+"""
+
+TASK_BAD = """
+def fn(d)
+    return d
+"""
+
+
+def test_reload():
+    codes = Codes([TASK_A, TASK_B])
+    assert codes.prepare() == {}
+    codes.reload(0)
+    assert codes(1) == 2
+    codes.reload(1)
+    assert codes(1) == 2 * 1
+    assert codes(3) == 6
+
+    with pytest.raises(IndexError):
+        codes.reload(2)
+
+
+def test_compile_once():
+    LOADED.clear()
+    codes = Codes([TASK_A, TASK_B])
+    codes.prepare()
+    for i in range(10):
+        codes.reload(i % 2)
+    assert LOADED == ['a']
+
+    codes[:] = [TASK_B, TASK_A]
+    codes.prepare()
+    codes.reload(1)
+    assert codes(1) == 2
+    assert LOADED == ['a']
+
+
+def test_errors():
+    codes = Codes([TASK_A, TASK_BAD, TASK_B, ''])
+    errors = codes.prepare()
+    assert list(errors) == [1]
+    assert isinstance(errors[1], SyntaxError)
+
+    codes.reload(1)
+    with pytest.raises(RuntimeError):
+        codes(1)
+
+    codes.reload(3)
+    with pytest.raises(KeyError):
+        codes(1)
+
+
+TASK_SLOW = """
+import time
+time.sleep(0.5)
+def fn(d):
+    return d - 1
+"""
+
+TASK_WARMUP = """
+def fn(d):
+    assert d.all()
+    return d
+"""
+
+
+def test_load():
+    codes = Codes([TASK_A, TASK_B, TASK_BAD])
+    s = codes.load(0).result()
+    assert s['state'] == 'ready' and s['task'] == 0
+    assert list(s['errors']) == [2]
+    assert codes(1) == 2
+
+    s = codes.load(2).result()
+    assert s['state'] == 'failed' and s['error']
+    assert codes.status()['state'] == 'failed'
+
+    s = codes.load(3).result()
+    assert s['state'] == 'failed'
+    codes.shutdown()
+
+
+def test_hot_swap():
+    codes = Codes([TASK_A])
+    codes.load(0).result()
+    codes[:] = [TASK_A, TASK_SLOW]
+
+    f = codes.load(1)
+    assert codes.status()['state'] == 'loading'
+    # Calls are not blocked and keep going to the previous code.
+    t = time.monotonic()
+    ret = []
+    while not f.done():
+        ret.append(codes(1))
+        assert codes[0] == TASK_A
+    assert time.monotonic() - t > 0.3
+    # Swapped exactly once, from the previous code to the new one.
+    assert ret[0] == 2 and set(ret) <= {0, 2} and ret == sorted(ret, reverse=True)
+    assert f.result()['state'] == 'ready'
+    assert codes(1) == 0
+    codes.shutdown()
+
+
+def test_supersede():
+    codes = Codes([TASK_A, TASK_B, TASK_SLOW])
+    f1 = codes.load(2)
+    f2 = codes.load(1)
+    assert f2.result()['state'] == 'ready'
+    assert f1.result()['state'] in ('ready', 'superseded')
+    assert codes.status()['task'] == 1
+    assert codes(1) == 2
+    codes.shutdown()
+
+
+def test_warmup():
+    codes = Codes([TASK_A, TASK_WARMUP])
+    s = codes.load(1, frame=np.zeros(3)).result()
+    assert s['state'] == 'failed'
+    # Published anyway, the warm up frame may be the odd one.
+    assert codes(np.ones(3))[0] == 1
+
+    d = np.ones(3)
+    s = codes.load(0, frame=d).result()
+    assert s['state'] == 'ready'
+    assert d[0] == 1
+    codes.shutdown()
+
+
+def test_snapshot():
+    codes = Codes([TASK_A, TASK_B])
+    codes.reload(0)
+    s = codes.snapshot()
+    codes[:] = [TASK_B]
+    codes.reload(0)
+    assert s.sources == (TASK_A, TASK_B) and s.task == 0 and s.fn(1) == 2
+    assert codes.snapshot().sources == (TASK_B,) and codes(1) == 2
+    assert list(codes) == [TASK_B] and len(codes) == 1
+
+    del codes[0]
+    assert len(codes) == 0
+    # The active code stays until another one is loaded.
+    assert codes(1) == 2
+
+
+def test_consistent_snapshot():
+    codes = Codes(['def fn():\n    return 0\n', 'def fn():\n    return 1\n', ''])
+    codes.reload(0)
+    done = threading.Event()
+
+    def write():
+        i = 0
+        while not done.is_set():
+            codes[2] = str(i)
+            codes.reload(i % 2)
+            i += 1
+
+    t = threading.Thread(target=write)
+    t.start()
+    try:
+        for _ in range(20000):
+            snap = codes.snapshot()
+            assert snap.fn is snap.code.fn and snap.fn() == snap.task
+            assert snap.code.digest == digest(snap.sources[snap.task])
+            assert codes() in (0, 1)
+    finally:
+        done.set()
+        t.join()
+        codes.shutdown()
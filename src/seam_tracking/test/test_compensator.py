@@ -0,0 +1,64 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from seam_tracking.compensator import LatencyCompensator
+
+dtype = [(x, np.float32) for x in 'xyi']
+
+
+def seam(x: float, y: float, i: float = -1):
+    return np.array([(x, y, i), (0, 0, 0)], dtype=dtype)
+
+
+def test_compensate():
+    c = LatencyCompensator(enable=True, window=5, max_lead=0.1)
+    assert c.velocity() is None
+    r = c(seam(10., 5.), 0., 0.05)
+    assert r[0][0] == 10. and c.lead == 0.
+
+    # 20 mm/s along x, -10 mm/s along y at 100 Hz, sent 30 ms after exposure.
+    for k in range(1, 10):
+        t = k * 0.01
+        r = c(seam(10. + 20 * t, 5. - 10 * t), t, t + 0.03)
+    assert np.allclose(c.velocity(), (20., -10.))
+    assert np.isclose(c.lead, 0.03) and np.allclose(c.delta, (0.6, -0.3))
+    assert np.isclose(r[0][0], 10. + 20 * 0.12, atol=1e-4)
+    assert np.isclose(r[0][1], 5. - 10 * 0.12, atol=1e-4)
+    assert r[1][0] == 0.
+
+    # Lead is capped.
+    r = c(seam(12., 4.), 0.1, 1.)
+    assert np.isclose(c.lead, 0.1) and np.isclose(r[0][0], 14., atol=1e-4)
+
+
+def test_disabled():
+    c = LatencyCompensator()
+    for k in range(5):
+        r = c(seam(k, 0.), k * 0.01, k * 0.01 + 0.05)
+        assert r[0][0] == k
+    assert np.isclose(c.velocity()[0], 100.) and c.lead == 0.
+
+
+def test_history():
+    c = LatencyCompensator(enable=True, horizon=0.5)
+    c(seam(0., 0.), 0., 0.)
+    c(seam(1., 0.), 0.01, 0.01)
+    r = c(seam(5., 5., -8), 0.02, 0.05)
+    assert r[0][0] == 5. and c.lead == 0.
+    assert c.velocity() is not None
+
+    # Stale seams are forgotten.
+    r = c(seam(50., 0.), 10., 10.05)
+    assert r[0][0] == 50. and c.velocity() is None
@@ -14,6 +14,7 @@
 
 import numpy as np
 from collections import deque
+from seam_tracking.ring_filter import RingFilter
 
 dtype = [(x, np.float32) for x in 'xyi']
 
@@ -141,3 +142,95 @@ def test_gap_step():
     assert ret[0][2] == -8
     ret = filter._filter(d.copy())
     assert ret[0][2] == -8
+
+
+def _ring():
+    return RingFilter(enable=True, window_size=10, gap=2, step=2., length=5)
+
+
+def test_ring_length():
+    d = np.array([(0, 0, -1)], dtype=dtype)
+
+    for length in (5, 6):
+        filter = _ring()
+        filter.length = length
+        for i in range(length):
+            ret = filter(d.copy())
+            assert ret[0][2] == -8
+
+        ret = filter(d.copy())
+        assert ret[0][2] == -1
+
+
+def test_ring_enable():
+    d = np.array([(0, 0, -1)], dtype=dtype)
+
+    filter = _ring()
+    filter.enable = False
+    for i in range(5):
+        ret = filter(d.copy())
+        assert ret[0][2] == -1
+
+
+def test_ring_gap_step():
+    d = np.array([(0, 0, -1)], dtype=dtype)
+    z = np.array([(0, 0, -2)], dtype=dtype)
+    u = np.array([(0, 4, -1)], dtype=dtype)
+
+    filter = _ring()
+    for r in (d, d, z, d, d, d):
+        ret = filter(r.copy())
+    assert ret[0][2] == -1
+
+    filter = _ring()
+    for r in (d, d, z, z, d, d):
+        ret = filter(r.copy())
+    assert ret[0][2] == -8
+
+    filter = _ring()
+    for r in (u, u, z, d, d):
+        ret = filter(r.copy())
+    assert ret[0][2] == -8
+    ret = filter(d.copy())
+    assert ret[0][2] == -1
+
+    filter = _ring()
+    filter.step = 1.999
+    for r in (u, u, z, d, d):
+        ret = filter(r.copy())
+    assert ret[0][2] == -8
+    ret = filter(d.copy())
+    assert ret[0][2] == -8
+
+
+def test_ring_window_size():
+    d = np.array([(0, 0, -1)], dtype=dtype)
+
+    filter = _ring()
+    filter.window_size = 3
+    for i in range(10):
+        ret = filter(d.copy())
+        assert ret[0][2] == -8
+    assert len(filter) == 3
+
+    # History dropped by a smaller window is not restored by a larger one.
+    filter.window_size = 300
+    for i in range(2):
+        ret = filter(d.copy())
+        assert ret[0][2] == -8
+    assert len(filter) == 5
+    ret = filter(d.copy())
+    assert ret[0][2] == -1
+
+
+def test_ring_random():
+    rng = np.random.default_rng(0)
+    for ws, gap, step, length in [(10, 2, 2., 5), (30, 3, 1., 12), (300, 4, .5, 200)]:
+        ref = Filter()
+        ref._ws, ref._gap, ref._step, ref._length = ws, gap, step, length
+        filter = RingFilter(enable=True, window_size=ws, gap=gap, step=step, length=length)
+        y = np.cumsum(rng.normal(0, .5, 3000))
+        v = rng.random(3000) > .1
+        for i in range(3000):
+            r = np.array([(0, y[i], -1 if v[i] else 0)], dtype=dtype)
+            assert ref._filter(r.copy())[0][2] == filter(r.copy())[0][2]
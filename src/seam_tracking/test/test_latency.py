@@ -0,0 +1,70 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+import numpy as np
+from seam_tracking.latency import _index, _upper, Histogram, LatencyStats
+
+
+def test_buckets():
+    us = np.arange(1 << 20)
+    k = np.array([_index(int(v)) for v in us])
+    assert np.all(np.diff(k) >= 0)
+    assert k[-1] - k[0] < 400
+    up = _upper(k)
+    assert np.all(up >= us)
+    assert np.all(up - us <= us / 16)
+    # The upper value of a bucket is its own.
+    assert np.array_equal(k, [_index(int(v)) for v in up])
+
+
+def test_percentiles():
+    h = Histogram()
+    assert np.isnan(h.percentiles([50])).all()
+    rng = np.random.default_rng(0)
+    v = rng.lognormal(np.log(1e-3), 1., 10000)
+    for x in v:
+        h.record(x)
+    assert h.count == v.size and h.max == v.max()
+    p = h.percentiles([50, 99, 99.9, 100])
+    e = np.percentile(v, [50, 99, 99.9, 100])
+    assert np.all(p >= e * (1 - 1e-6) - 1e-6)
+    assert np.all(p <= e * (1 + 1 / 16) + 1e-6)
+    assert p[-1] == v.max()
+    h.reset()
+    assert h.count == 0 and np.isnan(h.percentiles([50])).all()
+
+
+def test_clamp():
+    h = Histogram(highest=1.)
+    h.record(-1.)
+    h.record(100.)
+    assert h.count == 2
+    p = h.percentiles([0, 100])
+    assert p[0] == 0 and 1. <= p[1] <= 100.
+
+
+def test_stats():
+    s = LatencyStats(['a', 'b'])
+    t = time.perf_counter()
+    t = s.lap('a', t)
+    s.lap('b', t)
+    s.record('b', .5)
+    ret = s.summary((50, 100))
+    assert list(ret) == ['a', 'b']
+    assert ret['a'][0] == 1 and ret['b'][0] == 2
+    assert ret['b'][2] == ret['b'][3] == .5
+    s.reset()
+    assert s.summary()['b'][0] == 0
@@ -0,0 +1,69 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import pytest
+from seam_tracking.mailbox import Mailbox
+
+
+def test_single():
+    m = Mailbox()
+    assert m.get() is None
+    for i in range(5):
+        m.put(i)
+    assert len(m) == 1
+    assert m.get() == 4
+    assert m.get() is None
+    assert m.count == 5 and m.dropped == 4
+
+
+def test_size():
+    m = Mailbox(3)
+    for i in range(5):
+        m.put(i)
+    assert [m.get() for i in range(4)] == [2, 3, 4, None]
+    assert m.dropped == 2
+
+    with pytest.raises(ValueError):
+        Mailbox(0)
+
+
+def test_notify():
+    n = []
+    m = Mailbox(notify=lambda: n.append(len(m)))
+    m.put(1)
+    m.put(2)
+    assert n == [1, 1]
+
+
+def test_threads():
+    m = Mailbox(2)
+    got = []
+    done = threading.Event()
+
+    def consumer():
+        while not done.is_set() or len(m):
+            t = m.get()
+            if t is not None:
+                got.append(t)
+
+    t = threading.Thread(target=consumer)
+    t.start()
+    for i in range(10000):
+        m.put(i)
+    done.set()
+    t.join()
+    assert got == sorted(got)
+    assert got[-1] == 9999
+    assert len(got) + m.dropped == 10000
@@ -0,0 +1,116 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import socketserver
+import threading
+import time
+from seam_tracking.modbus_sender import ModbusSender, parse_response
+
+
+def frame(id: int):
+    return id.to_bytes(2, 'big') + bytes([
+        0x00, 0x00, 0x00, 0x0d, 0x01, 0x10,
+        0x00, 0x02, 0x00, 0x03, 0x06,
+        0x00, 0xff, 0x00, 0x01, 0x00, 0x02])
+
+
+class Handler(socketserver.BaseRequestHandler):
+    """Reply to write multiple registers like a modbus server, slowly if asked."""
+
+    delay = 0.
+
+    def handle(self):
+        while True:
+            s = b''
+            while len(s) < 19:
+                t = self.request.recv(19 - len(s))
+                if not t:
+                    return
+                s += t
+            self.server.frames.append(s)
+            time.sleep(self.delay)
+            self.request.sendall(s[0:4] + bytes([0x00, 0x06]) + s[6:12])
+
+
+def serve(delay: float = 0.):
+    handler = type('H', (Handler,), {'delay': delay})
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    server.frames = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait(cond, timeout: float = 5.):
+    t = time.monotonic()
+    while not cond() and time.monotonic() - t < timeout:
+        time.sleep(0.01)
+    return cond()
+
+
+def test_parse_response():
+    assert parse_response(bytes([
+        0x00, 0x7b, 0x00, 0x00, 0x00, 0x06, 0x01,
+        0x10, 0x00, 0x02, 0x00, 0x03])) == (123, True, 0)
+    assert parse_response(bytes([
+        0x00, 0x7b, 0x00, 0x00, 0x00, 0x03, 0x01,
+        0x90, 0x02])) == (123, False, 2)
+
+
+def test_send():
+    server = serve()
+    sender = ModbusSender(port=server.server_address[1], retry=0.1)
+    sender.start()
+    assert wait(lambda: sender.stats()['connected'])
+
+    for i in range(10):
+        sender.send(frame(i))
+        assert wait(lambda: sender.stats()['succeeded'] == i + 1)
+
+    s = sender.stats()
+    assert s['sent'] == 10 and s['failed'] == 0 and s['dropped'] == 0
+    assert s['rtt'] is not None and s['rtt_mean'] <= s['rtt_max']
+    assert server.frames == [frame(i) for i in range(10)]
+
+    sender.stop()
+    server.shutdown()
+
+
+def test_conflate():
+    server = serve(delay=0.2)
+    sender = ModbusSender(port=server.server_address[1], retry=0.1)
+    sender.start()
+    assert wait(lambda: sender.stats()['connected'])
+
+    for i in range(100):
+        sender.send(frame(i))
+    assert wait(lambda: server.frames and server.frames[-1] == frame(99))
+
+    s = sender.stats()
+    assert s['sent'] + s['dropped'] == 100
+    assert s['dropped'] >= 90
+
+    sender.stop()
+    server.shutdown()
+
+
+def test_reconnect():
+    sender = ModbusSender(port=1, retry=0.05)
+    sender.start()
+    for i in range(10):
+        sender.send(frame(i))
+    time.sleep(0.2)
+    s = sender.stats()
+    assert not s['connected'] and s['sent'] == 0 and s['dropped'] == 9
+    sender.stop()
@@ -12,6 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy as np
+from seam_tracking.modbus_frame import FrameEncoder, FRAME_SIZE
+
 
 def modbus_msg(id: str, valid: bool, u: float, v: float):
     id = int(id) % 0x10000
@@ -36,6 +39,69 @@ def modbus_msg(id: str, valid: bool, u: float, v: float):
     return s
 
 
+def modbus_msg_signed(id: str, valid: bool, u: float, v: float):
+    id = int(id) % 0x10000
+    s = id.to_bytes(2, 'big')
+    s += bytes([0x00, 0x00, 0x00, 0x0d, 0x01, 0x10])
+    s += bytes([0x00, 0x02, 0x00, 0x03, 0x06])
+
+    b = bytes([0x00, 0xff]) if valid else bytes([0x00, 0x00])
+
+    try:
+        t = bytes()
+        t += round(u * 100).to_bytes(2, 'big', signed=True)
+        t += round(v * 100).to_bytes(2, 'big', signed=True)
+    except Exception:
+        s += bytes([0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
+    else:
+        s += b + t
+
+    return s
+
+
+def cases():
+    rng = np.random.default_rng(0)
+    ret = [
+        ('123', True, 0.01, 0.02), ('65537', False, 655, 0.02),
+        ('65537', False, 656, 0.02), ('1', True, -0.01, 0.),
+        ('2', True, 327.67, -327.68), ('3', True, 327.68, 0.),
+        ('4', True, float('nan'), 0.), ('5', True, 0., float('inf'))]
+    for i in range(1000):
+        ret.append((str(i * 37), bool(i % 2), *rng.uniform(-700, 700, 2)))
+    return ret
+
+
+def test_encoder():
+    unsigned = FrameEncoder(signed=False)
+    signed = FrameEncoder()
+    for c in cases():
+        assert unsigned.encode(int(c[0]), *c[1:]) == modbus_msg(*c)
+        assert signed.encode(int(c[0]), *c[1:]) == modbus_msg_signed(*c)
+    assert signed.overflow > 0
+
+
+def test_encoder_clamp():
+    e = FrameEncoder(overflow='clamp')
+    s = e.encode(1, True, 400, -400)
+    assert s[13:] == bytes([0x00, 0xff, 0x7f, 0xff, 0x80, 0x00])
+    assert e.overflow == 1
+    s = e.encode(1, True, float('nan'), 1)
+    assert s[13:] == bytes([0x00, 0xff, 0x00, 0x00, 0x00, 0x64])
+    assert e.overflow == 2
+
+
+def test_encoder_many():
+    for signed in (True, False):
+        for overflow in ('zero', 'clamp'):
+            c = cases()
+            one = FrameEncoder(signed=signed, overflow=overflow)
+            many = FrameEncoder(signed=signed, overflow=overflow)
+            s = many.encode_many(*zip(*[(int(x[0]), *x[1:]) for x in c]))
+            assert len(s) == FRAME_SIZE * len(c)
+            assert s == b''.join(one.encode(int(x[0]), *x[1:]) for x in c)
+            assert one.overflow == many.overflow
+
+
 def test_modbus_msg():
     s = modbus_msg('123', True, 0.01, 0.02)
     assert s == bytes([
@@ -0,0 +1,82 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import pytest
+
+rclpy = pytest.importorskip('rclpy')
+pytest.importorskip('shared_interfaces')
+
+PARAMS = os.path.join(os.path.dirname(__file__), '..', 'config', 'params.yaml')
+
+
+@pytest.fixture
+def node(request):
+    from seam_tracking.seam_tracking_node import SeamTracking
+    rclpy.init(args=request.param)
+    node = SeamTracking()
+    yield node
+    node.destroy_node()
+    rclpy.try_shutdown()
+
+
+@pytest.mark.parametrize(
+    'node', [[], ['--ros-args', '--params-file', PARAMS]], indirect=True,
+    ids=['defaults', 'params'])
+def test_startup(node):
+    assert node.get_parameter('pipeline').value == [-1]
+    assert node._pipeline == []
+
+
+@pytest.mark.parametrize('node', [[]], indirect=True)
+def test_set_pipeline(node):
+    from rclpy.parameter import Parameter
+    node.set_parameters([Parameter('pipeline', Parameter.Type.INTEGER_ARRAY, [0, 0])])
+    assert node._pipeline == [0, 0]
+    node.set_parameters([Parameter('pipeline', Parameter.Type.INTEGER_ARRAY, [-1])])
+    assert node._pipeline == []
+
+
+def test_profile_generator_params():
+    from rclpy.parameter import Parameter
+    from seam_tracking.profile_generator_node import ProfileGenerator
+    rclpy.init()
+    node = ProfileGenerator()
+    try:
+        for name, value in (('rate', 0.), ('rows', 0), ('angle', 0.), ('dropout', 2.)):
+            ret = node.set_parameters([Parameter(name, value=value)])[0]
+            assert not ret.successful and ret.reason.startswith(name)
+        assert node.set_parameters([Parameter('rows', value=500)])[0].successful
+        assert node._gen.n == 500
+    finally:
+        node.destroy_node()
+        rclpy.try_shutdown()
+
+
+def test_stripe_generator_params():
+    from rclpy.parameter import Parameter
+    from seam_tracking.stripe_generator_node import StripeGenerator
+    rclpy.init(args=['--ros-args', '-p', 'width:=64', '-p', 'height:=32', '-p', 'frames:=2'])
+    node = StripeGenerator()
+    try:
+        ret = node.set_parameters([Parameter('rate', value=0.)])[0]
+        assert not ret.successful and ret.reason.startswith('rate')
+        ret = node.set_parameters([Parameter('sigma', value=1.)])[0]
+        assert not ret.successful and 'restart' in ret.reason
+        assert node.set_parameters([Parameter('rate', value=10.)])[0].successful
+        assert node._pacer.rate == 10.
+    finally:
+        node.destroy_node()
+        rclpy.try_shutdown()
@@ -0,0 +1,139 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+from seam_tracking.codes import Codes
+from seam_tracking.pipeline import Context, Pipeline
+from seam_tracking.plugin_pool import dtype as pool_dtype, PluginPool
+
+dtype = [(x, np.float32) for x in 'xyi']
+
+CALLS = []
+
+DENOISE = """
+NAME = 'denoise'
+from test_pipeline import CALLS
+
+def fn(d, ctx):
+    CALLS.append(('denoise', ctx.slope() is ctx.slope()))
+    ctx.data['median'] = ctx.median(3)
+    return d
+"""
+
+RESAMPLE = """
+NAME = 'resample'
+from test_pipeline import CALLS
+
+def fn(d, ctx):
+    CALLS.append(('resample', 'median' in ctx.data))
+    return d[::2].copy()
+"""
+
+LOCATE = """
+from test_pipeline import CALLS
+
+def fn(d):
+    CALLS.append(('locate', d.size))
+    return d
+"""
+
+LOCATE_CTX = """
+def fn(d, ctx):
+    ctx.data['size'] = ctx.valid().size
+    d['i'][:] = ctx.data['size']
+    return d
+"""
+
+
+def profile(n: int = 10):
+    d = np.zeros(n, dtype=dtype)
+    d['x'] = np.arange(n)
+    d['y'] = np.arange(n) ** 2
+    d['y'][3] = np.nan
+    return d
+
+
+def test_context():
+    d = profile()
+    ctx = Context(d)
+    assert ctx.valid().tolist() == [i != 3 for i in range(10)]
+    assert ctx.diff() is ctx.diff()
+    assert np.allclose(ctx.diff('x'), 1.)
+    assert np.allclose(ctx.slope()[5:], 2 * np.arange(5, 9) + 1)
+    assert np.allclose(ctx.gradient()[5:-1], 2 * np.arange(5, 9))
+    assert ctx.curvature().shape == (10,)
+    m = ctx.median(3)
+    assert np.isnan(m[0]) and np.isnan(m[-1]) and m[1] == 1 and m[3] == 10
+
+    n = [0]
+
+    def count(p):
+        n[0] += 1
+        return p.size
+    assert ctx.memo('n', count) == 10 and ctx.memo('n', count) == 10 and n[0] == 1
+
+    ctx.reset(d)
+    assert ctx.memo('n', count) == 10 and n[0] == 1
+    ctx.reset(d[:5])
+    assert ctx.memo('n', count) == 5 and n[0] == 2
+    ctx.invalidate()
+    assert ctx.memo('n', count) == 5 and n[0] == 3
+
+    ctx = Context(profile()[:1])
+    assert np.isnan(ctx.gradient()).all() and np.isnan(ctx.median(3)).all()
+
+
+def test_codes_pipeline():
+    CALLS.clear()
+    codes = Codes([DENOISE, RESAMPLE, LOCATE, '', LOCATE_CTX])
+    s = codes.load([0, 1, 2]).result()
+    assert s['state'] == 'ready' and s['task'] == (0, 1, 2)
+    assert codes.status()['task'] == (0, 1, 2)
+
+    CALLS.clear()
+    r = codes(profile())
+    assert r.size == 5
+    assert CALLS == [('denoise', True), ('resample', True), ('locate', 5)]
+
+    code = codes.snapshot().code
+    assert isinstance(code, Pipeline) and code.ok
+    stats = code.stats()
+    assert list(stats) == ['denoise', 'resample', '2']
+    assert all(v['count'] == 1 and v['max'] >= v['mean'] >= 0 for v in stats.values())
+
+    codes.reload([4, 4])
+    assert list(codes.snapshot().code.stats()) == ['4', '4.1']
+    assert np.all(codes(profile())['i'] == 10)
+
+    s = codes.load([0, 3], profile()).result()
+    assert s['state'] == 'failed' and s['task'] == (0, 3)
+    with pytest.raises(KeyError):
+        codes(profile())
+    codes.shutdown()
+
+
+def test_pool_pipeline():
+    codes = Codes([LOCATE_CTX, LOCATE_CTX])
+    codes.reload([0, 1])
+    code = codes.snapshot().code
+    pool = PluginPool(workers=1, deadline=5.)
+    assert pool.wait()
+    try:
+        pool.load(code.source, code.digest)
+        r = pool(profile().astype(pool_dtype))
+        assert r.size == 10 and np.all(r['i'] == 10)
+    finally:
+        pool.close()
+        codes.shutdown()
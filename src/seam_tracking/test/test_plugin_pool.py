@@ -0,0 +1,143 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+from seam_tracking.plugin_pool import PluginPool, dtype
+
+TASK = """
+import numpy as np
+
+def fn(pnts):
+    i = np.argmax(pnts['y'])
+    ret = np.concatenate((pnts[i:i + 1], pnts))
+    ret[0]['i'] = -1
+    return ret
+"""
+
+TASK_CANDIDATES = """
+import numpy as np
+
+def fn(pnts):
+    c = np.array([(1, 2, 0.8), (3, 4, 0.2)], dtype=[('x', 'f4'), ('y', 'f4'), ('score', 'f4')])
+    return pnts, c
+"""
+
+TASK_BAD = """
+def fn(pnts):
+    raise ValueError('bad')
+"""
+
+TASK_HANG = """
+def fn(pnts):
+    if pnts['y'][0] > 0:
+        while True:
+            pass
+    return pnts
+"""
+
+
+def frame(y0: float = 0.):
+    ret = np.zeros(100, dtype=dtype)
+    ret['x'] = np.arange(100)
+    ret['y'] = np.sin(np.arange(100) / 30)
+    ret['y'][0] = y0
+    return ret
+
+
+@pytest.fixture
+def pool():
+    p = PluginPool(workers=2, deadline=1.)
+    assert p.wait()
+    yield p
+    p.close()
+
+
+def test_run(pool):
+    with pytest.raises(RuntimeError):
+        pool(frame())
+    pool.load(TASK, 'a')
+    for _ in range(3):
+        r = pool(frame())
+        assert r.dtype == dtype and r.size == 101
+        assert r[0]['i'] == -1 and r[0]['x'] == 47
+        assert np.array_equal(r[1:], frame())
+    assert pool.missed == 0 and pool.recycled == 0
+
+
+def test_candidates(pool):
+    pool.load(TASK_CANDIDATES, 'c')
+    r, c = pool(frame())
+    assert np.array_equal(r, frame())
+    assert np.allclose(c['x'], [1, 3]) and np.allclose(c['score'], [0.8, 0.2])
+
+
+def test_error(pool):
+    pool.load(TASK_BAD, 'b')
+    with pytest.raises(RuntimeError, match='bad'):
+        pool(frame())
+    pool.load(TASK, 'a')
+    assert pool(frame())[0]['i'] == -1
+
+
+def test_deadline(pool):
+    pool.deadline = 0.2
+    pool.load(TASK_HANG, 'h')
+    f = frame(1.)
+    r = pool(f)
+    assert r is f and not np.any(r['i'] == -1)
+    assert pool.missed == 1 and pool.recycled == 1
+
+    # The spare worker takes over while the recycled one starts.
+    assert np.array_equal(pool(frame()), frame())
+    pool.deadline = 10.
+    for _ in range(4):
+        assert np.array_equal(pool(frame()), frame())
+    assert pool.missed == 1 and pool.recycled == 1
+
+
+def test_dead_worker(pool):
+    pool.load(TASK, 'a')
+    assert pool(frame())[0]['i'] == -1
+    pool._workers[0].proc.kill()
+    pool._workers[0].proc.join()
+    f = frame()
+    r = pool(f)
+    assert r is f
+    assert pool.missed == 1 and pool.recycled == 1
+
+    # The spare worker takes over, then the recycled one runs the loaded code.
+    assert pool(frame())[0]['i'] == -1
+    assert pool.wait()
+    pool._workers[1].proc.kill()
+    pool._workers[1].proc.join()
+    pool.load(TASK_CANDIDATES, 'c')
+    assert pool.recycled == 2
+    assert pool.wait()
+    r, c = pool(frame())
+    assert np.array_equal(r, frame())
+
+
+def test_start():
+    p = PluginPool(workers=1, deadline=1.)
+    try:
+        # Frames are skipped until a worker started, without blocking.
+        p.load(TASK, 'a')
+        f = frame()
+        r = p(f)
+        while r is f:
+            r = p(f)
+        assert r[0]['i'] == -1 and p.missed > 0 and p.recycled == 0
+    finally:
+        p.close()
@@ -0,0 +1,179 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from numpy.polynomial.polynomial import polyfit
+import pytest
+from seam_tracking.primitives import cross, cross_many, dtype, fit_line, interpolate
+from seam_tracking.primitives import local_max, local_min, ransac_line
+import test_numpy as ref
+
+
+def profile(n: int = 2000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    d = np.zeros(n, dtype=dtype)
+    d['x'] = np.arange(n) * 0.1
+    d['y'] = np.abs(np.arange(n) - n * 0.4) * 0.05 + rng.normal(0, 1, n)
+    d['y'][rng.random(n) < 0.1] = np.nan
+    d['x'][np.isnan(d['y'])] = np.nan
+    d['i'] = np.arange(n)
+    return d
+
+
+def test_interpolate():
+    assert interpolate(np.array([], dtype=dtype)).size == 0
+    d = np.array([(1, 2, 0), (3, 4, 5), (1, 2, 9)], dtype=dtype)
+    assert interpolate(d).tobytes() == ref.interpolate(d).tobytes()
+
+
+@pytest.mark.parametrize('delta', [1, 2, 3, 7, 25])
+def test_extrema(delta):
+    assert local_max(np.array([], dtype=dtype), delta=delta) == []
+    for seed in range(5):
+        for n in (1, 10, 99, 2000):
+            d = profile(n, seed)
+            assert local_max(d, delta=delta) == ref.local_max(d, delta=delta)
+            assert local_min(d, delta=delta) == ref.local_min(d, delta=delta)
+
+    d = np.zeros(10, dtype=dtype)
+    d['y'][5] = 10
+    d['y'][7] = 10
+    assert local_max(d, delta=3) == [5]
+
+    d['y'][:] = np.nan
+    assert local_max(d, delta=3) == []
+    with pytest.raises(ValueError):
+        local_max(d, delta=0)
+
+
+def test_fit_line():
+    rng = np.random.default_rng(0)
+    x = rng.random(100)
+    y = 3 * x + 2 + rng.normal(0, 0.1, 100)
+    assert np.allclose(fit_line(x, y), polyfit(x, y, 1))
+
+
+@pytest.mark.parametrize('args', [
+    dict(id=10, delta=5), dict(id=10, delta=0), dict(id=10, delta=5, num=8),
+    dict(id=10, delta=5, num=7), dict(id=10, delta=5, num=3)])
+def test_cross(args):
+    l1 = [(i, i, 0) for i in range(10)]
+    l2 = [(10 - i, i, 0) for i in range(10, -1, -1)]
+    d1 = np.array(l1 + l2, dtype=dtype)
+    d2 = d1.copy()
+    id = args.pop('id')
+    r1 = cross(d1, id, **args)
+    r2 = ref.cross(d2, id, **args)
+    assert np.array_equal(d1, d2)
+    assert np.allclose(r1.tolist(), r2.tolist(), atol=1e-4) and r1.size == r2.size
+
+
+def test_cross_nan():
+    d1 = profile()
+    d2 = d1.copy()
+    r1 = cross(d1, 800, delta=10, num=200)
+    r2 = ref.cross(d2, 800, delta=10, num=200)
+    assert d1.tobytes() == d2.tobytes()
+    assert np.allclose(r1.tolist(), r2.tolist(), rtol=1e-4)
+
+
+@pytest.mark.parametrize('args', [dict(delta=10), dict(delta=10, num=200), dict(delta=0, num=3)])
+def test_cross_many(args):
+    d = profile()
+    ids = np.arange(0, d.size, 7)
+    ret = cross_many(d, ids, **args)
+    assert ret.shape == ids.shape
+    for id, r in zip(ids, ret):
+        c = cross(d.copy(), id, **args)
+        if c.size == 0:
+            assert np.isnan(r['x']) and np.isnan(r['residual'])
+            continue
+        assert np.allclose([r['x'], r['y']], [c[0]['x'], c[0]['y']], rtol=1e-3, atol=1e-3)
+        assert np.isclose(r['b1'], c[1]['y'], rtol=1e-3, atol=1e-3)
+        assert np.isclose(100 * r['m2'] + r['b2'], c[4]['y'], rtol=1e-3, atol=1e-3)
+
+
+def test_cross_many_residual():
+    x = np.arange(21, dtype=np.float64)
+    d = np.zeros(21, dtype=dtype)
+    d['x'] = x
+    d['y'] = np.abs(x - 10)
+    ret = cross_many(d, [5, 10, 15], delta=0)
+    assert np.argmin(ret['residual']) == 1
+    assert np.isclose(ret[1]['residual'], 0.) and np.allclose([ret[1]['x'], ret[1]['y']], [10, 0])
+    assert cross_many(d, [], delta=0).size == 0
+    assert np.isnan(cross_many(d, [0, 20], delta=0)['x']).all()
+
+
+def test_cross_many_nan_y():
+    x = np.arange(41, dtype=np.float64)
+    d = np.zeros(41, dtype=dtype)
+    d['x'] = x
+    d['y'] = np.abs(x - 20)
+    d['y'][2] = np.nan
+    r = cross_many(d, [20], delta=2, num=8)[0]
+    c = cross(d.copy(), 20, delta=2, num=8)
+    assert np.isclose(r['x'], 20.) and np.isclose(r['x'], c[0]['x'])
+    assert np.isclose(r['y'], c[0]['y'])
+
+
+def noisy(n: int = 200, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 20, n)
+    y = 0.5 * x + 3 + rng.normal(0, 0.02, n)
+    out = rng.random(n) < 0.3
+    y[out] += rng.uniform(1, 10, np.count_nonzero(out))
+    x[::17] = np.nan
+    return x, y, out
+
+
+def test_ransac_line():
+    x, y, out = noisy()
+    b, m, mask = ransac_line(x, y, threshold=0.1)
+    assert np.isclose(m, 0.5, atol=0.01) and np.isclose(b, 3, atol=0.05)
+    assert mask.shape == x.shape and not mask[np.isnan(x)].any()
+    assert not (mask & out).any()
+    assert np.count_nonzero(mask) > 0.9 * np.count_nonzero(~out & ~np.isnan(x))
+
+    b1, m1 = fit_line(x[~np.isnan(x)], y[~np.isnan(x)])
+    assert abs(m1 - 0.5) > abs(m - 0.5)
+
+    b2, m2, mask2 = ransac_line(x, y, threshold=0.1)
+    assert b2 == b and m2 == m and np.array_equal(mask2, mask)
+
+    d = np.zeros(x.size, dtype=dtype)
+    d['i'][10:100][ransac_line(x[10:100], y[10:100], threshold=0.1)[2]] = -2
+    assert np.count_nonzero(d['i'] == -2) > 0
+
+
+def test_ransac_line_degenerate():
+    b, m, mask = ransac_line([1.], [1.], threshold=0.1)
+    assert np.isnan(b) and np.isnan(m) and mask.shape == (1,) and not mask.any()
+    b, m, mask = ransac_line([0., 1., np.nan], [0., 1., 5.], threshold=0.1)
+    assert np.isclose(b, 0.) and np.isclose(m, 1.) and mask.tolist() == [True, True, False]
+    b, m, mask = ransac_line(np.zeros(10), np.arange(10.), threshold=0.1)
+    assert not mask.any()
+
+
+def test_cross_many_dense():
+    d = profile()
+    ids = np.arange(20, d.size - 20)
+    ret = cross_many(d, ids, delta=5, num=50)
+    assert ret.size == ids.size
+    for id, r in zip(ids[::20], ret[::20]):
+        c = cross(d.copy(), id, delta=5, num=50)
+        if c.size == 0:
+            assert np.isnan(r['x'])
+            continue
+        assert np.allclose([r['x'], r['y']], [c[0]['x'], c[0]['y']], rtol=1e-3, atol=1e-3)
@@ -0,0 +1,75 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+from seam_tracking.profiles import Generator, JOINTS, profile, surface
+
+
+def test_surface():
+    x = np.array([-10., -1., 0., 1., 10.])
+    assert np.allclose(surface('v_groove', x, depth=5., angle=90.), [0, -4, -5, -4, 0])
+    assert np.allclose(surface('fillet', x, 1.), [11, 2, 1, 0, 9])
+    assert np.allclose(surface('lap', x, thickness=3.), [3, 3, 0, 0, 0])
+    assert np.allclose(surface('butt', x), 0)
+    with pytest.raises(ValueError):
+        surface('tee', x)
+
+
+@pytest.mark.parametrize('joint', JOINTS)
+def test_profile(joint):
+    d = profile(joint, 101, width=10., center=1.)
+    assert d.size == 101
+    assert np.array_equal(d['i'], np.arange(101))
+    assert np.isclose(d['x'][0], -5) and np.isclose(d['x'][-1], 5)
+
+    d = profile(joint, 101, width=10., center=1., gap=1.05)
+    assert d.size == 90
+    assert np.all(np.abs(d['x'] - 1.) >= .525)
+
+    a = profile(joint, 101, noise=.1, seed=1)
+    b = profile(joint, 101, noise=.1, seed=1)
+    assert a.tobytes() == b.tobytes()
+    assert 0.05 < np.std(a['y'] - profile(joint, 101)['y']) < 0.2
+
+
+def test_generator():
+    g = Generator('v_groove', 201, width=20., noise=0., amplitude=2., height=1., frequency=1.,
+                  seed=0)
+    assert g.seam(0.) == pytest.approx((0., -5.))
+    assert g.seam(.25) == pytest.approx((2., -4.))
+    d = g(.25)
+    assert d.size == 201
+    k = np.argmin(d['y'])
+    assert d['x'][k] == pytest.approx(2., abs=.1)
+    assert d['y'][k] == pytest.approx(-4., abs=1e-4)
+
+    g.joint = 'fillet'
+    assert g.seam(.25) == pytest.approx((2., 1.))
+
+
+def test_generator_noise():
+    g = Generator('butt', 10000, noise=0., spatter=.1, spatter_height=5., dropout=.2, seed=0)
+    d = g(0.)
+    assert 7700 < d.size < 8300
+    assert np.all(np.diff(d['i']) >= 1)
+    above = d['y'] > 0
+    assert 0.08 < np.count_nonzero(above) / d.size < 0.12
+    assert np.all(d['y'][above] <= 5.)
+    assert np.all(d['y'][~above] == 0.)
+
+    a = Generator('lap', 100, noise=.1, seed=1)
+    b = Generator('lap', 100, noise=.1, seed=1)
+    assert a(0.).tobytes() == b(0.).tobytes()
+    assert a(0.).tobytes() != a(0.).tobytes()
@@ -0,0 +1,137 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+
+import numpy as np
+from seam_tracking.recording import DATA_SUFFIX, dtype, INDEX_SUFFIX, Recorder, Recording, write
+
+
+def frame(n, offset=0.):
+    d = np.zeros((n,), dtype=dtype)
+    d['x'] = np.arange(n) + offset
+    d['y'] = offset
+    d['i'] = np.arange(n)
+    return d
+
+
+def test_write_read(tmp_path):
+    path = str(tmp_path / 'r')
+    frames = [(k, k * .01, frame(k + 1, k)) for k in range(5)]
+    assert write(path, frames) == 5
+
+    r = Recording(path)
+    assert len(r) == 5
+    for (id, stamp, d), (i, s, p) in zip(frames, r):
+        assert (i, s) == (id, stamp)
+        assert p.tobytes() == d.tobytes()
+    id, stamp, p = r[-1]
+    assert id == 4 and p.size == 5
+    assert not p.flags.writeable
+
+
+def test_empty(tmp_path):
+    path = str(tmp_path / 'r')
+    assert write(path, []) == 0
+    assert len(Recording(path)) == 0
+
+
+def test_partial(tmp_path):
+    path = str(tmp_path / 'r')
+    write(path, [(k, 0., frame(10)) for k in range(3)])
+    with open(path + DATA_SUFFIX, 'r+b') as f:
+        f.truncate(25 * dtype.itemsize)
+    r = Recording(path)
+    assert len(r) == 2
+
+    with open(path + DATA_SUFFIX, 'ab') as f:
+        f.write(frame(5).tobytes())
+    assert len(r) == 2
+    r.refresh()
+    assert len(r) == 3
+    assert r[2][2].size == 10
+
+
+def test_recorder(tmp_path):
+    path = str(tmp_path / 'r')
+    rec = Recorder(path, capacity=8, batch=4)
+    rec.start()
+    frames = [(k, k * .01, frame(k % 7 + 1, k)) for k in range(50)]
+    for f in frames:
+        rec.put(*f)
+    rec.stop()
+    s = rec.stats()
+    assert s['frames'] == 50 and s['dropped'] == 0 and s['pending'] == 0
+    assert s['capacity'] >= s['points'] > 8
+    assert os.path.getsize(path + DATA_SUFFIX) == s['points'] * dtype.itemsize
+
+    r = Recording(path)
+    assert len(r) == 50
+    for (id, stamp, d), (i, t, p) in zip(frames, r):
+        assert (i, t) == (id, stamp)
+        assert p.tobytes() == d.tobytes()
+
+
+def test_recorder_live(tmp_path):
+    path = str(tmp_path / 'r')
+    rec = Recorder(path, capacity=1024, batch=1, interval=.01)
+    rec.start()
+    try:
+        r = Recording(path)
+        for k in range(3):
+            rec.put(k, 0., frame(10))
+        for _ in range(100):
+            r.refresh()
+            if len(r) == 3:
+                break
+            time.sleep(.01)
+        assert len(r) == 3
+        assert os.path.getsize(path + DATA_SUFFIX) == 1024 * dtype.itemsize
+    finally:
+        rec.stop()
+
+
+def test_recorder_append(tmp_path):
+    path = str(tmp_path / 'r')
+    write(path, [(k, 0., frame(10)) for k in range(3)])
+    with open(path + INDEX_SUFFIX, 'ab') as f:
+        f.write(b'\0' * 10)
+
+    rec = Recorder(path, capacity=4)
+    rec.start()
+    rec.put(3, 0., frame(4, 3))
+    rec.stop()
+    assert [id for id, _, _ in Recording(path)] == [0, 1, 2, 3]
+
+    with open(path + DATA_SUFFIX, 'r+b') as f:
+        f.truncate(25 * dtype.itemsize)
+
+    rec = Recorder(path, capacity=4)
+    rec.start()
+    rec.put(4, 0., frame(4, 3))
+    rec.stop()
+    r = Recording(path)
+    assert [id for id, _, _ in r] == [0, 1, 4]
+    assert r[2][2].tobytes() == frame(4, 3).tobytes()
+
+
+def test_recorder_drop(tmp_path):
+    rec = Recorder(str(tmp_path / 'r'), size=2)
+    for k in range(5):
+        rec.put(k, 0., frame(1))
+    rec.start()
+    rec.stop()
+    s = rec.stats()
+    assert s['frames'] == 2 and s['dropped'] == 3
@@ -0,0 +1,171 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import numpy as np
+import pytest
+from seam_tracking.chain import SeamChain
+from seam_tracking.recording import dtype, Recording, write
+from seam_tracking.replay import chain_from_params, main, replay
+import yaml
+
+PEAK = """
+import numpy as np
+
+def fn(d):
+    if d.size == 0 or d[0]['i'] < 0:
+        raise ValueError('bad frame')
+    k = np.nanargmax(d['y'])
+    return np.concatenate((np.array([(d[k]['x'], d[k]['y'], -1)], dtype=d.dtype), d))
+"""
+
+
+LABEL = """
+import numpy as np
+
+def fn(d):
+    if np.any(d['i'] < 0):
+        raise ValueError('labeled frame')
+    d['i'] = -2
+    if d.size < 100:
+        return d
+    k = np.nanargmax(d['y'])
+    return np.concatenate((np.array([(d[k]['x'], d[k]['y'], -1)], dtype=d.dtype), d))
+"""
+
+
+ORDER = []
+
+ORDERED = PEAK.replace("def fn(d):\n", "def fn(d):\n    ORDER.append('code')\n").replace(
+    "import numpy as np\n", "import numpy as np\nfrom test_replay import ORDER\n", 1)
+
+
+def frames(n=20):
+    for k in range(n):
+        d = np.zeros((100,), dtype=dtype)
+        d['x'] = np.linspace(-50, 50, 100)
+        d['y'] = -np.abs(d['x'] - k)
+        d['i'] = np.arange(100)
+        if k == 7:
+            d['i'][0] = -1
+        yield k, k * .01, d
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = str(tmp_path / 'r')
+    write(path, frames())
+    return path
+
+
+def test_replay(recording):
+    chain = chain_from_params({'codes': [PEAK], 'delta_y': 1.})
+    ret = replay(Recording(recording), chain)
+    assert ret['frames'] == 20 and ret['errors'] == 1
+    assert set(ret['stages']) == set(SeamChain.STAGES)
+    assert all(s['count'] == 20 for s in ret['stages'].values())
+    assert chain.timing is None
+
+    t = ret['trajectory']
+    assert list(t['frame_id']) == list(range(20))
+    assert not t['valid'][7]
+    ok = np.arange(20) != 7
+    assert t['valid'][ok].all()
+    x = np.linspace(-50, 50, 100)
+    expected = x[np.argmin(np.abs(x[:, None] - np.arange(20)), axis=0)]
+    assert np.allclose(t['u'][ok], expected[ok], atol=1e-4)
+    assert np.allclose(t['v'][ok], 1 + -np.abs(expected[ok] - np.arange(20)[ok]), atol=1e-4)
+
+
+def test_same_as_chain(recording):
+    ret = replay(Recording(recording), chain_from_params({'codes': [PEAK]}))
+    chain = chain_from_params({'codes': [PEAK]})
+    expected = b''
+    for id, stamp, d in frames():
+        try:
+            _, m = chain(d.copy(), str(id), stamp, stamp)
+        except Exception:
+            m = chain.modbus_msg(str(id), False, 0., 0.)
+        expected += m
+    assert ret['modbus'] == expected
+
+
+def test_load_error():
+    with pytest.raises(RuntimeError):
+        chain_from_params({'codes': ['def fn(d']})
+
+
+def test_main(recording, tmp_path, capsys):
+    code = tmp_path / 'peak.py'
+    code.write_text(PEAK)
+    out = tmp_path / 'out.csv'
+    main([recording, '--code', str(code), '-o', str(out)])
+    assert 'frames: 20' in capsys.readouterr().out
+    t = np.loadtxt(out, delimiter=',', skiprows=1)
+    assert t.shape == (20, 5)
+    assert t[7, 2] == 0 and t[8, 2] == 1
+
+
+def test_params_file(recording):
+    """The shipped parameters start with pipeline [-1], meaning task."""
+    path = os.path.join(os.path.dirname(__file__), '..', 'config', 'params.yaml')
+    with open(path) as f:
+        params = yaml.safe_load(f)['seam_tracking_node']['ros__parameters']
+    assert params['pipeline'] == [-1]
+    params['codes'] = ['', PEAK]
+    params['task'] = 1
+    ret = replay(Recording(recording), chain_from_params(params))
+    assert np.count_nonzero(ret['trajectory']['valid']) == 19
+
+
+def test_locate_copy():
+    chain = chain_from_params({'codes': [LABEL], 'track': True})
+    for k, _, d in frames(3):
+        r = chain.locate(d)
+        # Nothing is picked in the window, the full profile is searched as it came in.
+        assert r.size == 101 and r[0]['i'] == -1
+    assert chain.tracker.locked
+
+
+def test_locate_gate():
+    chain = chain_from_params({'codes': [PEAK], 'track': True})
+    d = next(frames(1))[2]
+    assert chain.locate(d.copy())[0]['i'] == -1
+    # Out of the gate in the window and in the full profile, counted once and not sent.
+    d['y'] = -np.abs(d['x'] - 30)
+    r = chain.locate(d.copy())
+    assert r[0]['i'] == -7 and np.isclose(r[0]['x'], 30, atol=1)
+    s = chain.tracker.stats()
+    assert s['rejected'] == 1 and s['locked']
+    _, m = chain(d.copy(), '1', 0., 0.)
+    assert chain.seam == (False, 0., 0.)
+
+
+def test_clock():
+    chain = chain_from_params({'codes': [ORDERED], 'compensate': True})
+    now = []
+
+    def clock():
+        ORDER.append('clock')
+        return now[0]
+
+    chain.clock = clock
+    for k, stamp, d in frames(5):
+        now[:] = [stamp + .05]
+        del ORDER[:]
+        chain(d, str(k), stamp)
+        # Send time is read after the code ran.
+        assert ORDER == ['code', 'clock']
+    assert np.isclose(chain.compensator.lead, .05)
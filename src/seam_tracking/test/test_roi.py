@@ -0,0 +1,51 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from seam_tracking.roi import RowPredictor
+
+H = [0.16085207487679626, 0.2679666549425936, -205.1548588898662,
+     -0.7409214060537485, 0.009161773590904738, 758.7035197990384,
+     0.0060885745075360325, 4.084389881288615e-06, 1.0]
+
+
+def forward(u: float, row: float):
+    p = np.reshape(H, (3, 3)) @ [u, row, 1.]
+    return p[0] / p[2], p[1] / p[2]
+
+
+def test_rows():
+    r = RowPredictor(H, margin=0)
+    for u, row in [(500., 300.), (600., 700.), (400., 1000.)]:
+        x, y = forward(u, row)
+        y_offset, height = r(x, y, 0.)
+        assert y_offset <= row < y_offset + height and height <= 2
+
+        y_offset, height = r(x, y, 5.)
+        assert y_offset <= row < y_offset + height and height > 2
+
+        r.margin = 20
+        y_offset2, height2 = r(x, y, 5.)
+        assert y_offset2 == max(y_offset - 20, 0) and height2 > height
+        r.margin = 0
+
+
+def test_unset():
+    assert RowPredictor()(1., 1., 1.) is None
+    assert RowPredictor([0.] * 9)(1., 1., 1.) is None
+    assert RowPredictor([1., 2.])(1., 1., 1.) is None
+    r = RowPredictor(H)
+    assert r.homography.shape == (3, 3)
+    r.homography = [0.] * 9
+    assert r.homography is None and r(1., 1., 1.) is None
@@ -0,0 +1,104 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+import numpy as np
+import pytest
+from seam_tracking.pacer import Pacer
+from seam_tracking.stripes import StripeRenderer
+
+
+def centers(img, k=8):
+    """Return the intensity weighted center of each column around its peak."""
+    w = img.astype(np.float64) - np.median(img, axis=0)
+    r = np.arange(img.shape[0])[:, None]
+    w[(w < 0) | (np.abs(r - np.argmax(w, axis=0)) > k)] = 0
+    return (w * r).sum(axis=0) / w.sum(axis=0)
+
+
+def test_render():
+    r = StripeRenderer(320, 200, joint='v_groove', field=32., scale=5., depth=5., angle=90.,
+                       ambient=20., speckle=0., noise=0., seed=0)
+    img = r(0.)
+    assert img.shape == (200, 320) and img.dtype == np.uint8
+    v = r.stripe(0.)
+    assert v[0] == pytest.approx(99.5)
+    assert v.max() == pytest.approx(99.5 + 25, abs=.3)
+    assert np.allclose(centers(img), v, atol=.05)
+    assert np.all(img[:80] == 20)
+
+    r.speckle, r.noise = .3, 2.
+    d = centers(r(0.)) - v
+    assert np.abs(d).max() < 1. and np.std(d) < .3
+
+
+def test_gap_weave():
+    r = StripeRenderer(320, 200, joint='butt', field=32., gap=2., speckle=0., noise=0.,
+                       amplitude=8., frequency=1.)
+    v = r.stripe(.25)
+    x = np.linspace(-16, 16, 320)
+    assert np.all(np.isnan(v) == (np.abs(x - 8) < 1))
+    img = r(.25)
+    assert np.all(img[:, np.isnan(v)] == r.ambient)
+    assert np.all(img[:, ~np.isnan(v)].max(axis=0) > 150)
+
+
+def test_vertical():
+    a = StripeRenderer(160, 100, joint='fillet', speckle=0., noise=0.)
+    b = StripeRenderer(100, 160, joint='fillet', speckle=0., noise=0., vertical=True)
+    assert b(0.).shape == (160, 100)
+    assert np.array_equal(a(0.), b(0.).T)
+    assert b(0.).flags.c_contiguous
+
+
+def test_ring():
+    r = StripeRenderer(64, 32, amplitude=5., seed=1)
+    ring = r.ring(4, 10.)
+    assert len(ring) == 4
+    assert not np.array_equal(ring[0], ring[1])
+    a = StripeRenderer(64, 32, amplitude=5., seed=1).ring(4, 10.)
+    assert all(np.array_equal(x, y) for x, y in zip(ring, a))
+
+
+def test_pacer():
+    now = [0.]
+
+    def sleep(seconds):
+        now[0] += seconds
+        return False
+
+    p = Pacer(256., clock=lambda: now[0], sleep=sleep)
+    for _ in range(21):
+        assert p.wait()
+    assert now[0] == 20 * p.period and p.late == 0
+
+    # Deadlines passed by more than a period are skipped, not caught up.
+    now[0] += 10 * p.period
+    assert p.wait()
+    assert now[0] == 30 * p.period and p.late == 9
+    assert p.wait()
+    assert now[0] == 31 * p.period and p.late == 9
+    p.stop()
+    assert not p.wait()
+    with pytest.raises(ValueError):
+        p.rate = 0
+
+
+def test_pacer_stop():
+    p = Pacer(.1)
+    assert p.wait()
+    # Stop wakes up a wait of 10 seconds.
+    threading.Timer(.05, p.stop).start()
+    assert not p.wait()
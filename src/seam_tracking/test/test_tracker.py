@@ -0,0 +1,86 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from seam_tracking.tracker import Tracker
+
+dtype = [(x, np.float32) for x in 'xyi']
+
+
+def profile():
+    d = np.zeros(1000, dtype=dtype)
+    d['x'] = np.arange(1000) * 0.1
+    d['x'][100:110] = np.nan
+    d['i'] = np.arange(1000)
+    return d
+
+
+def test_roi():
+    t = Tracker(enable=True, margin=2.)
+    d = profile()
+    assert t.roi(d) == slice(None) and t.predict() is None
+
+    assert t.update(50., 1.)
+    assert t.locked and np.allclose(t.predict(), [50., 1.])
+    roi = t.roi(d)
+    assert np.all(np.abs(d['x'][roi] - 50.) <= 2.) and roi.stop - roi.start == 41
+
+    t.enable = False
+    assert t.roi(d) == slice(None)
+
+    # Prediction out of the profile.
+    t = Tracker(enable=True, margin=2.)
+    t.update(200., 1.)
+    assert t.roi(d) == slice(None)
+
+
+def test_track():
+    t = Tracker(alpha=0.5, beta=0.2)
+    for k in range(50):
+        assert t.update(10. + 0.5 * k, 2.)
+    assert np.allclose(t.predict(), [10. + 0.5 * 50, 2.], atol=0.01)
+    s = t.stats()
+    assert s['locked'] and s['hits'] == 49 and s['relocks'] == 1
+    assert np.all(s['rms'] >= np.abs(s['mean'])) and abs(s['last'][0]) < 0.01
+
+
+def test_lost():
+    t = Tracker(gate=1., lost=3)
+    assert t.accepts(10., 0.)
+    t.update(10., 0.)
+    assert t.accepts(10.5, 0.5) and not t.accepts(20., 0.)
+    assert t.stats()['rejected'] == 0
+    assert not t.update(20., 0.)
+    t.miss()
+    assert t.locked and t.stats()['rejected'] == 1
+    t.miss()
+    t.miss()
+    assert not t.locked
+    t.miss()
+    assert t.update(20., 0.) and t.locked and t.stats()['relocks'] == 2
+    s = Tracker().stats()
+    assert not s['locked'] and np.isnan(s['rms']).all()
+
+
+def test_rms():
+    t = Tracker(gate=10., window=20)
+    assert np.isnan(t.rms).all()
+    rng = np.random.default_rng(0)
+    t.update(0., 0.)
+    for _ in range(100):
+        p = t.predict()
+        t.update(*(p + rng.normal(0, 1, 2)))
+        r = np.array(t._innovations)
+        assert np.allclose(t.rms, np.sqrt((r * r).mean(axis=0)))
+    assert np.array_equal(t.stats()['rms'], t.rms)
@@ -37,15 +37,13 @@ Functions for working with PointCloud2.
 
 __docformat__ = "restructuredtext en"
 
+import array
+from functools import lru_cache
 from .registry import converts_from_numpy, converts_to_numpy
 
 import numpy as np
 from sensor_msgs.msg import PointCloud2, PointField
 
-# prefix to the names of dummy fields we add to get byte alignment
-# correct. this needs to not clash with any actual field names
-DUMMY_FIELD_PREFIX = '__'
-
 # mappings between PointField types and numpy types
 type_mappings = [(PointField.INT8, np.dtype('int8')),
                  (PointField.UINT8, np.dtype('uint8')),
@@ -68,38 +66,54 @@ pftype_sizes = {PointField.INT8: 1,
                 PointField.FLOAT32: 4,
                 PointField.FLOAT64: 8}
 
+# number of point layouts to remember, a pipeline only sees a handful
+LAYOUT_CACHE_SIZE = 32
+
 @converts_to_numpy(PointField, plural=True)
 def fields_to_dtype(fields, point_step):
     '''Convert a list of PointFields to a numpy record datatype.
+
+    Padding between fields and points is described by offsets and itemsize,
+    so the datatype maps directly onto the message buffer without dummy fields.
+    Results are cached on the field layout and point_step.
     '''
-    offset = 0
-    np_dtype_list = []
-    for f in fields:
-        while offset < f.offset:
-            # might be extra padding between fields
-            np_dtype_list.append(
-                ('%s%d' % (DUMMY_FIELD_PREFIX, offset), np.uint8))
-            offset += 1
+    key = tuple((f.name, f.offset, f.datatype, f.count) for f in fields)
+    return _fields_to_dtype(key, point_step)
 
-        dtype = pftype_to_nptype[f.datatype]
-        if f.count != 1:
-            dtype = np.dtype((dtype, f.count))
 
-        np_dtype_list.append((f.name, dtype))
-        offset += pftype_sizes[f.datatype] * f.count
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def _fields_to_dtype(fields, point_step):
+    names = []
+    formats = []
+    offsets = []
+    for name, offset, datatype, count in fields:
+        dtype = pftype_to_nptype[datatype]
+        if count != 1:
+            dtype = np.dtype((dtype, count))
 
-    # might be extra padding between points
-    while offset < point_step:
-        np_dtype_list.append(('%s%d' % (DUMMY_FIELD_PREFIX, offset), np.uint8))
-        offset += 1
+        names.append(name)
+        formats.append(dtype)
+        offsets.append(offset)
 
-    return np_dtype_list
+    return np.dtype({
+        'names': names,
+        'formats': formats,
+        'offsets': offsets,
+        'itemsize': point_step})
 
 
 @converts_from_numpy(PointField, plural=True)
 def dtype_to_fields(dtype):
     '''Convert a numpy record datatype into a list of PointFields.
+
+    Results are cached on the datatype, the returned PointFields are shared
+    between calls and must not be modified.
     '''
+    return list(_dtype_to_fields(np.dtype(dtype)))
+
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def _dtype_to_fields(dtype):
     fields = []
     for field_name in dtype.names:
         np_field_type, field_offset = dtype.fields[field_name]
@@ -115,10 +129,23 @@ def dtype_to_fields(dtype):
         pf.datatype = nptype_to_pftype[np_field_type]
         pf.offset = field_offset
         fields.append(pf)
-    return fields
+    return tuple(fields)
+
+
+def layout_cache_info():
+    '''Return hit and miss counters of the layout caches.'''
+    return {
+        'fields_to_dtype': _fields_to_dtype.cache_info(),
+        'dtype_to_fields': _dtype_to_fields.cache_info()}
+
+
+def layout_cache_clear():
+    '''Drop all cached layouts and reset the counters.'''
+    _fields_to_dtype.cache_clear()
+    _dtype_to_fields.cache_clear()
 
 @converts_to_numpy(PointCloud2)
-def pointcloud2_to_array(cloud_msg, squeeze=True):
+def pointcloud2_to_array(cloud_msg, squeeze=True, copy=False):
     ''' Converts a rospy PointCloud2 message to a numpy recordarray
 
     Reshapes the returned array to have shape (height, width), even if the
@@ -126,31 +153,60 @@ def pointcloud2_to_array(cloud_msg, squeeze=True):
 
     The reason for using np.frombuffer rather than struct.unpack is
     speed... especially for large point clouds, this will be <much> faster.
+
+    By default the returned array is a view over cloud_msg.data, nothing is
+    copied and writes (if the buffer is writable) go to the message.
+    Pass copy=True to get an independent, writable array.
     '''
     # construct a numpy record type equivalent to the point type of this cloud
-    dtype_list = fields_to_dtype(cloud_msg.fields, cloud_msg.point_step)
-
-    # parse the cloud into an array
-    cloud_arr = np.frombuffer(cloud_msg.data, dtype_list)
+    dtype = fields_to_dtype(cloud_msg.fields, cloud_msg.point_step)
 
-    # remove the dummy fields that were added
-    cloud_arr = cloud_arr[
-        [fname for fname, _type in dtype_list if not (
-            fname[:len(DUMMY_FIELD_PREFIX)] == DUMMY_FIELD_PREFIX)]]
+    # parse the cloud into an array, padding is skipped by the field offsets
+    cloud_arr = np.frombuffer(cloud_msg.data, dtype)
+    if copy:
+        cloud_arr = cloud_arr.copy()
 
     if squeeze and cloud_msg.height == 1:
         return np.reshape(cloud_arr, (cloud_msg.width,))
     else:
         return np.reshape(cloud_arr, (cloud_msg.height, cloud_msg.width))
 
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def _float_view_type(dtype):
+    '''Return the common float type if all fields share it without padding.'''
+    types = set(dtype.fields[name][0] for name in dtype.names)
+    if len(types) != 1:
+        return None
+    t = types.pop()
+    if t.kind != 'f' or t.itemsize * len(dtype.names) != dtype.itemsize:
+        return None
+    return t
+
+
+def _is_dense(cloud_arr):
+    '''Check all float fields are finite, in one pass when possible.'''
+    t = _float_view_type(cloud_arr.dtype)
+    if t is not None:
+        return bool(np.isfinite(cloud_arr.view(t)).all())
+    return all(
+        np.isfinite(cloud_arr[fname]).all() for fname in cloud_arr.dtype.names
+        if cloud_arr.dtype.fields[fname][0].base.kind == 'f')
+
+
 @converts_from_numpy(PointCloud2)
-def array_to_pointcloud2(cloud_arr, stamp=None, frame_id=None):
+def array_to_pointcloud2(
+        cloud_arr, stamp=None, frame_id=None, is_dense=None, msg=None):
     '''Converts a numpy record array to a sensor_msgs.msg.PointCloud2.
+
+    is_dense is computed from the data unless given by the caller.
+    Pass an existing message as msg to refill it instead of allocating a new
+    one, its data buffer is reused when the size matches. The message is only
+    safe to refill once the previous content has been published.
     '''
-    # make it 2d (even if height will be 1)
-    cloud_arr = np.atleast_2d(cloud_arr)
+    # make it 2d (even if height will be 1), contiguous without a copy if possible
+    cloud_arr = np.ascontiguousarray(np.atleast_2d(cloud_arr))
 
-    cloud_msg = PointCloud2()
+    cloud_msg = PointCloud2() if msg is None else msg
 
     if stamp is not None:
         cloud_msg.header.stamp = stamp
@@ -162,10 +218,19 @@ def array_to_pointcloud2(cloud_arr, stamp=None, frame_id=None):
     cloud_msg.is_bigendian = False # assumption
     cloud_msg.point_step = cloud_arr.dtype.itemsize
     cloud_msg.row_step = cloud_msg.point_step*cloud_arr.shape[1]
-    cloud_msg.is_dense = \
-      all([np.isfinite(
-            cloud_arr[fname]).all() for fname in cloud_arr.dtype.names])
-    cloud_msg.data = cloud_arr.tostring()
+    cloud_msg.is_dense = _is_dense(cloud_arr) if is_dense is None else is_dense
+
+    # hand over bytes as array.array, the message takes it without checking
+    # every element, and copy straight into the old buffer if it fits
+    raw = cloud_arr.reshape(-1).view(np.uint8)
+    data = cloud_msg.data
+    if isinstance(data, array.array) and len(data) == raw.size:
+        if raw.size:
+            np.frombuffer(data, np.uint8)[:] = raw
+    else:
+        data = array.array('B')
+        data.frombytes(raw)
+        cloud_msg.data = data
     return cloud_msg
 
 def merge_rgb_fields(cloud_arr):
@@ -0,0 +1,145 @@
+# Copyright 2019 Zhushi Tech, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import ros2_numpy as rnp
+from sensor_msgs.msg import PointCloud2, PointField
+
+dtype = [(x, np.float32) for x in 'xyi']
+
+
+def padded_to_array(cloud_msg):
+    """Reference: padded dtype with dummy fields, then drop them by names."""
+    offset = 0
+    dtype_list = []
+    for f in cloud_msg.fields:
+        while offset < f.offset:
+            dtype_list.append(('__%d' % offset, np.uint8))
+            offset += 1
+        dtype_list.append((f.name, np.float32))
+        offset += 4
+    while offset < cloud_msg.point_step:
+        dtype_list.append(('__%d' % offset, np.uint8))
+        offset += 1
+    cloud_arr = np.frombuffer(cloud_msg.data, dtype_list)
+    cloud_arr = cloud_arr[[n for n, _ in dtype_list if not n.startswith('__')]]
+    return np.reshape(cloud_arr, (cloud_msg.width,))
+
+
+def make_msg(n: int, point_step: int = 12):
+    msg = PointCloud2()
+    msg.height = 1
+    msg.width = n
+    msg.point_step = point_step
+    msg.row_step = point_step * n
+    msg.fields = [
+        PointField(name=x, offset=4 * i, datatype=PointField.FLOAT32, count=1)
+        for i, x in enumerate('xyi')]
+    d = np.zeros((n, point_step // 4), dtype=np.float32)
+    d[:, 0] = np.arange(n)
+    d[:, 1] = np.arange(n) * 2
+    d[:, 2] = np.arange(n) * 3
+    msg.data = d.tobytes()
+    return msg
+
+
+def test_view():
+    msg = make_msg(100)
+    d = rnp.numpify(msg)
+    assert d.shape == (100,)
+    assert d.dtype.names == ('x', 'y', 'i')
+    assert np.shares_memory(d, np.frombuffer(msg.data, np.uint8))
+    assert np.all(d['x'] == np.arange(100))
+    assert np.all(d['i'] == np.arange(100) * 3)
+    assert d.dtype == np.dtype(dtype)
+
+    d = rnp.numpify(msg, copy=True)
+    assert not np.shares_memory(d, np.frombuffer(msg.data, np.uint8))
+    d['i'] = -1
+    assert np.all(rnp.numpify(msg)['i'] == np.arange(100) * 3)
+
+
+def test_padding():
+    msg = make_msg(100, point_step=16)
+    d = rnp.numpify(msg)
+    assert d.dtype.names == ('x', 'y', 'i')
+    assert d.dtype.itemsize == 16
+    assert np.shares_memory(d, np.frombuffer(msg.data, np.uint8))
+    assert np.all(d == padded_to_array(msg))
+
+    ret = rnp.msgify(PointCloud2, d)
+    assert ret.point_step == 16
+    assert [(f.name, f.offset) for f in ret.fields] == [('x', 0), ('y', 4), ('i', 8)]
+    assert np.all(rnp.numpify(ret) == d)
+
+
+def test_layout_cache():
+    pc2 = rnp.point_cloud2
+    pc2.layout_cache_clear()
+    msg = make_msg(10)
+    for i in range(5):
+        d = rnp.numpify(msg)
+        rnp.msgify(PointCloud2, d)
+    info = pc2.layout_cache_info()
+    assert info['fields_to_dtype'].misses == 1
+    assert info['fields_to_dtype'].hits == 4
+    assert info['dtype_to_fields'].misses == 1
+    assert info['dtype_to_fields'].hits == 4
+
+    rnp.numpify(make_msg(10, point_step=16))
+    info = pc2.layout_cache_info()
+    assert info['fields_to_dtype'].misses == 2
+
+    a = pc2.dtype_to_fields(np.dtype(dtype))
+    b = pc2.dtype_to_fields(np.dtype(dtype))
+    assert a is not b
+    assert all(x is y for x, y in zip(a, b))
+
+
+def test_msgify():
+    d = np.zeros((100,), dtype=dtype)
+    msg = rnp.msgify(PointCloud2, d)
+    assert msg.is_dense
+    assert msg.width == 100 and msg.height == 1
+    assert bytes(msg.data) == d.tobytes()
+
+    d['y'][50] = np.inf
+    assert not rnp.msgify(PointCloud2, d).is_dense
+    assert rnp.msgify(PointCloud2, d, is_dense=True).is_dense
+
+    d = np.zeros((100,), dtype=[('x', np.float32), ('n', np.int32)])
+    d['n'] = -1
+    assert rnp.msgify(PointCloud2, d).is_dense
+    d['x'][0] = np.nan
+    assert not rnp.msgify(PointCloud2, d).is_dense
+
+
+def test_msgify_reuse():
+    d = np.zeros((100,), dtype=dtype)
+    msg = rnp.msgify(PointCloud2, d)
+    data = msg.data
+
+    d['x'] = np.arange(100)
+    ret = rnp.msgify(PointCloud2, d, msg=msg)
+    assert ret is msg
+    assert ret.data is data
+    assert np.all(rnp.numpify(ret) == d)
+
+    ret = rnp.msgify(PointCloud2, d[:10], msg=msg)
+    assert ret is msg
+    assert ret.width == 10
+    assert np.all(rnp.numpify(ret) == d[:10])
+
+    ret = rnp.msgify(PointCloud2, d[::2], msg=msg)
+    assert np.all(rnp.numpify(ret) == d[::2])